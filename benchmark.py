@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import threading
+import contextlib
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import filter as policy_filter
+import detect_policy_format
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+FILTERED_DIR = os.path.join(BASE, "filtered_pages")
+# Small fixed set of repost.aws-style post pages built from filtered_pages
+# triplets, so the structure and download benchmarks run on the same input
+# everywhere; --corpus points them at a real download instead
+CORPUS_DIR = os.path.join(BASE, "benchmark_corpus")
+RESULTS_PATH = os.path.join(BASE, "benchmark_results.json")
+BUCKETS = ("repaired", "broken", "relaxed")
+
+
+# -----------------------------------------------------------------------------
+# TIMING
+# -----------------------------------------------------------------------------
+# Runs `setup` (untimed) then `fn` `repeat` times, returning timing stats.
+# `fn` returns the number of items it processed, used for throughput.
+def measure(fn, repeat, setup=None):
+    times = []
+    items = 0
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            arg = setup() if setup else None
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            items = fn(arg) if setup else fn()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        "items": items,
+        "repeat": repeat,
+        "min_s": round(best, 6),
+        "median_s": round(statistics.median(times), 6),
+        "mean_s": round(statistics.mean(times), 6),
+        "items_per_s": round(items / best, 2) if best > 0 else None,
+    }
+
+
+# -----------------------------------------------------------------------------
+# CORPUS FIXTURES
+# -----------------------------------------------------------------------------
+# Rebuilds structured post folders (body.json / accepted_answer.json) from the
+# committed filtered_pages triplets, so the filter modes run on fixed input.
+def build_saved_pages(dest):
+    bodies = []
+    for bucket in BUCKETS:
+        policy_dir = os.path.join(FILTERED_DIR, bucket, "original_policy")
+        if not os.path.isdir(policy_dir):
+            continue
+        for fname in sorted(os.listdir(policy_dir)):
+            idx = fname.replace(".json", "")
+            with open(os.path.join(policy_dir, fname), "r", encoding="utf-8") as f:
+                policy = f.read()
+            intent = ""
+            intent_path = os.path.join(FILTERED_DIR, bucket, "intent", fname)
+            if os.path.exists(intent_path):
+                with open(intent_path, "r", encoding="utf-8") as f:
+                    intent = f.read()
+            body = f"{intent}\n\n{policy}"
+            bodies.append(body)
+
+            post_dir = os.path.join(dest, f"{bucket}-{idx}")
+            os.makedirs(post_dir)
+            with open(os.path.join(post_dir, "body.json"), "w", encoding="utf-8") as f:
+                json.dump({"body": body}, f)
+
+            result_path = os.path.join(FILTERED_DIR, bucket, "results", fname)
+            if os.path.exists(result_path):
+                with open(result_path, "r", encoding="utf-8") as f:
+                    answer = f.read()
+                ans_path = os.path.join(post_dir, "accepted_answer.json")
+                with open(ans_path, "w", encoding="utf-8") as f:
+                    json.dump({"accepted_answer": answer}, f)
+    return bodies
+
+
+def list_html(corpus_dir):
+    return sorted(f for f in os.listdir(corpus_dir) if f.endswith(".html"))
+
+
+# -----------------------------------------------------------------------------
+# BENCHMARKS
+# -----------------------------------------------------------------------------
+def bench_filter(tmp, repeat):
+    saved = os.path.join(tmp, "saved_pages")
+    os.makedirs(saved)
+    bodies = build_saved_pages(saved)
+    results = {}
+
+    def extract_all():
+        for body in bodies:
+            policy_filter.extract_first_policy_block(body)
+        return len(bodies)
+
+    results["filter.extract_first_policy_block"] = measure(extract_all, repeat)
+
+    def fresh_out():
+        out = os.path.join(tmp, "filtered_out")
+        shutil.rmtree(out, ignore_errors=True)
+        return out
+
+    # relaxed refuses to run without broken results to de-duplicate against;
+    # they are produced untimed, so filter.relaxed times relaxed alone
+    def fresh_out_with_broken():
+        out = fresh_out()
+        policy_filter.filter_broken(saved, os.path.join(out, "broken"))
+        return out
+
+    def run_mode(name, out):
+        if name == "relaxed":
+            policy_filter.filter_relaxed(
+                saved, os.path.join(out, "relaxed"), os.path.join(out, "broken")
+            )
+        else:
+            getattr(policy_filter, f"filter_{name}")(saved, os.path.join(out, name))
+        return len(bodies)
+
+    for mode in BUCKETS:
+        setup = fresh_out_with_broken if mode == "relaxed" else fresh_out
+        results[f"filter.{mode}"] = measure(partial(run_mode, mode), repeat, setup)
+    return results
+
+
+def bench_detect(tmp, repeat):
+    work = os.path.join(tmp, "detect")
+
+    def fresh_copy():
+        shutil.rmtree(work, ignore_errors=True)
+        shutil.copytree(FILTERED_DIR, work)
+        paths = []
+        for root, dirs, files in os.walk(work):
+            dirs[:] = [d for d in dirs if d.lower() != "intent"]
+            paths.extend(os.path.join(root, f) for f in files if f.endswith(".json"))
+        return paths
+
+    def detect_all(paths):
+        for path in paths:
+            detect_policy_format.detect_policy_issues(
+                path, True, True, True, True, True, False
+            )
+        return len(paths)
+
+    def repair_all(paths):
+        for path in paths:
+            detect_policy_format.repair_policy(path, True, True, True, True)
+        return len(paths)
+
+    return {
+        "detect_policy_format.detect": measure(detect_all, repeat, setup=fresh_copy),
+        "detect_policy_format.repair": measure(repair_all, repeat, setup=fresh_copy),
+    }
+
+
+def bench_structure(tmp, corpus_dir, repeat):
+    from bs4 import BeautifulSoup
+    from parser import extract_post_data
+    import scrape
+
+    names = list_html(corpus_dir)
+    pages = []
+    for name in names:
+        with open(os.path.join(corpus_dir, name), "r", encoding="utf-8") as f:
+            pages.append(f.read())
+
+    def parse_all():
+        for html in pages:
+            extract_post_data(BeautifulSoup(html, "html.parser"))
+        return len(pages)
+
+    saved = os.path.join(tmp, "structured") + os.sep
+
+    def fresh_saved():
+        shutil.rmtree(saved, ignore_errors=True)
+        os.makedirs(saved)
+        for name in names:
+            shutil.copy(os.path.join(corpus_dir, name), saved)
+        return saved
+
+    def structure_all(saved_dir):
+        for name in names:
+            scrape.save_post_files(os.path.join(saved_dir, name))
+        return len(names)
+
+    old_saved = scrape.SAVED_DIR
+    scrape.SAVED_DIR = saved
+    try:
+        return {
+            "parser.extract_post_data": measure(parse_all, repeat),
+            "scrape.save_post_files": measure(
+                structure_all, repeat, setup=fresh_saved
+            ),
+        }
+    finally:
+        scrape.SAVED_DIR = old_saved
+
+
+# Serves corpus files by their last path segment, standing in for repost.aws
+class ReplayHandler(SimpleHTTPRequestHandler):
+    def translate_path(self, path):
+        name = path.split("?")[0].rstrip("/").split("/")[-1] or "index"
+        return os.path.join(self.directory, f"{name}.html")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_download(tmp, corpus_dir, repeat):
+    from playwright.sync_api import sync_playwright
+    import downloader
+
+    names = [n[: -len(".html")] for n in list_html(corpus_dir)]
+    handler = partial(ReplayHandler, directory=corpus_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    urls = [f"http://127.0.0.1:{port}/questions/{name}" for name in names]
+
+    saved = os.path.join(tmp, "downloaded") + os.sep
+
+    def fresh_saved():
+        shutil.rmtree(saved, ignore_errors=True)
+        os.makedirs(saved)
+
+    old_saved = downloader.SAVED_DIR
+    downloader.SAVED_DIR = saved
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            context = browser.new_context()
+
+            def download_all(_):
+                for url in urls:
+                    downloader.save_page(url, context)
+                return len(urls)
+
+            result = measure(download_all, repeat, setup=fresh_saved)
+            browser.close()
+    finally:
+        downloader.SAVED_DIR = old_saved
+        server.shutdown()
+    return {"downloader.save_page": result}
+
+
+# -----------------------------------------------------------------------------
+# REPORTING
+# -----------------------------------------------------------------------------
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Compares min times against a previous results file; returns regressions
+def compare(current, previous_path, threshold):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)["benchmarks"]
+    regressions = []
+    print(f"\n[INFO] Compared to {previous_path}:")
+    for name, res in current.items():
+        old = previous.get(name)
+        if not old or not old.get("min_s"):
+            print(f"  {name:<36} (new)")
+            continue
+        ratio = res["min_s"] / old["min_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- REGRESSION"
+            regressions.append(name)
+        print(
+            f"  {name:<36} {old['min_s']:.4f}s -> {res['min_s']:.4f}s "
+            f"({ratio:.2f}x){flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the download, structure, filter and lint stages."
+    )
+    parser.add_argument(
+        "-c",
+        "--corpus",
+        default=CORPUS_DIR,
+        help="Directory of saved repost.aws HTML pages for the structure and "
+        "download benchmarks (default: the bundled benchmark_corpus)",
+    )
+    parser.add_argument(
+        "--download",
+        action="store_true",
+        help="Also replay the HTML corpus through a local server with Playwright",
+    )
+    parser.add_argument(
+        "-n", "--repeat", type=int, default=3, help="Runs per benchmark"
+    )
+    parser.add_argument(
+        "-o", "--output", default=RESULTS_PATH, help="Where to write the results JSON"
+    )
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative slowdown reported as a regression (default 0.10)",
+    )
+    args = parser.parse_args()
+
+    benchmarks = {}
+    with tempfile.TemporaryDirectory(prefix="repost-bench-") as tmp:
+        print("[~] Benchmarking filter.py")
+        benchmarks.update(bench_filter(tmp, args.repeat))
+        print("[~] Benchmarking detect_policy_format.py")
+        benchmarks.update(bench_detect(tmp, args.repeat))
+
+        print("[~] Benchmarking parser/structuring")
+        benchmarks.update(bench_structure(tmp, args.corpus, args.repeat))
+        if args.download:
+            print("[~] Benchmarking downloader against local replay server")
+            benchmarks.update(bench_download(tmp, args.corpus, args.repeat))
+
+    for name, res in benchmarks.items():
+        print(
+            f"  {name:<36} {res['min_s']:.4f}s min, "
+            f"{res['items']} items, {res['items_per_s']} items/s"
+        )
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "benchmarks": benchmarks,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[+] Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(benchmarks, args.compare, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
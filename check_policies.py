@@ -1,11 +1,30 @@
 #!/usr/bin/env python3
+import argparse
+import ast
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import queue
 import subprocess
 import sys
 import signal
 import os
+import time
+import traceback
+from functools import partial
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+
+import metrics
+from filter import read_json
 
 # -----------------------------------------------------------------------------
 # CONFIGURATION
@@ -13,7 +32,14 @@ from concurrent.futures import ThreadPoolExecutor
 TIMEOUT = 30  # seconds per policy
 BASE = Path(__file__).resolve().parent
 SRC_DIR = BASE.parents[1] / "src"
-LOG_PATH = BASE / "check_policies.log"
+RESULTS_PATH = BASE / "check_policies.jsonl"
+CHECKER = "quacky.py"  # relative to SRC_DIR
+
+
+# Arguments passed to the checker for a single policy
+def _checker_args(policy_path):
+    return ["-p1", str(policy_path), "-b", "100"]
+
 
 # Define exactly which sub-folders to check, in order.
 FOLDERS = [
@@ -24,30 +50,66 @@ FOLDERS = [
 ]
 
 # -----------------------------------------------------------------------------
-# STATS STORAGE
+# RESULTS FILE
 # -----------------------------------------------------------------------------
-stats = {
-    f"{cat}/{sub}": {"total": 0, "sat": [], "unsat": [], "errors": [], "timeouts": []}
-    for cat, sub in FOLDERS
+# One JSON record per checked policy, appended as soon as the check finishes.
+# Records are keyed by the policy path; later records replace earlier ones.
+STATUS_BUCKETS = {
+    "sat": "sat",
+    "unsat": "unsat",
+    "error": "errors",
+    "timeout": "timeouts",
 }
 
 
+def _load_results(path):
+    records = {}
+    if not Path(path).is_file():
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from a crash mid-write
+            records[rec["policy"]] = rec
+    return records
+
+
+def _new_stats():
+    return {"total": 0, "sat": [], "unsat": [], "errors": [], "timeouts": []}
+
+
+def _summarize(records, folders=FOLDERS):
+    stats = {f"{cat}/{sub}": _new_stats() for cat, sub in folders}
+    for rec in records:
+        s = stats.setdefault(rec["label"], _new_stats())
+        s["total"] += 1
+        s[STATUS_BUCKETS[rec["status"]]].append(Path(rec["policy"]).name)
+    for s in stats.values():
+        for key in STATUS_BUCKETS.values():
+            s[key].sort(key=_name_order)
+    return stats
+
+
+def _name_order(name):
+    stem = Path(name).stem
+    return (0, int(stem), "") if stem.isdigit() else (1, 0, stem)
+
+
 # -----------------------------------------------------------------------------
 # INTERRUPT HANDLING
 # -----------------------------------------------------------------------------
-def _on_sigint(signum, frame):
+def _on_sigint(results_path, folders, signum, frame):
     print("\nInterrupted. Summary so far:\n")
-    _print_summary()
+    _print_summary(_summarize(_load_results(results_path).values(), folders))
     sys.exit(1)
 
 
-signal.signal(signal.SIGINT, _on_sigint)
-
-
 # -----------------------------------------------------------------------------
 # SUMMARY PRINTER
 # -----------------------------------------------------------------------------
-def _print_summary():
+def _print_summary(stats):
     for label, s in stats.items():
         print(f"{label}:")
         print(f"  Total checked: {s['total']}")
@@ -57,113 +119,580 @@ def _print_summary():
         print(f"    Timeouts:  {len(s['timeouts'])}")
         if s["unsat"]:
             print("    UNSAT files:")
-            for p in s["unsat"]:
-                print("      ", p.name)
+            for name in s["unsat"]:
+                print("      ", name)
         if s["errors"]:
             print("    Errored files:")
-            for p in s["errors"]:
-                print("      ", p.name)
+            for name in s["errors"]:
+                print("      ", name)
         if s["timeouts"]:
             print("    Timed-out files:")
-            for p in s["timeouts"]:
-                print("      ", p.name)
+            for name in s["timeouts"]:
+                print("      ", name)
         print()
 
 
+# Prints and overwrites terminal line (used for progress)
+def print_status(message):
+    sys.stdout.write("\r\033[K" + message)
+    sys.stdout.flush()
+
+
+def _format_eta(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+# -----------------------------------------------------------------------------
+# PERSISTENT WORKER POOL
+# -----------------------------------------------------------------------------
+class CheckerStartError(RuntimeError):
+    pass
+
+
+# Runs the checker's top-level imports, so loading the solver modules is part
+# of worker startup rather than of the first policy's timeout. Imports that
+# fail here are left for the real run to report.
+def _warm_up(tree, checker):
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            module = ast.Module(body=[node], type_ignores=[])
+            try:
+                exec(compile(module, checker, "exec"), {"__name__": "__warmup__"})
+            except Exception:
+                pass
+
+
+# Runs inside a worker process. The checker script is compiled once and then
+# executed as __main__ for every policy, so the solver modules it imports stay
+# cached in sys.modules for the lifetime of the worker. Sends "ready" once
+# the imports are loaded, or the traceback if the checker cannot be loaded.
+def _worker_loop(conn, checker, src_dir):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # parent handles Ctrl+C
+    try:
+        os.chdir(src_dir)
+        sys.path.insert(0, str(src_dir))
+        with open(checker, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), checker)
+        code = compile(tree, checker, "exec")
+        _warm_up(tree, checker)
+    except BaseException:
+        conn.send(traceback.format_exc())
+        return
+    conn.send("ready")
+
+    while True:
+        try:
+            policy_path = conn.recv()
+        except EOFError:
+            break
+        if policy_path is None:
+            break
+        conn.send(_run_checker(code, checker, policy_path))
+
+
+# Executes the compiled checker once, returning (returncode, combined output)
+def _run_checker(code, checker, policy_path):
+    buf = io.StringIO()
+    returncode = 0
+    argv = sys.argv
+    sys.argv = [checker] + _checker_args(policy_path)
+    with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+        try:
+            exec(code, {"__name__": "__main__", "__file__": checker})
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                returncode = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.argv = argv
+    return returncode, buf.getvalue()
+
+
+class SolverPool:
+    """Fixed set of long-lived checker processes fed policies over pipes.
+
+    A worker that does not answer within the timeout is killed and replaced,
+    so one hung solve never takes a slot out of the pool.
+    """
+
+    def __init__(self, size, checker, src_dir, timeout):
+        self.checker = str(checker)
+        self.src_dir = str(src_dir)
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._size = size
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=_worker_loop,
+            args=(child_conn, self.checker, self.src_dir),
+            daemon=True,
+        )
+        proc.start()
+        child_conn.close()
+        # Startup (including solver imports) is not charged to a policy's timeout
+        try:
+            status = parent_conn.recv()
+        except EOFError:
+            proc.join()
+            status = f"worker exited with {proc.exitcode} during startup"
+        if status != "ready":
+            proc.kill()
+            proc.join()
+            parent_conn.close()
+            raise CheckerStartError(f"{self.checker} failed to start:\n{status}")
+        return proc, parent_conn
+
+    def _replace(self, proc, conn):
+        proc.kill()
+        proc.join()
+        conn.close()
+        return self._spawn()
+
+    # Returns (returncode, output), or None if the worker timed out
+    def check(self, policy_path):
+        proc, conn = self._idle.get()
+        try:
+            conn.send(str(policy_path))
+            if conn.poll(self.timeout):
+                return conn.recv()
+            proc, conn = self._replace(proc, conn)
+            return None
+        except (EOFError, OSError):
+            # Worker died mid-solve (e.g. crash in native solver code)
+            exitcode = proc.exitcode
+            proc, conn = self._replace(proc, conn)
+            return exitcode if exitcode else 1, f"[worker exited with {exitcode}]"
+        finally:
+            self._idle.put((proc, conn))
+
+    def close(self):
+        for _ in range(self._size):
+            proc, conn = self._idle.get()
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.kill()
+            conn.close()
+
+
 # -----------------------------------------------------------------------------
 # WORKER
 # -----------------------------------------------------------------------------
-def _check_policy(task):
+def _check_policy(
+    task, pool=None, src_dir=SRC_DIR, checker=CHECKER, timeout=TIMEOUT
+):
     label, policy_path = task
-    cmd = ["python3", "quacky.py", "-p1", str(policy_path), "-b", "100"]
+    start = time.monotonic()
+    if pool is not None:
+        res = pool.check(policy_path)
+    else:
+        cmd = ["python3", checker] + _checker_args(policy_path)
+        try:
+            proc = subprocess.run(
+                cmd,
+                cwd=src_dir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=timeout,
+            )
+            res = proc.returncode, proc.stdout
+        except subprocess.TimeoutExpired:
+            res = None
+
+    return {
+        "label": label,
+        "policy": policy_path,
+        "timeout": res is None,
+        "returncode": None if res is None else res[0],
+        "output": None if res is None else res[1],
+        "elapsed": time.monotonic() - start,
+    }
+
+
+def _classify(result):
+    if result["timeout"]:
+        return "timeout"
+    if result["returncode"] != 0:
+        return "error"
+    if "satisfiability: sat" in (result["output"] or ""):
+        return "sat"
+    return "unsat"
+
+
+# -----------------------------------------------------------------------------
+# TASKS
+# -----------------------------------------------------------------------------
+def _policy_files(folders):
+    for cat, sub in folders:
+        policy_dir = BASE / "filtered_pages" / cat / sub
+        if not policy_dir.is_dir():
+            print(f"Warning: missing {policy_dir}", file=sys.stderr)
+            continue
+        for p in sorted(policy_dir.glob("*.json"), key=lambda p: int(p.stem)):
+            yield f"{cat}/{sub}", p
+
+
+def _policy_key(path):
+    return os.path.relpath(path, BASE)
+
+
+# -----------------------------------------------------------------------------
+# SHARDING
+# -----------------------------------------------------------------------------
+# Policies are assigned to shards by a hash of their content, so every machine
+# computes the same partition regardless of file order or local paths.
+def _parse_shard(value):
     try:
-        proc = subprocess.run(
-            cmd,
-            cwd=SRC_DIR,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            timeout=TIMEOUT,
-        )
-        return {
-            "label": label,
-            "policy": policy_path,
-            "timeout": False,
-            "returncode": proc.returncode,
-            "output": proc.stdout,
-        }
-    except subprocess.TimeoutExpired:
-        return {
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard must satisfy 1 <= i <= N: {value}")
+    return index, count
+
+
+def _shard_of(path, count):
+    digest = hashlib.sha1(path.read_bytes()).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def _parse_folders(value):
+    folders = []
+    for item in value.split(","):
+        cat, _, sub = item.strip().partition("/")
+        if not cat or not sub:
+            raise argparse.ArgumentTypeError(f"expected category/subfolder: {item!r}")
+        folders.append((cat, sub))
+    return folders
+
+
+def _merge(paths, folders):
+    records = {}
+    for path in paths:
+        if not Path(path).is_file():
+            print(f"Warning: missing {path}", file=sys.stderr)
+            continue
+        records.update(_load_results(path))
+    print(f"Merged {len(records)} results from {len(paths)} file(s)\n")
+    _print_summary(_summarize(records.values(), folders))
+
+
+# -----------------------------------------------------------------------------
+# COST ESTIMATION
+# -----------------------------------------------------------------------------
+# Rough per-feature weights for solver cost. Only the ordering matters: the
+# scheduler dispatches the most expensive policies first so they overlap with
+# the many cheap ones instead of running alone at the end of the queue.
+COST_WEIGHTS = {"kb": 1.0, "statements": 4.0, "wildcards": 3.0, "conditions": 2.0}
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _policy_features(path):
+    size = path.stat().st_size
+    features = {"kb": size / 1024, "statements": 0, "wildcards": 0, "conditions": 0}
+    try:
+        policy = read_json(path)
+    except (OSError, ValueError):
+        return features
+
+    stmts = policy.get("Statement", policy) if isinstance(policy, dict) else policy
+    for stmt in _as_list(stmts):
+        if not isinstance(stmt, dict):
+            continue
+        features["statements"] += 1
+        for key in ("Action", "NotAction", "Resource", "NotResource"):
+            for value in _as_list(stmt.get(key)):
+                if isinstance(value, str) and ("*" in value or "?" in value):
+                    features["wildcards"] += 1
+        cond = stmt.get("Condition")
+        if isinstance(cond, dict):
+            for op in cond.values():
+                features["conditions"] += len(op) if isinstance(op, dict) else 1
+    return features
+
+
+def _estimate_cost(path):
+    features = _policy_features(path)
+    return sum(COST_WEIGHTS[k] * v for k, v in features.items())
+
+
+# Longest-processing-time-first ordering of (label, path) tasks
+def _schedule_by_cost(tasks):
+    return sorted(tasks, key=lambda t: _estimate_cost(t[1]), reverse=True)
+
+
+# Keeps at most `window` checks in flight and yields results as they finish,
+# so a slow policy never holds back reporting of the ones queued after it.
+def _run_streaming(exe, check, tasks, window):
+    pending = set()
+    for task in tasks:
+        pending.add(exe.submit(check, task))
+        if len(pending) >= window:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+    for fut in as_completed(pending):
+        yield fut.result()
+
+
+# Runs one pass over `tasks`, appending a record per result to `out_f`.
+# Returns the tasks that timed out. With `final` unset, timeouts are expected
+# to be retried later and are not reported as failures on the terminal.
+def _run_phase(exe, check, tasks, total, out_f, timeout, phase, window, final):
+    start = time.monotonic()
+    completed = 0
+    timed_out = []
+    for result in _run_streaming(exe, check, tasks, window):
+        label = result["label"]
+        name = result["policy"].name
+        status = _classify(result)
+        record = {
             "label": label,
-            "policy": policy_path,
-            "timeout": True,
-            "returncode": None,
-            "output": None,
+            "policy": _policy_key(result["policy"]),
+            "status": status,
+            "returncode": result["returncode"],
+            "elapsed": round(result["elapsed"], 3),
+            "timeout": timeout,
+            "phase": phase,
+            "output": (result["output"] or "").strip(),
+            "checked_at": datetime.now().isoformat(timespec="seconds"),
         }
+        out_f.write(json.dumps(record) + "\n")
+        out_f.flush()
+        metrics.inc("policies_checked_total", status=status, phase=phase)
+        metrics.observe("solver_seconds", result["elapsed"], status=status)
+
+        # Terminal output only for issues
+        if status == "timeout":
+            timed_out.append((label, result["policy"]))
+            if final:
+                print_status(f"TIMEOUT ({label}): {name}\n")
+        elif status == "error":
+            print_status(f"ERROR   ({label}): {name}\n")
+        elif status == "unsat":
+            print_status(f"UNSAT   ({label}): {name}\n")
+
+        completed += 1
+        rate = completed / max(time.monotonic() - start, 1e-9)
+        eta = _format_eta((total - completed) / rate)
+        print_status(
+            f"[phase {phase}] [{completed}/{total}] {rate:.2f} policies/s, ETA {eta}"
+        )
+    print()
+    return timed_out
+
+
+# A recorded timeout still needs a retry if it was cut off below the final
+# timeout (i.e. during the short first pass of a two-phase run).
+def _needs_retry(rec, timeout):
+    return rec["status"] == "timeout" and rec.get("timeout", timeout) < timeout
 
 
 # -----------------------------------------------------------------------------
 # MAIN
 # -----------------------------------------------------------------------------
-def main():
-    if not SRC_DIR.is_dir():
-        print(f"Error: could not find src/ at {SRC_DIR}", file=sys.stderr)
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the policy checker over every filtered policy."
+    )
+    parser.add_argument(
+        "--src", type=Path, default=SRC_DIR, help="Directory containing the checker"
+    )
+    parser.add_argument(
+        "--checker", default=CHECKER, help="Checker script, relative to --src"
+    )
+    parser.add_argument(
+        "-t", "--timeout", type=float, default=TIMEOUT, help="Seconds per policy"
+    )
+    parser.add_argument(
+        "--first-timeout",
+        type=float,
+        help="Two-phase mode: check everything with this short timeout first, "
+        "then retry only the timed-out policies with --timeout",
+    )
+    parser.add_argument(
+        "--order",
+        choices=["cost", "file"],
+        default="cost",
+        help="Dispatch order: estimated cost, longest first (default), "
+        "or folder/file order",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=os.cpu_count() or 4, help="Worker count"
+    )
+    parser.add_argument(
+        "--folders",
+        type=_parse_folders,
+        default=FOLDERS,
+        help="Comma-separated category/subfolder list under filtered_pages "
+        "(default: all checked folders)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=_parse_shard,
+        help="Only check shard i of N (1-based), partitioned by policy content hash",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="RESULTS",
+        help="Combine shard result files and print the summary instead of checking",
+    )
+    parser.add_argument(
+        "--spawn",
+        action="store_true",
+        help="Start a fresh interpreter per policy instead of using the worker pool",
+    )
+    parser.add_argument(
+        "-o",
+        "--results",
+        type=Path,
+        help="JSONL file that results are appended to as they complete "
+        "(default: check_policies.jsonl, or check_policies.shardIofN.jsonl)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip policies already recorded in the results file",
+    )
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics.configure(args)
+
+    if args.merge:
+        _merge(args.merge, args.folders)
+        return
+
+    if args.results is None:
+        args.results = RESULTS_PATH
+        if args.shard:
+            args.results = RESULTS_PATH.with_suffix(
+                ".shard{}of{}.jsonl".format(*args.shard)
+            )
+
+    src_dir = args.src.resolve()
+    if not src_dir.is_dir():
+        print(f"Error: could not find src/ at {src_dir}", file=sys.stderr)
         sys.exit(1)
+    if not (src_dir / args.checker).is_file():
+        print(f"Error: could not find {args.checker} in {src_dir}", file=sys.stderr)
+        sys.exit(1)
+    two_phase = args.first_timeout is not None and args.first_timeout < args.timeout
 
-    # Build ordered task list
-    tasks = []
-    for cat, sub in FOLDERS:
-        policy_dir = BASE / "filtered_pages" / cat / sub
-        if not policy_dir.is_dir():
-            print(f"Warning: missing {policy_dir}", file=sys.stderr)
+    done_keys, retry_keys = set(), set()
+    if args.resume:
+        for key, rec in _load_results(args.results).items():
+            if _needs_retry(rec, args.timeout):
+                retry_keys.add(key)
+            else:
+                done_keys.add(key)
+        print(
+            f"Resuming: {len(done_keys)} policies already recorded, "
+            f"{len(retry_keys)} waiting for a retry"
+        )
+
+    phase1, retry = [], []
+    for label, p in _policy_files(args.folders):
+        if args.shard and _shard_of(p, args.shard[1]) != args.shard[0]:
             continue
-        files = sorted(policy_dir.glob("*.json"), key=lambda p: int(p.stem))
-        for p in files:
-            stats[f"{cat}/{sub}"]["total"] += 1
-            tasks.append((f"{cat}/{sub}", p))
-
-    # Prepare log
-    with open(LOG_PATH, "w") as log_f:
-        log_f.write(f"=== check_policies run at {datetime.now().isoformat()} ===\n\n")
-
-        # Parallel execution
-        workers = os.cpu_count() or 4
-        with ThreadPoolExecutor(max_workers=workers) as exe:
-            for result in exe.map(_check_policy, tasks):
-                label = result["label"]
-                policy = result["policy"]
-                timeout = result["timeout"]
-                code = result["returncode"]
-                raw_out = result["output"]
-                out = raw_out.strip() if raw_out else ""
-
-                # Log everything
-                log_f.write(f"--- [{label}] {policy.name} ---\n")
-                if timeout:
-                    log_f.write(f"[TIMEOUT >{TIMEOUT}s]\n\n")
-                else:
-                    log_f.write(out + "\n\n")
-
-                # Terminal output only for issues
-                bucket = stats[label]
-                if timeout:
-                    bucket["timeouts"].append(policy)
-                    print(f"TIMEOUT ({label}): {policy.name}")
-                elif code is None or code != 0:
-                    bucket["errors"].append(policy)
-                    print(f"ERROR   ({label}): {policy.name}")
-                else:
-                    if "satisfiability: sat" in out:
-                        bucket["sat"].append(policy)
-                    else:
-                        bucket["unsat"].append(policy)
-                        print(f"UNSAT   ({label}): {policy.name}")
-
-        log_f.write("=== end of run ===\n")
-
-    # Final summary
-    print(f"\nDone. Detailed log written to {LOG_PATH}\n")
-    _print_summary()
+        key = _policy_key(p)
+        if key in retry_keys and two_phase:
+            retry.append((label, p))
+        elif key not in done_keys:
+            phase1.append((label, p))
+    if args.order == "cost":
+        phase1 = _schedule_by_cost(phase1)
+
+    if args.shard:
+        count = len(phase1) + len(retry)
+        print(f"Shard {args.shard[0]}/{args.shard[1]}: {count} policies")
+
+    signal.signal(signal.SIGINT, partial(_on_sigint, args.results, args.folders))
+
+    # Parallel execution. Threads only wait on the pool (or on spawned
+    # interpreters with --spawn); the solving happens in worker processes.
+    first_timeout = args.first_timeout if two_phase else args.timeout
+    pool = None
+    if not args.spawn:
+        try:
+            pool = SolverPool(
+                args.workers, src_dir / args.checker, src_dir, first_timeout
+            )
+        except CheckerStartError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    check = partial(
+        _check_policy,
+        pool=pool,
+        src_dir=src_dir,
+        checker=args.checker,
+        timeout=first_timeout,
+    )
+
+    mode = "a" if args.resume else "w"
+    window = args.workers * 2
+    with open(args.results, mode, encoding="utf-8") as out_f, metrics.stage("check"):
+        with ThreadPoolExecutor(max_workers=args.workers) as exe:
+            retry += _run_phase(
+                exe,
+                check,
+                phase1,
+                len(phase1),
+                out_f,
+                first_timeout,
+                1,
+                window,
+                final=not two_phase,
+            )
+
+            if two_phase and retry:
+                print(f"Retrying {len(retry)} timed-out policies at {args.timeout}s")
+                if pool is not None:
+                    pool.timeout = args.timeout
+                check = partial(check, timeout=args.timeout)
+                if args.order == "cost":
+                    retry = _schedule_by_cost(retry)
+                _run_phase(
+                    exe,
+                    check,
+                    retry,
+                    len(retry),
+                    out_f,
+                    args.timeout,
+                    2,
+                    window,
+                    final=True,
+                )
+
+    if pool is not None:
+        pool.close()
+
+    # Final summary, including anything recorded by earlier resumed runs
+    print(f"\nDone. Results written to {args.results}\n")
+    _print_summary(_summarize(_load_results(args.results).values(), args.folders))
+    metrics.finish(args)
 
 
 if __name__ == "__main__":
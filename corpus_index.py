@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import sqlite3
+import argparse
+
+from parser import iter_structured_posts
+
+# SQLite index over the structured corpus (saved_pages/<post>/metadata.json,
+# body.json). Metadata lives in ordinary indexed tables and titles/bodies in
+# an FTS5 table, so filtered full-text queries never touch the post folders.
+#
+#   python corpus_index.py build
+#   python corpus_index.py query --tag IAM --accepted --since 2024 sts:AssumeRole
+
+SAVED_DIR = "saved_pages"
+DB_PATH = "corpus_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    folder TEXT UNIQUE NOT NULL,
+    title TEXT,
+    author TEXT,
+    date TEXT,
+    accepted INTEGER NOT NULL,
+    link TEXT,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_date ON posts(date);
+CREATE INDEX IF NOT EXISTS posts_author ON posts(author COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS tags (
+    post_id INTEGER NOT NULL REFERENCES posts(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags(tag, post_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(title, body);
+"""
+
+
+def connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _folder_mtime(folder_path):
+    mtime = 0.0
+    for name in ("metadata.json", "body.json"):
+        try:
+            mtime = max(mtime, os.stat(os.path.join(folder_path, name)).st_mtime)
+        except OSError:
+            pass
+    return mtime
+
+
+# -----------------------------------------------------------------------------
+# BUILD
+# -----------------------------------------------------------------------------
+# Indexes new or changed post folders and drops folders that disappeared.
+# Returns (added_or_updated, removed, unchanged).
+def build_index(saved_dir=SAVED_DIR, db_path=DB_PATH, verbose=False):
+    conn = connect(db_path)
+    known = {
+        row["folder"]: (row["id"], row["mtime"])
+        for row in conn.execute("SELECT id, folder, mtime FROM posts")
+    }
+    mtimes = {}  # every post present
+
+    # Runs before the body is read, so unchanged posts are never loaded
+    def changed(post):
+        folder = post["folder"]
+        mtimes[folder] = _folder_mtime(os.path.join(saved_dir, folder))
+        old = known.get(folder)
+        return not (old and old[1] >= mtimes[folder])
+
+    updated = 0
+    with conn:
+        for post in iter_structured_posts(saved_dir, where=changed):
+            folder = post["folder"]
+            old = known.get(folder)
+            if old:
+                _delete_post(conn, old[0])
+
+            cur = conn.execute(
+                "INSERT INTO posts (folder, title, author, date, accepted, link, mtime)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    folder,
+                    post.get("title"),
+                    post.get("author"),
+                    post.get("date"),
+                    int(bool(post.get("accepted"))),
+                    post.get("link"),
+                    mtimes[folder],
+                ),
+            )
+            post_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO tags (post_id, tag) VALUES (?, ?)",
+                [(post_id, tag) for tag in post.get("tags") or []],
+            )
+            conn.execute(
+                "INSERT INTO posts_fts (rowid, title, body) VALUES (?, ?, ?)",
+                (post_id, post.get("title") or "", post["body"]),
+            )
+            updated += 1
+            if verbose:
+                print(f"[+] Indexed {folder}")
+
+        removed = [pid for folder, (pid, _) in known.items() if folder not in mtimes]
+        for post_id in removed:
+            _delete_post(conn, post_id)
+
+    conn.execute("INSERT INTO posts_fts (posts_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    return updated, len(removed), len(mtimes) - updated
+
+
+def _delete_post(conn, post_id):
+    conn.execute("DELETE FROM posts_fts WHERE rowid = ?", (post_id,))
+    conn.execute("DELETE FROM posts WHERE id = ?", (post_id,))
+
+
+# -----------------------------------------------------------------------------
+# QUERY
+# -----------------------------------------------------------------------------
+# Quotes each whitespace-separated term so IAM names like sts:AssumeRole are
+# matched as phrases instead of being parsed as FTS5 column filters.
+def to_fts_query(text):
+    terms = text.split()
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def search(
+    text=None,
+    tags=(),
+    author=None,
+    since=None,
+    until=None,
+    accepted=None,
+    limit=50,
+    raw_fts=False,
+    db_path=DB_PATH,
+):
+    """Returns matching posts as dicts, best full-text match first.
+
+    `tags` must all be present; `since`/`until` compare against the ISO date
+    prefix, so "2024" or "2024-03" work; `accepted` filters on the flag.
+    """
+    sql = ["SELECT p.folder, p.title, p.author, p.date, p.accepted, p.link"]
+    params = []
+    if text:
+        sql.append("FROM posts_fts JOIN posts p ON p.id = posts_fts.rowid")
+        sql.append("WHERE posts_fts MATCH ?")
+        params.append(text if raw_fts else to_fts_query(text))
+    else:
+        sql.append("FROM posts p WHERE 1")
+    for tag in tags:
+        sql.append("AND p.id IN (SELECT post_id FROM tags WHERE tag = ?)")
+        params.append(tag)
+    if author:
+        sql.append("AND p.author = ? COLLATE NOCASE")
+        params.append(author)
+    if since:
+        sql.append("AND p.date >= ?")
+        params.append(since)
+    if until:
+        # "2024" should include all of 2024, so compare on the same prefix
+        sql.append("AND substr(p.date, 1, ?) <= ?")
+        params.extend([len(until), until])
+    if accepted is not None:
+        sql.append("AND p.accepted = ?")
+        params.append(int(accepted))
+    sql.append("ORDER BY " + ("bm25(posts_fts)" if text else "p.date DESC"))
+    sql.append("LIMIT ?")
+    params.append(limit)
+
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(" ".join(sql), params).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query structured posts.")
+    parser.add_argument("--db", default=DB_PATH, help="Index database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_p = sub.add_parser("build", help="Create or incrementally update the index")
+    build_p.add_argument("--saved-dir", default=SAVED_DIR)
+    build_p.add_argument("-l", "--log", action="store_true", help="Verbose logging")
+
+    query_p = sub.add_parser("query", help="Search the index")
+    query_p.add_argument("text", nargs="*", help="Full-text terms (all must match)")
+    query_p.add_argument("-t", "--tag", action="append", default=[])
+    query_p.add_argument("-a", "--author")
+    query_p.add_argument("--since", help="ISO date prefix, e.g. 2024 or 2024-03-01")
+    query_p.add_argument("--until", help="ISO date prefix, inclusive")
+    query_p.add_argument("--accepted", action="store_true", default=None)
+    query_p.add_argument(
+        "--unaccepted", dest="accepted", action="store_false", default=None
+    )
+    query_p.add_argument("-n", "--limit", type=int, default=50)
+    query_p.add_argument(
+        "--fts", action="store_true", help="Pass text as a raw FTS5 query"
+    )
+    query_p.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.command == "build":
+        updated, removed, unchanged = build_index(args.saved_dir, args.db, args.log)
+        print(
+            f"[INFO] Indexed {updated} post(s), removed {removed}, "
+            f"{unchanged} unchanged in {time.time() - start:.2f}s"
+        )
+        return
+
+    results = search(
+        " ".join(args.text) or None,
+        tags=args.tag,
+        author=args.author,
+        since=args.since,
+        until=args.until,
+        accepted=args.accepted,
+        limit=args.limit,
+        raw_fts=args.fts,
+        db_path=args.db,
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            mark = "*" if r["accepted"] else " "
+            print(f"{mark} {(r['date'] or '')[:10]:<10} {r['folder']}  {r['title']}")
+        elapsed_ms = (time.time() - start) * 1000
+        print(f"[INFO] {len(results)} result(s) in {elapsed_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+
+import metrics
+from frontier import build_seeds, normalize_post_id, structured_post_ids
+
+# Shared crawl frontier for several downloader processes, possibly on
+# different hosts. The frontier is a SQLite file on a shared volume; workers
+# lease tasks from it, keep their leases alive with heartbeats, and record
+# completion with a conditional update, so a task is completed exactly once
+# even if its lease expired and another worker picked it up. A task is either
+# a listing page (which adds post tasks and the next listing page) or a post
+# (downloaded and structured into saved_pages/<post> as scrape.py does).
+#
+#   python crawl_queue.py --db /shared/crawl.db seed -q "IAM Policy" -t <tag>
+#   python crawl_queue.py --db /shared/crawl.db work      (on every node)
+#   python crawl_queue.py --db /shared/crawl.db status
+
+DB_PATH = "crawl_queue.db"
+LEASE_SECONDS = 300
+HEARTBEATS_PER_LEASE = 3  # a lease survives two missed heartbeats
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    ref TEXT,
+    seed TEXT,
+    page INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    enqueued_at REAL NOT NULL,
+    done_at REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks(state, lease_until);
+CREATE INDEX IF NOT EXISTS tasks_worker ON tasks(worker, state);
+"""
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class CrawlQueue:
+    def __init__(self, db_path=DB_PATH, lease_seconds=LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        # Autocommit; multi-statement changes use explicit BEGIN IMMEDIATE,
+        # which takes the write lock up front so two leases cannot interleave
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA busy_timeout = 60000")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _add(self, key, kind, ref, seed, page, state="pending"):
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO tasks (key, kind, ref, seed, page, state,"
+            " enqueued_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, kind, json.dumps(ref), seed, page, state, time.time()),
+        )
+        return cur.rowcount
+
+    def add_listing(self, seed, ref, page=0):
+        return self._add(f"listing:{seed}:{page}", "listing", ref, seed, page)
+
+    # Post tasks are keyed on the normalized post ID, so a post found by
+    # several seeds or workers is queued once
+    def add_posts(self, urls, seed=None):
+        added = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for url in urls:
+                key = f"post:{normalize_post_id(url)}"
+                added += self._add(key, "post", url, seed, 0)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        metrics.inc("queue_posts_added_total", added)
+        return added
+
+    # Records posts that are already structured so no worker fetches them
+    def mark_done(self, post_ids):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for post_id in post_ids:
+                self._add(f"post:{post_id}", "post", None, None, 0, state="done")
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    # Leases up to `count` runnable tasks: pending ones, or leased ones whose
+    # lease ran out. Tasks that used up their attempts are marked failed.
+    # Listing pages go first so the frontier keeps growing.
+    def lease(self, worker, count=1):
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE tasks SET state = 'failed', worker = NULL"
+                " WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS),
+            )
+            rows = self.conn.execute(
+                "SELECT key, kind, ref, seed, page FROM tasks"
+                " WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?)"
+                " ORDER BY kind = 'post', enqueued_at LIMIT ?",
+                (now, count),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?,"
+                " attempts = attempts + 1 WHERE key = ?",
+                [(worker, now + self.lease_seconds, row[0]) for row in rows],
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        metrics.inc("queue_leases_total", len(rows))
+        return [
+            {"key": k, "kind": kind, "ref": json.loads(ref), "seed": s, "page": p}
+            for k, kind, ref, s, p in rows
+        ]
+
+    # Extends every lease the worker still holds
+    def heartbeat(self, worker):
+        cur = self.conn.execute(
+            "UPDATE tasks SET lease_until = ? WHERE worker = ? AND state = 'leased'",
+            (time.time() + self.lease_seconds, worker),
+        )
+        return cur.rowcount
+
+    # True if this call recorded the outcome. False means the lease was lost
+    # and another worker owns (or already completed) the task.
+    def complete(self, worker, key, ok=True, error=None):
+        if ok:
+            cur = self.conn.execute(
+                "UPDATE tasks SET state = 'done', done_at = ?, lease_until = NULL,"
+                " error = NULL WHERE key = ? AND worker = ? AND state = 'leased'",
+                (time.time(), key, worker),
+            )
+        else:
+            cur = self.conn.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed'"
+                " ELSE 'pending' END, worker = NULL, lease_until = NULL, error = ?"
+                " WHERE key = ? AND worker = ? AND state = 'leased'",
+                (MAX_ATTEMPTS, error, key, worker),
+            )
+        recorded = cur.rowcount == 1
+        metrics.inc("queue_completions_total", ok=ok, recorded=recorded)
+        return recorded
+
+    def counts(self):
+        rows = self.conn.execute(
+            "SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state"
+        )
+        return {(kind, state): n for kind, state, n in rows}
+
+    # Nothing left to lease now or later
+    def finished(self):
+        row = self.conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE state IN ('pending', 'leased')"
+        ).fetchone()
+        return row[0] == 0
+
+
+class _Heartbeat(threading.Thread):
+    # Own connection: SQLite connections stay on the thread that made them.
+    # Beats several times per lease, so --lease can be shortened safely.
+    def __init__(self, db_path, lease_seconds, worker, interval=None):
+        super().__init__(daemon=True)
+        self.args = (db_path, lease_seconds)
+        self.worker = worker
+        self.interval = interval or lease_seconds / HEARTBEATS_PER_LEASE
+        self.stopped = threading.Event()
+
+    def run(self):
+        queue = CrawlQueue(*self.args)
+        try:
+            while not self.stopped.wait(self.interval):
+                queue.heartbeat(self.worker)
+        finally:
+            queue.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# -----------------------------------------------------------------------------
+# WORKER
+# -----------------------------------------------------------------------------
+# Listing pages are fetched under a per-worker name and deleted once parsed,
+# so workers sharing saved_pages never read each other's (or a stale) page
+def _run_task(task, context, queue, worker, listing_mode, verbose):
+    import scrape
+    from downloader import save_page, SAVED_DIR
+
+    if task["kind"] == "listing":
+        ref, seed, page = task["ref"], task["seed"], task["page"]
+        listed = scrape._list_posts(
+            ref, context, verbose, listing_mode, name=f"listing-{worker}", keep=False
+        )
+        if listed is None:
+            return False  # retried up to MAX_ATTEMPTS, like a failed post
+        links, next_ref = listed
+        added = queue.add_posts(links, seed)
+        if next_ref:
+            queue.add_listing(seed, next_ref, page + 1)
+        if verbose:
+            print(f"[~] {seed} page {page}: {added} new of {len(links)}")
+        return True
+
+    url = task["ref"]
+    name = url.split("/")[-1] or "index"
+    if not save_page(url, context, name=name, verbose=verbose):
+        return False
+    html_path = os.path.join(SAVED_DIR, f"{name}.html")
+    if os.path.exists(html_path):
+        scrape.save_post_files(html_path, link=url, verbose=verbose)
+    return True
+
+
+def work(
+    queue,
+    worker,
+    listing_mode="html",
+    batch=1,
+    max_tasks=None,
+    verbose=False,
+    watch=None,
+    sessions=None,
+):
+    from playwright.sync_api import sync_playwright
+    from session import SessionPool, claim_state_dir
+
+    sessions = sessions or SessionPool(claim_state_dir())
+    heartbeat = _Heartbeat(queue.db_path, queue.lease_seconds, worker)
+    heartbeat.start()
+    done = 0
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            context = sessions.open(browser)
+            while max_tasks is None or done < max_tasks:
+                tasks = queue.lease(worker, batch)
+                if not tasks:
+                    if queue.finished():
+                        break
+                    time.sleep(POLL_SECONDS)  # others may still add work
+                    continue
+                for task in tasks:
+                    error = None
+                    try:
+                        ok = _run_task(
+                            task, context, queue, worker, listing_mode, verbose
+                        )
+                    except Exception as e:
+                        ok, error = False, str(e).splitlines()[0] if str(e) else repr(e)
+                        print(f"[!] {task['key']} failed: {error}")
+                    if not queue.complete(worker, task["key"], ok, error) and verbose:
+                        print(f"[!] Lost the lease on {task['key']}; not recorded")
+                    done += 1
+                    recycle = task["kind"] == "post" and sessions.page_done(context)
+                    if watch is not None and watch.over_ceiling():
+                        metrics.inc("context_recycles_total")
+                        recycle = True
+                    if recycle:
+                        sessions.close(context)
+                        context = sessions.open(browser)
+            sessions.close(context)
+            browser.close()
+    finally:
+        heartbeat.stop()
+    return done
+
+
+def print_counts(queue):
+    counts = queue.counts()
+    for kind in ("listing", "post"):
+        states = {s: n for (k, s), n in counts.items() if k == kind}
+        if states:
+            summary = ", ".join(f"{n} {s}" for s, n in sorted(states.items()))
+            print(f"[INFO] {kind}: {summary}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Crawl with several workers sharing one SQLite frontier."
+    )
+    parser.add_argument("--db", default=DB_PATH, help="Queue database (shared volume)")
+    parser.add_argument(
+        "--lease",
+        type=int,
+        default=LEASE_SECONDS,
+        help=f"Seconds a lease lasts without a heartbeat (default {LEASE_SECONDS})",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed_p = sub.add_parser("seed", help="Queue the first listing page of each seed")
+    seed_p.add_argument("-q", "--query", action="append", default=[])
+    seed_p.add_argument("-t", "--tag", action="append", default=[])
+    seed_p.add_argument("--spec", help="Crawl spec file, as for scrape.py")
+
+    work_p = sub.add_parser("work", help="Lease and run tasks until the queue is empty")
+    work_p.add_argument("--listing", choices=["html", "json"], default="html")
+    work_p.add_argument("-b", "--batch", type=int, default=1, help="Tasks per lease")
+    work_p.add_argument("-m", "--max", type=int, help="Stop after this many tasks")
+    work_p.add_argument("--memory-ceiling", type=int, default=2048, metavar="MB")
+    work_p.add_argument("--trace", help="Append navigation traces to this JSONL file")
+    work_p.add_argument("-l", "--log", action="store_true", help="Verbose logging")
+    metrics.add_arguments(work_p)
+
+    sub.add_parser("status", help="Show task counts by state")
+    args = parser.parse_args(argv)
+
+    queue = CrawlQueue(args.db, args.lease)
+    if args.command == "seed":
+        from downloader import SAVED_DIR
+
+        queue.mark_done(structured_post_ids(SAVED_DIR))
+        added = sum(
+            queue.add_listing(seed.name, seed.next_ref)
+            for seed in build_seeds(args.query, args.tag, args.spec)
+        )
+        print(f"[INFO] Queued {added} seed listing page(s)")
+        print_counts(queue)
+    elif args.command == "status":
+        print_counts(queue)
+    else:
+        import nav_trace
+        from memwatch import MemoryWatch
+
+        metrics.configure(args)
+        if args.trace:
+            nav_trace.enable(args.trace)
+        worker = worker_name()
+        print(f"[INFO] Worker {worker} leasing from {args.db}")
+        start = time.time()
+        with metrics.stage("worker"):
+            done = work(
+                queue,
+                worker,
+                listing_mode=args.listing,
+                batch=args.batch,
+                max_tasks=args.max,
+                verbose=args.log,
+                watch=MemoryWatch(args.memory_ceiling),
+            )
+        print(f"[INFO] {worker} ran {done} task(s) in {time.time() - start:.2f}s")
+        print_counts(queue)
+        nav_trace.close()
+        metrics.finish(args)
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import argparse
+from array import array
+
+import metrics
+from filter import extract_first_policy_block, load_json
+from parser import iter_structured_posts
+
+# Near-duplicate detection between structuring and filter.py. Each post gets
+# a MinHash signature of its body text and one of its canonicalized policy;
+# signatures and their LSH band keys live in SQLite, so a new post is compared
+# only against posts sharing a band instead of the whole corpus. Clusters are
+# kept in SQLite too, as union-find parent links, and each build only re-links
+# posts signed or removed since the last one. They are written to
+# saved_pages/duplicates.json, which filter.py uses to skip duplicates.
+#
+#   python dedupe.py build
+#   python dedupe.py check <post folder>
+
+SAVED_DIR = "saved_pages"
+DB_PATH = "dedupe.db"
+DUPLICATES_FILE = "duplicates.json"
+
+NUM_PERM = 128
+BANDS = 16  # 16 bands x 8 rows: pairs around 0.7 Jaccard start to collide
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.8  # estimated Jaccard needed to call two posts duplicates
+KINDS = ("body", "policy")
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(20240901)  # fixed so stored signatures stay comparable
+PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE))
+    for _ in range(NUM_PERM)
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    folder TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    sig BLOB NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (folder, kind)
+);
+CREATE TABLE IF NOT EXISTS bands (
+    kind TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    folder TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_lookup ON bands(kind, band, key);
+CREATE INDEX IF NOT EXISTS bands_folder ON bands(folder, kind);
+CREATE TABLE IF NOT EXISTS clusters (
+    kind TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    PRIMARY KEY (kind, folder)
+);
+CREATE TABLE IF NOT EXISTS pending (
+    kind TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    PRIMARY KEY (kind, folder)
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# -----------------------------------------------------------------------------
+# SHINGLES AND SIGNATURES
+# -----------------------------------------------------------------------------
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+def _shingles(tokens, size):
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def body_shingles(text):
+    return _shingles(re.findall(r"\w+", text.lower()), 5)
+
+
+# Sorts keys and string lists and lowercases actions, so reordered or
+# re-indented copies of one policy produce the same text
+def canonical_policy(policy):
+    def canon(node, key=None):
+        if isinstance(node, dict):
+            return {k: canon(v, k) for k, v in sorted(node.items())}
+        if isinstance(node, list):
+            items = [canon(v, key) for v in node]
+            if all(isinstance(v, str) for v in items):
+                items.sort()
+            return items
+        if isinstance(node, str) and key in ("Action", "NotAction"):
+            return node.lower()
+        return node
+
+    return json.dumps(canon(policy), sort_keys=True, separators=(",", ":"))
+
+
+def policy_shingles(policy):
+    return _shingles(re.findall(r"[\w:*/.\-]+", canonical_policy(policy)), 3)
+
+
+def minhash(shingles):
+    if not shingles:
+        return None
+    hashes = [_hash64(s) for s in shingles]
+    return array(
+        "Q", (min((a * h + b) % _MERSENNE for h in hashes) for a, b in PERMUTATIONS)
+    )
+
+
+def similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+# One key per band; SQLite integers are signed, so keep keys in 63 bits
+def band_keys(sig):
+    return [
+        _hash64(",".join(map(str, sig[i * ROWS : (i + 1) * ROWS]))) >> 1
+        for i in range(BANDS)
+    ]
+
+
+def post_signatures(folder_path):
+    body = load_json(os.path.join(folder_path, "body.json")).get("body", "")
+    return body_signatures(body)
+
+
+def body_signatures(body):
+    policy, _ = extract_first_policy_block(body)
+    return {
+        "body": minhash(body_shingles(body)),
+        "policy": minhash(policy_shingles(policy)) if policy else None,
+    }
+
+
+# -----------------------------------------------------------------------------
+# INDEX
+# -----------------------------------------------------------------------------
+# Posts without a signature of one kind (an empty body, no policy) still get
+# a row, with an empty blob and no band keys, so later builds see their mtime
+# and skip them
+def _store(conn, folder, mtime, sigs):
+    _forget(conn, folder)
+    for kind, sig in sigs.items():
+        conn.execute(
+            "INSERT INTO signatures (folder, kind, sig, mtime) VALUES (?, ?, ?, ?)",
+            (folder, kind, sig.tobytes() if sig is not None else b"", mtime),
+        )
+        if sig is None:
+            continue
+        conn.executemany(
+            "INSERT INTO bands (kind, band, key, folder) VALUES (?, ?, ?, ?)",
+            [(kind, i, key, folder) for i, key in enumerate(band_keys(sig))],
+        )
+
+
+def _forget(conn, folder):
+    conn.execute("DELETE FROM signatures WHERE folder = ?", (folder,))
+    conn.execute("DELETE FROM bands WHERE folder = ?", (folder,))
+
+
+# Queues a signed or removed folder for re-linking by the next cluster()
+def _mark_pending(conn, folder):
+    conn.executemany(
+        "INSERT OR IGNORE INTO pending (kind, folder) VALUES (?, ?)",
+        [(kind, folder) for kind in KINDS],
+    )
+
+
+def _load_sig(blob):
+    sig = array("Q")
+    sig.frombytes(blob)
+    return sig
+
+
+# Signs new or changed posts (by body.json mtime) and drops removed ones.
+# Returns (signed, removed, unchanged).
+def update_index(saved_dir=SAVED_DIR, db_path=DB_PATH, verbose=False):
+    conn = connect(db_path)
+    known = dict(
+        conn.execute("SELECT folder, MAX(mtime) FROM signatures GROUP BY folder")
+    )
+    mtimes = {}  # every post present, by body.json mtime
+
+    # Runs before the body is read, so unchanged posts are never loaded
+    def changed(post):
+        folder = post["folder"]
+        mtimes[folder] = os.stat(os.path.join(saved_dir, folder, "body.json")).st_mtime
+        return known.get(folder) != mtimes[folder]
+
+    signed = 0
+    with conn:
+        for post in iter_structured_posts(saved_dir, where=changed, fields=("body",)):
+            folder = post["folder"]
+            with metrics.timer("minhash_seconds"):
+                sigs = body_signatures(post["body"])
+            _store(conn, folder, mtimes[folder], sigs)
+            _mark_pending(conn, folder)
+            signed += 1
+            if verbose:
+                print(f"[+] Signed {folder}")
+
+        removed = [folder for folder in known if folder not in mtimes]
+        for folder in removed:
+            _forget(conn, folder)
+            _mark_pending(conn, folder)
+
+    conn.close()
+    return signed, len(removed), len(mtimes) - signed
+
+
+# Folders sharing at least one band key with `folder`; only those are compared
+def _candidates(conn, kind, folder):
+    rows = conn.execute(
+        "SELECT DISTINCT other.folder FROM bands AS own JOIN bands AS other"
+        " ON other.kind = own.kind AND other.band = own.band AND other.key = own.key"
+        " WHERE own.kind = ? AND own.folder = ? AND other.folder != own.folder",
+        (kind, folder),
+    )
+    return [r[0] for r in rows]
+
+
+def _signature(conn, kind, folder, cache):
+    if folder not in cache:
+        row = conn.execute(
+            "SELECT sig FROM signatures WHERE folder = ? AND kind = ?",
+            (folder, kind),
+        ).fetchone()
+        cache[folder] = _load_sig(row[0]) if row and row[0] else None
+    return cache[folder]
+
+
+# Keeps the post most useful to filter.py: one with an accepted answer, then
+# the earliest published, then by folder name for stable output
+def _representative(saved_dir, members):
+    def rank(folder):
+        folder_path = os.path.join(saved_dir, folder)
+        has_answer = os.path.exists(os.path.join(folder_path, "accepted_answer.json"))
+        meta_path = os.path.join(folder_path, "metadata.json")
+        meta = load_json(meta_path) if os.path.exists(meta_path) else {}
+        return (not has_answer, meta.get("date") or "~", folder)
+
+    return min(members, key=rank)
+
+
+def _groups(parent, find):
+    groups = {}
+    for folder in parent:
+        groups.setdefault(find(folder), set()).add(folder)
+    for root, members in groups.items():
+        members.add(root)
+    return groups
+
+
+# Brings the stored clusters up to date and returns them. Clusters holding a
+# pending (signed or removed) folder are dissolved, and their remaining
+# members and the new folders are compared against their band candidates
+# again; other clusters are left as they are. A different threshold than last
+# time re-links every folder.
+def cluster(kind, saved_dir=SAVED_DIR, db_path=DB_PATH, threshold=THRESHOLD):
+    conn = connect(db_path)
+    try:
+        with conn:
+            stored = dict(
+                conn.execute(
+                    "SELECT folder, parent FROM clusters WHERE kind = ?", (kind,)
+                )
+            )
+            parent = dict(stored)
+
+            def find(x):
+                while parent.get(x, x) != x:
+                    parent[x] = parent.get(parent[x], parent[x])
+                    x = parent[x]
+                return x
+
+            setting = f"threshold:{kind}"
+            row = conn.execute(
+                "SELECT value FROM settings WHERE key = ?", (setting,)
+            ).fetchone()
+            if row is None or float(row[0]) != threshold:
+                parent.clear()
+                relink = {
+                    r[0]
+                    for r in conn.execute(
+                        "SELECT folder FROM signatures WHERE kind = ?", (kind,)
+                    )
+                }
+            else:
+                relink = {
+                    r[0]
+                    for r in conn.execute(
+                        "SELECT folder FROM pending WHERE kind = ?", (kind,)
+                    )
+                }
+                groups = _groups(parent, find)
+                for folder in list(relink):
+                    members = groups.pop(find(folder), {folder})
+                    relink.update(members)
+                    for member in members:
+                        parent.pop(member, None)
+
+            sigs = {}
+            compared = set()
+            for a in sorted(relink):
+                if _signature(conn, kind, a, sigs) is None:
+                    continue  # removed, or nothing to sign
+                for b in _candidates(conn, kind, a):
+                    pair = (a, b) if a < b else (b, a)
+                    if pair in compared:
+                        continue
+                    compared.add(pair)
+                    metrics.inc("dedupe_comparisons_total", kind=kind)
+                    sig_b = _signature(conn, kind, b, sigs)
+                    if similarity(sigs[a], sig_b) >= threshold:
+                        root_a, root_b = find(a), find(b)
+                        if root_a != root_b:
+                            parent[root_b] = root_a
+
+            conn.executemany(
+                "DELETE FROM clusters WHERE kind = ? AND folder = ?",
+                [(kind, f) for f in stored if f not in parent],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO clusters (kind, folder, parent)"
+                " VALUES (?, ?, ?)",
+                [(kind, f, p) for f, p in parent.items() if stored.get(f) != p],
+            )
+            conn.execute("DELETE FROM pending WHERE kind = ?", (kind,))
+            conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                (setting, repr(threshold)),
+            )
+    finally:
+        conn.close()
+
+    return [sorted(members) for members in _groups(parent, find).values()]
+
+
+# Maps every duplicate folder to the folder kept for its cluster
+def write_duplicates(saved_dir=SAVED_DIR, db_path=DB_PATH, threshold=THRESHOLD):
+    report = {}
+    for kind in KINDS:
+        mapping = {}
+        for members in cluster(kind, saved_dir, db_path, threshold):
+            keep = _representative(saved_dir, members)
+            for folder in members:
+                if folder != keep:
+                    mapping[folder] = keep
+        report[kind] = dict(sorted(mapping.items()))
+        metrics.inc("dedupe_duplicates_total", len(mapping), kind=kind)
+
+    with open(os.path.join(saved_dir, DUPLICATES_FILE), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+# Near-duplicates of one post, looked up through its band keys
+def similar_posts(folder, saved_dir=SAVED_DIR, db_path=DB_PATH, threshold=THRESHOLD):
+    sigs = post_signatures(os.path.join(saved_dir, folder))
+    conn = connect(db_path)
+    matches = []
+    try:
+        for kind, sig in sigs.items():
+            if sig is None:
+                continue
+            candidates = set()
+            for band, key in enumerate(band_keys(sig)):
+                rows = conn.execute(
+                    "SELECT folder FROM bands WHERE kind = ? AND band = ? AND key = ?",
+                    (kind, band, key),
+                )
+                candidates.update(r[0] for r in rows)
+            candidates.discard(folder)
+            for other in sorted(candidates):
+                row = conn.execute(
+                    "SELECT sig FROM signatures WHERE folder = ? AND kind = ?",
+                    (other, kind),
+                ).fetchone()
+                score = similarity(sig, _load_sig(row[0]))
+                if score >= threshold:
+                    matches.append((kind, other, score))
+    finally:
+        conn.close()
+    return matches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find near-duplicate posts and policies with MinHash/LSH."
+    )
+    parser.add_argument("--db", default=DB_PATH, help="Signature database path")
+    parser.add_argument("--saved-dir", default=SAVED_DIR)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help=f"Estimated Jaccard similarity for duplicates (default {THRESHOLD})",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_p = sub.add_parser(
+        "build", help=f"Sign new posts and write {DUPLICATES_FILE} for filter.py"
+    )
+    build_p.add_argument("-l", "--log", action="store_true", help="Verbose logging")
+    metrics.add_arguments(build_p)
+
+    check_p = sub.add_parser("check", help="List near-duplicates of one post folder")
+    check_p.add_argument("folder")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    if args.command == "check":
+        matches = similar_posts(args.folder, args.saved_dir, args.db, args.threshold)
+        for kind, other, score in matches:
+            print(f"[=] {kind:<6} {score:.2f}  {other}")
+        print(f"[INFO] {len(matches)} near-duplicate(s) of '{args.folder}'")
+        return
+
+    metrics.configure(args)
+    with metrics.stage("dedupe"):
+        signed, removed, unchanged = update_index(args.saved_dir, args.db, args.log)
+        print(
+            f"[INFO] Signed {signed} post(s), removed {removed}, {unchanged} unchanged"
+        )
+        report = write_duplicates(args.saved_dir, args.db, args.threshold)
+    for kind in KINDS:
+        print(f"[INFO] {len(report[kind])} duplicate {kind}(s) flagged")
+    metrics.finish(args)
+    print(f"[INFO] Done in {time.time() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
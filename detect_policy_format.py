@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 import os
+import copy
 import json
-import sys
 import argparse
 import shutil
 from typing import Any, List, Set
 
+import metrics
+from filter import read_json, write_json
+
 FOLDER_PATH = "filtered_pages"
 QUARANTINE_ROOT = "quarantined_pages"
 
@@ -21,18 +24,15 @@ def detect_policy_issues(
 ) -> List[str]:
     issues: List[str] = []
     try:
-        raw = open(path, "r", encoding="utf-8").read()
-    except Exception as e:
-        if not limited:
-            issues.append(f"Error opening file: {e}")
-        return issues
-
-    try:
-        policy = json.loads(raw)
+        policy = read_json(path)
     except json.JSONDecodeError as e:
         if not limited:
             issues.append(f"Invalid JSON: {e.msg}")
         return issues
+    except Exception as e:
+        if not limited:
+            issues.append(f"Error opening file: {e}")
+        return issues
 
     stmts = policy.get("Statement")
     if stmts is None:
@@ -76,8 +76,7 @@ def repair_policy(
 ) -> bool:
     modified = False
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            policy = json.load(f)
+        policy = copy.deepcopy(read_json(path))  # may be shared with the cache
     except Exception:
         return False
 
@@ -112,8 +111,7 @@ def repair_policy(
         modified = True
 
     if modified:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(policy, f, indent=2)
+        write_json(path, policy)
     return modified
 
 
@@ -137,7 +135,7 @@ def quarantine_files(path: str):
             os.remove(intent_src)
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Detect, repair, and quarantine AWS IAM policy JSON files under filtered_pages."
     )
@@ -151,11 +149,13 @@ def main():
         "--repair",
         help="Comma-separated list of repair actions: all, SID, statement, condition, empty-stmt, quarantine",
     )
-    args = parser.parse_args()
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics.configure(args)
 
-    if len(sys.argv) == 1:
+    if not args.detect and not args.repair:
         parser.print_help()
-        sys.exit(0)
+        return
 
     detect_sel: Set[str] = (
         {s.strip().lower() for s in args.detect.split(",")} if args.detect else set()
@@ -183,47 +183,51 @@ def main():
     repair_count = 0
     quarantine_count = 0
 
-    for root, dirs, files in os.walk(FOLDER_PATH):
-        dirs[:] = [d for d in dirs if d.lower() != "intent"]
-        for fname in files:
-            if not fname.lower().endswith(".json"):
-                continue
-            path = os.path.join(root, fname)
-
-            if detect_sel:
-                issues = detect_policy_issues(
-                    path,
-                    check_sid_d,
-                    check_ra_d,
-                    check_empty_cond,
-                    check_empty_stmt_d,
-                    check_stmt_d,
-                    limited_d,
-                )
-                if issues:
-                    detect_count += 1
-                    print(f"{path}:")
-                    for issue in issues:
-                        print(f"  - {issue}")
-                    print()
-
-            if repair_sel and repair_policy(
-                path, repair_sid, repair_stmt, repair_empty_cond, repair_empty_stmt
-            ):
-                repair_count += 1
-
-            if quarantine_r:
-                issues_q = detect_policy_issues(
-                    path, False, True, False, False, False, False
-                )
-                if any(
-                    "missing 'Effect'" in i
-                    or "missing 'Action'" in i
-                    or "missing 'Resource'" in i
-                    for i in issues_q
+    with metrics.stage("lint"):
+        for root, dirs, files in os.walk(FOLDER_PATH):
+            dirs[:] = [d for d in dirs if d.lower() != "intent"]
+            for fname in files:
+                if not fname.lower().endswith(".json"):
+                    continue
+                path = os.path.join(root, fname)
+                metrics.inc("lint_files_checked_total")
+
+                if detect_sel:
+                    issues = detect_policy_issues(
+                        path,
+                        check_sid_d,
+                        check_ra_d,
+                        check_empty_cond,
+                        check_empty_stmt_d,
+                        check_stmt_d,
+                        limited_d,
+                    )
+                    if issues:
+                        detect_count += 1
+                        metrics.inc("lint_files_flagged_total")
+                        print(f"{path}:")
+                        for issue in issues:
+                            print(f"  - {issue}")
+                        print()
+
+                if repair_sel and repair_policy(
+                    path, repair_sid, repair_stmt, repair_empty_cond, repair_empty_stmt
                 ):
-                    quarantine_files(path)
-                    quarantine_count += 1
+                    repair_count += 1
+                    metrics.inc("lint_files_repaired_total")
+
+                if quarantine_r:
+                    issues_q = detect_policy_issues(
+                        path, False, True, False, False, False, False
+                    )
+                    if any(
+                        "missing 'Effect'" in i
+                        or "missing 'Action'" in i
+                        or "missing 'Resource'" in i
+                        for i in issues_q
+                    ):
+                        quarantine_files(path)
+                        quarantine_count += 1
 
     if detect_sel:
         print(f"Total policies flagged: {detect_count}")
@@ -231,6 +235,7 @@ def main():
         print(f"Total policies repaired: {repair_count}")
     if quarantine_r:
         print(f"Total policies quarantined: {quarantine_count}")
+    metrics.finish(args)
 
 
 if __name__ == "__main__":
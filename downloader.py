@@ -7,17 +7,62 @@
 # TODO:
 # Fix flags (download and structure don't work)
 
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
 import os
 import time
 import random
 from urllib.parse import urlparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from playwright.sync_api import sync_playwright
+import metrics
+import nav_trace
+from frontier import DEFAULT_QUERY, search_url
 
 SAVED_DIR = "saved_pages/"
-os.makedirs(SAVED_DIR, exist_ok=True)
+
+# Page readiness. Navigation only waits for DOMContentLoaded; the page is then
+# saved as soon as any of the signals in READY_JS fires.
+WAIT_UNTIL = "domcontentloaded"
+READY_TIMEOUT = 15000  # ms, upper bound when no signal ever fires
+QUIET_MS = 1500  # DOM considered settled after this long without mutations
+CONTENT_SELECTOR = ".custom-md-style"
+NO_CONTENT_MARKERS = [
+    "Page not found",
+    "This question has been deleted",
+    "The content you are looking for is not available",
+]
+
+# Bot-check interstitials. Looked up in the page's text (including <noscript>)
+# so the DOM is only serialized once, when the page is saved.
+CAPTCHA_MARKERS = ["JavaScript is disabled", "verify that you're not a robot"]
+CAPTCHA_JS = """
+(markers) => {
+    const text = document.documentElement ? document.documentElement.textContent : "";
+    return markers.some((m) => text.includes(m));
+}
+"""
+
+# Returns the name of the first signal that fired, or false to keep polling
+READY_JS = """
+([selector, markers, quietMs]) => {
+    if (!window.__readyState) {
+        window.__readyState = { last: performance.now() };
+        new MutationObserver(() => {
+            window.__readyState.last = performance.now();
+        }).observe(document, {
+            subtree: true, childList: true, attributes: true, characterData: true,
+        });
+    }
+    if (document.querySelector(selector)) return "selector";
+    const text = document.body ? document.body.innerText : "";
+    if (markers.some((m) => text.includes(m))) return "no_content";
+    if (document.readyState === "loading"
+        || performance.now() - window.__readyState.last < quietMs) return false;
+    // Settled without the content selector. The ld+json block is server
+    // rendered in <head>, so it only tells a post page from other pages here,
+    // never as an early signal (the body may still be rendering).
+    if (document.querySelector('script[type="application/ld+json"]')) return "ld_json";
+    return "quiescent";
+}
+"""
 
 
 # Convert URL to safe filename
@@ -34,7 +79,21 @@ def generate_filename(url):
     return os.path.join(SAVED_DIR, f"{path}.html")
 
 
-def save_page(url, context, name="", verbose=False, proxy=None):
+# Races the readiness signals; returns which one fired, or "timeout"
+def wait_until_ready(page, timeout=READY_TIMEOUT):
+    try:
+        handle = page.wait_for_function(
+            READY_JS,
+            arg=[CONTENT_SELECTOR, NO_CONTENT_MARKERS, QUIET_MS],
+            timeout=timeout,
+            polling=100,
+        )
+        return handle.json_value()
+    except Exception:
+        return "timeout"
+
+
+def save_page(url, context, name="", verbose=False, proxy=None, kind="post"):
     if not name:
         name = url.split("/")[-1] or "index"
 
@@ -44,57 +103,79 @@ def save_page(url, context, name="", verbose=False, proxy=None):
             print(f"[=] Skipping (already saved): {url}")
         return True
 
-    # Creates a new page from shared browser context
+    # Creates a new page from shared browser context. The page is closed on
+    # every path out of here, including exceptions raised into save_page_safe.
+    trace = nav_trace.NavTrace(url, kind)
     page = context.new_page()
+    try:
+        return _fetch(page, url, path, trace, verbose)
+    finally:
+        page.close()
 
-    # Stealth anti bot patches
-    page.add_init_script(
-        """
-        Object.defineProperty(navigator, 'webdriver', { get: () => false });
-        Object.defineProperty(navigator, 'platform', { get: () => 'Win32' });
-        window.chrome = { runtime: {} };
-        Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3] });
-        Object.defineProperty(navigator, 'languages', { get: () => ['en-US', 'en'] });
-    """
-    )
+
+def _fetch(page, url, path, trace, verbose):
+    trace.attach(page)
 
     if verbose:
         print(f"[>] Saving: {url}")
 
     # Attempts to load page
     try:
-        page.goto(url, timeout=60000)
+        with trace.phase("goto"):
+            page.goto(url, timeout=60000, wait_until=WAIT_UNTIL)
     except Exception as e:
         print(f"[!] Failed to load page {url}: {e}")
+        metrics.inc("page_failures_total")
+        trace.finish("goto_failed", error=str(e).splitlines()[0])
         return False
 
-    # Checks for CAPTCHA
-    content = page.content()
-    if (
-        "JavaScript is disabled" in content
-        or "verify that you're not a robot" in content
-    ):
+    # Checks for CAPTCHA in the browser, without serializing the DOM
+    with trace.phase("captcha_check"):
+        captcha = page.evaluate(CAPTCHA_JS, CAPTCHA_MARKERS)
+    if captcha:
+        metrics.inc("captchas_total")
         if verbose:
             print(f"[!] CAPTCHA detected on: {url}")
         try:
             # Waits for user to solve CAPTCHA (indefinitely)
-            page.wait_for_selector(".custom-md-style", timeout=0)
+            with trace.phase("captcha_solve"):
+                page.wait_for_selector(CONTENT_SELECTOR, timeout=0)
         except:
             print("[!] Manual CAPTCHA solve timeout.")
 
-    # Waits for page to load context
-    try:
-        page.wait_for_selector(".custom-md-style", timeout=15000)
-    except:
-        if verbose:
-            print("[!] Warning: content selector `.custom-md-style` not found.")
-
-    # Save HTML content
-    content = page.content()
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(content)
-
-    page.close()
+    # Waits until the page is ready to save
+    with trace.phase("ready_wait"):
+        signal = wait_until_ready(page)
+    if signal == "selector":
+        trace.mark("content_ready")  # when .custom-md-style appeared
+    metrics.inc("page_ready_total", signal=signal)
+    if signal != "selector" and verbose:
+        print(f"[!] Warning: content selector not found, saved on '{signal}'.")
+
+    # Serializes the DOM once and writes it to a .part file that is renamed
+    # into place, so an interrupted write never looks like a saved page. The
+    # .part name is per process, as crawl workers may share saved_pages.
+    with trace.phase("content"):
+        content = page.content()
+    with trace.phase("write"):
+        os.makedirs(SAVED_DIR, exist_ok=True)
+        part = f"{path}.{os.getpid()}.part"
+        with open(part, "w", encoding="utf-8") as f:
+            f.write(content)
+        del content
+        os.replace(part, path)
+    dom_bytes = os.path.getsize(path)
+
+    trace.navigation_timing(page)
+    metrics.inc("pages_fetched_total")
+    metrics.inc("page_bytes_total", dom_bytes)
+    trace.finish(
+        "saved" if signal == "selector" else "saved_without_content",
+        ready_signal=signal,
+        captcha=captcha,
+        dom_bytes=dom_bytes,
+    )
+    metrics.observe("page_fetch_seconds", trace.record["total"])
     return True
 
 
@@ -107,20 +188,32 @@ def save_page_safe(url, context, verbose=False):
             print(f"[!] Error saving {url}: {e}")
 
 
-def scrape_page(url, context, verbose=False):
+# Saves the search results page as <name>.html and returns (post links, next
+# page URL). With keep=False the file is fetched fresh (a leftover copy would
+# make save_page skip the download) and deleted once parsed, as crawl workers
+# do with their per-worker listing names.
+def scrape_page(url, context, verbose=False, name="index", keep=True):
+    from bs4 import BeautifulSoup
+
     next_url = None  # Default value if nothing is found
+    path = os.path.join(SAVED_DIR, f"{name}.html")
+    if not keep and os.path.exists(path):
+        os.remove(path)
 
-    # Downloads search page results
-    success = save_page(url, context, name="index", verbose=verbose)
+    # Downloads search page results. None (not an empty page) when the page
+    # could not be fetched, so callers can retry instead of ending the crawl
+    success = save_page(url, context, name=name, verbose=verbose, kind="listing")
     if not success:
         if verbose:
             print(f"[!] Skipping parse of {url} due to failed save.")
-        return [], None
+        return None
 
     # Loads saved HTML
-    with open(os.path.join(SAVED_DIR, "index.html"), "r", encoding="utf-8") as f:
+    with open(path, "r", encoding="utf-8") as f:
 
         soup = BeautifulSoup(f, "html.parser")
+    if not keep:
+        os.remove(path)
 
     valid_links = []
 
@@ -158,7 +251,7 @@ def iterate_pages(verbose=False):
         tuple: (number of pages visited, list of unique post links)
     """
 
-    base_url = "https://repost.aws/search/content?globalSearch=IAM+Policy&sort=recent"
+    base_url = search_url(DEFAULT_QUERY)
     page = 1
     all_links = []
 
@@ -166,7 +259,7 @@ def iterate_pages(verbose=False):
     while next_url:
         if verbose:
             print(f"[Downloader] Scraping page {page}: {next_url}")
-        links, next_url = scrape_page(next_url, verbose=verbose)
+        links, next_url = scrape_page(next_url, verbose=verbose) or ([], None)
         all_links.extend(links)
         page += 1
         # TODO Pagination
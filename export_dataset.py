@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+import os
+import mmap
+import json
+import time
+import bisect
+import struct
+import hashlib
+import argparse
+
+from filter import read_sources
+
+# Packs the filtered_pages buckets into a sharded binary dataset. Every
+# example (original policy, intent, result) becomes one fixed-size index
+# record pointing at UTF-8 blobs in a data file, so a reader memory-maps both
+# files and reaches any example in O(1) without copying.
+#
+#   dataset/manifest.json          splits, shards, fields and buckets
+#   dataset/<split>-NNNNN.bin      concatenated UTF-8 blobs
+#   dataset/<split>-NNNNN.idx      8-byte magic, then one RECORD per example
+#
+# Splits are assigned by hashing the source post (from sources.jsonl, written
+# by filter.py), so all examples from one post land in the same split.
+# Without a source the original policy text is hashed instead.
+#
+#   python export_dataset.py build
+#   python export_dataset.py show train 0
+
+FILTERED_DIR = "filtered_pages"
+OUT_DIR = "dataset"
+BUCKETS = ("repaired", "broken", "relaxed")
+FIELDS = ("original_policy", "intent", "results")
+SPLITS = (("train", 0.8), ("validation", 0.1), ("test", 0.1))
+SHARD_BYTES = 256 * 1024 * 1024
+SEED = "iam-dataset-v1"  # part of the split hash; changing it reshuffles
+
+MAGIC = b"IAMIDX01"
+# (offset, length) per field, example number, bucket id, padding
+RECORD = struct.Struct("<" + "QQ" * len(FIELDS) + "IB3x")
+
+
+def _read_bytes(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+def split_of(key, splits=SPLITS):
+    digest = hashlib.sha1(f"{SEED}:{key}".encode()).digest()
+    point = int.from_bytes(digest[:8], "big") / 2**64
+    edge = 0.0
+    for name, fraction in splits:
+        edge += fraction
+        if point < edge:
+            return name
+    return splits[-1][0]
+
+
+# Yields (bucket, number, split_key, blobs) in bucket and example order
+def iter_examples(filtered_dir=FILTERED_DIR):
+    for bucket in BUCKETS:
+        bucket_dir = os.path.join(filtered_dir, bucket)
+        policy_dir = os.path.join(bucket_dir, "original_policy")
+        if not os.path.isdir(policy_dir):
+            continue
+        sources = read_sources(bucket_dir)
+        numbers = sorted(
+            int(name[: -len(".json")])
+            for name in os.listdir(policy_dir)
+            if name.endswith(".json") and name[: -len(".json")].isdigit()
+        )
+        for number in numbers:
+            blobs = [
+                _read_bytes(os.path.join(bucket_dir, field, f"{number}.json"))
+                for field in FIELDS
+            ]
+            source = sources.get(number)
+            if source is not None:
+                key = f"post:{source}"
+            else:
+                key = "policy:" + hashlib.sha1(blobs[0]).hexdigest()
+            yield bucket, number, key, blobs
+
+
+class _ShardWriter:
+    def __init__(self, out_dir, split, shard_bytes):
+        self.out_dir = out_dir
+        self.split = split
+        self.shard_bytes = shard_bytes
+        self.shards = []
+        self.bin = self.idx = None
+
+    def _open(self):
+        name = f"{self.split}-{len(self.shards):05d}"
+        self.bin = open(os.path.join(self.out_dir, name + ".bin"), "wb")
+        self.idx = open(os.path.join(self.out_dir, name + ".idx"), "wb")
+        self.idx.write(MAGIC)
+        self.shards.append({"name": name, "count": 0, "bytes": 0})
+
+    def write(self, bucket_id, number, blobs):
+        size = sum(len(b) for b in blobs)
+        if self.bin is None or (
+            self.shards[-1]["count"] and self.bin.tell() + size > self.shard_bytes
+        ):
+            self.close()
+            self._open()
+        spans = []
+        for blob in blobs:
+            spans += [self.bin.tell(), len(blob)]
+            self.bin.write(blob)
+        self.idx.write(RECORD.pack(*spans, number, bucket_id))
+        self.shards[-1]["count"] += 1
+        self.shards[-1]["bytes"] += size
+
+    def close(self):
+        if self.bin is not None:
+            self.bin.close()
+            self.idx.close()
+            self.bin = self.idx = None
+
+
+def build(filtered_dir=FILTERED_DIR, out_dir=OUT_DIR, shard_bytes=SHARD_BYTES):
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.endswith((".bin", ".idx")) or name == "manifest.json":
+            os.remove(os.path.join(out_dir, name))
+
+    writers = {name: _ShardWriter(out_dir, name, shard_bytes) for name, _ in SPLITS}
+    counts = {}
+    for bucket, number, key, blobs in iter_examples(filtered_dir):
+        split = split_of(key)
+        writers[split].write(BUCKETS.index(bucket), number, blobs)
+        counts.setdefault(split, {}).setdefault(bucket, 0)
+        counts[split][bucket] += 1
+    for writer in writers.values():
+        writer.close()
+
+    manifest = {
+        "format": MAGIC.decode(),
+        "record": RECORD.format,
+        "fields": list(FIELDS),
+        "buckets": list(BUCKETS),
+        "seed": SEED,
+        "splits": {
+            name: {
+                "fraction": fraction,
+                "counts": counts.get(name, {}),
+                "shards": writers[name].shards,
+            }
+            for name, fraction in SPLITS
+        },
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# -----------------------------------------------------------------------------
+# READER
+# -----------------------------------------------------------------------------
+class Dataset:
+    """Memory-mapped view of one split.
+
+    ds[i] returns {"bucket", "number", <field>: memoryview} without copying;
+    ds.text(i) decodes the fields to str.
+    """
+
+    def __init__(self, out_dir=OUT_DIR, split="train"):
+        with open(os.path.join(out_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.fields = self.manifest["fields"]
+        self.buckets = self.manifest["buckets"]
+        self._files = []
+        self._shards = []  # (idx view, bin view)
+        self._firsts = []  # index of each shard's first example
+        total = 0
+        for shard in self.manifest["splits"][split]["shards"]:
+            base = os.path.join(out_dir, shard["name"])
+            idx = self._map(base + ".idx")
+            data = self._map(base + ".bin")
+            if bytes(idx[: len(MAGIC)]) != MAGIC:
+                raise ValueError(f"{base}.idx is not a dataset index")
+            self._shards.append((idx, data))
+            self._firsts.append(total)
+            total += shard["count"]
+        self._len = total
+
+    def _map(self, path):
+        f = open(path, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        shard = bisect.bisect_right(self._firsts, i) - 1
+        idx, data = self._shards[shard]
+        local = i - self._firsts[shard]
+        values = RECORD.unpack_from(idx, len(MAGIC) + local * RECORD.size)
+        example = {"bucket": self.buckets[values[-1]], "number": values[-2]}
+        for n, field in enumerate(self.fields):
+            offset, length = values[2 * n], values[2 * n + 1]
+            example[field] = data[offset : offset + length]
+        return example
+
+    def text(self, i):
+        example = self[i]
+        for field in self.fields:
+            example[field] = str(example[field], "utf-8")
+        return example
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        self._files = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export filtered policies as a memory-mapped binary dataset."
+    )
+    parser.add_argument("--out", default=OUT_DIR, help="Dataset directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_p = sub.add_parser("build", help="Pack filtered_pages into the dataset")
+    build_p.add_argument("--filtered-dir", default=FILTERED_DIR)
+    build_p.add_argument(
+        "--shard-mb",
+        type=int,
+        default=SHARD_BYTES // (1024 * 1024),
+        help="Start a new shard once a data file reaches this size",
+    )
+
+    show_p = sub.add_parser("show", help="Print one example")
+    show_p.add_argument("split", choices=[name for name, _ in SPLITS])
+    show_p.add_argument("index", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        ds = Dataset(args.out, args.split)
+        print(json.dumps(ds.text(args.index), indent=2))
+        ds.close()
+        return
+
+    start = time.time()
+    manifest = build(args.filtered_dir, args.out, args.shard_mb * 1024 * 1024)
+    for name, split in manifest["splits"].items():
+        counts = ", ".join(f"{n} {b}" for b, n in sorted(split["counts"].items()))
+        print(
+            f"[INFO] {name}: {sum(split['counts'].values())} example(s) "
+            f"in {len(split['shards'])} shard(s) ({counts or 'empty'})"
+        )
+    print(f"[INFO] Dataset written to {args.out} in {time.time() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ import time
 import argparse
 import sys
 import re
+import metrics
+import lenient_json
+from parser import iter_structured_posts
 
 
 # Prints and overwrites terminal line (used for progress)
@@ -12,8 +15,43 @@ def print_status(message):
     sys.stdout.flush()
 
 
-# Attempts to extract the first valid IAM policy block (JSON) from text
-def extract_first_policy_block(text):
+# Matches IAM style policy of Effect + Action, or a policy whose first
+# Statement has them
+def is_policy(data):
+    if not isinstance(data, dict):
+        return False
+    if "Effect" in data and "Action" in data:
+        return True
+    stmts = data.get("Statement")
+    if isinstance(stmts, dict):
+        stmts = [stmts]
+    if isinstance(stmts, list) and len(stmts) > 0:
+        stmt = stmts[0]
+        return isinstance(stmt, dict) and "Effect" in stmt and "Action" in stmt
+    return False
+
+
+# Reads text[start:end] as JSON, falling back to lenient_json when it is not
+# strict JSON. Returns (data, fixes applied), or (None, []).
+def read_block(text, start, end, lenient=True):
+    try:
+        return json.loads(text[start:end]), []
+    except (ValueError, RecursionError):
+        if not lenient:
+            return None, []
+    try:
+        data, _, fixes = lenient_json.parse(text[start:end])
+        return data, fixes
+    except lenient_json.ParseError:
+        return None, []
+
+
+# Attempts to extract the first IAM policy block (JSON) from text, returning
+# (policy, remaining text, fixes). Unless `lenient` is off, blocks that are
+# not strict JSON (comments, trailing commas, smart quotes, ...) and a policy
+# cut off before its closing braces are repaired, and `fixes` names the
+# repairs lenient_json made.
+def extract_policy_block(text, lenient=True):
     depth = 0
     start_idx = None
     for i, c in enumerate(text):
@@ -24,78 +62,185 @@ def extract_first_policy_block(text):
         elif c == "}":
             depth -= 1
             if depth == 0 and start_idx is not None:
-                block = text[start_idx : i + 1]
-                try:
-                    data = json.loads(block)
-                    # Matches IAM style policy of Effect + Action
-                    if isinstance(data, dict) and "Effect" in data and "Action" in data:
-                        before = text[:start_idx]
-                        after = text[i + 1 :]
-                        remaining = (before + after).strip()
-                        return data, remaining
-                    # Matches policy with Statement
-                    if isinstance(data, dict) and "Statement" in data:
-                        stmts = data["Statement"]
-                        if isinstance(stmts, dict):
-                            stmts = [stmts]
-                        if isinstance(stmts, list) and len(stmts) > 0:
-                            stmt = stmts[0]
-                            if (
-                                isinstance(stmt, dict)
-                                and "Effect" in stmt
-                                and "Action" in stmt
-                            ):
-                                before = text[:start_idx]
-                                after = text[i + 1 :]
-                                remaining = (before + after).strip()
-                                return data, remaining
-                except Exception:
-                    continue
-    return None, text
+                data, fixes = read_block(text, start_idx, i + 1, lenient)
+                if is_policy(data):
+                    before = text[:start_idx]
+                    after = text[i + 1 :]
+                    remaining = (before + after).strip()
+                    return data, remaining, fixes
+    # Truncated policy: the text ends inside the last block. Whatever follows
+    # its last complete member (a sign-off, say) stays in the remaining text.
+    if lenient and depth > 0 and start_idx is not None:
+        try:
+            data, end, fixes = lenient_json.parse(text, start_idx, partial=True)
+        except lenient_json.ParseError:
+            data = None
+        if is_policy(data):
+            remaining = (text[:start_idx] + "\n" + text[end:]).strip()
+            return data, remaining, fixes
+    return None, text, []
+
+
+def extract_first_policy_block(text, lenient=True):
+    data, remaining, _ = extract_policy_block(text, lenient)
+    return data, remaining
+
+
+# -----------------------------------------------------------------------------
+# JSON FILES
+# -----------------------------------------------------------------------------
+# Parsed JSON files kept in memory while pipeline.py runs chained stages, so a
+# file one stage wrote or read (structured posts, filtered policies) reaches
+# the next stage without being read and parsed again. Entries are checked
+# against the file's mtime and size, so a file changed on disk is re-read.
+# Cached objects are shared: callers that modify one must copy it first.
+_json_cache = None
+
+
+def enable_json_cache():
+    global _json_cache
+    _json_cache = {}
+
+
+def disable_json_cache():
+    global _json_cache
+    _json_cache = None
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+# Parses a JSON file, raising OSError or ValueError like json.load
+def read_json(filepath):
+    if _json_cache is None:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    key = os.path.abspath(filepath)
+    stamp = _stamp(filepath)
+    cached = _json_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        metrics.inc("json_cache_hits_total")
+        return cached[1]
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    _json_cache[key] = (stamp, data)
+    return data
+
+
+def write_json(filepath, data):
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    if _json_cache is not None:
+        _json_cache[os.path.abspath(filepath)] = (_stamp(filepath), data)
 
 
 # Lodas a JSON file and handles errors
 def load_json(filepath):
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_json(filepath)
     except Exception as e:
         print(f"[!] Failed to load {filepath}: {e}")
         return {}
 
 
+def has_answer(saved_dir, folder):
+    return os.path.exists(os.path.join(saved_dir, folder, "accepted_answer.json"))
+
+
+# Records which saved_pages folder each numbered example came from, one
+# {"index": N, "post": folder} line per example in <filtered_dir>/sources.jsonl
+def open_sources(filtered_dir):
+    return open(os.path.join(filtered_dir, "sources.jsonl"), "w", encoding="utf-8")
+
+
+# A "fixes" key lists the repairs made to each of the example's policies
+# ({"original_policy": [...]}) when lenient parsing was needed
+def record_source(sources, index, folder, fixes=None):
+    record = {"index": index, "post": folder}
+    fixes = {field: names for field, names in (fixes or {}).items() if names}
+    if fixes:
+        record["fixes"] = fixes
+    sources.write(json.dumps(record) + "\n")
+
+
+# Reads <filtered_dir>/sources.jsonl back into {index: folder}; a missing
+# file or malformed lines are skipped
+def read_sources(filtered_dir):
+    sources = {}
+    path = os.path.join(filtered_dir, "sources.jsonl")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    sources[rec["index"]] = rec["post"]
+                except (ValueError, KeyError):
+                    continue
+    return sources
+
+
+# Counts policies recovered by lenient parsing, and each kind of repair
+def count_fixes(bucket, fixes):
+    if fixes:
+        metrics.inc("policies_recovered_total", bucket=bucket)
+    for fix in fixes:
+        metrics.inc("policy_fixes_total", bucket=bucket, fix=fix)
+
+
+# Folders dedupe.py flagged as near-duplicates of another post's body or
+# policy; empty when dedupe has not been run
+def load_duplicates(saved_dir):
+    path = os.path.join(saved_dir, "duplicates.json")
+    if not os.path.exists(path):
+        return set()
+    report = load_json(path)
+    return set(report.get("body", {})) | set(report.get("policy", {}))
+
+
 # Filters posts that have a valid policy and accepted answer (repaired)
-def filter_repaired(saved_dir="saved_pages", filtered_dir="filtered_pages/repaired"):
+def filter_repaired(
+    saved_dir="saved_pages",
+    filtered_dir="filtered_pages/repaired",
+    skip_duplicates=True,
+    lenient=True,
+):
     os.makedirs(os.path.join(filtered_dir, "original_policy"), exist_ok=True)
     os.makedirs(os.path.join(filtered_dir, "intent"), exist_ok=True)
     os.makedirs(os.path.join(filtered_dir, "results"), exist_ok=True)
+    sources = open_sources(filtered_dir)
+    duplicates = load_duplicates(saved_dir) if skip_duplicates else set()
 
-    index = 0
-    for folder in os.listdir(saved_dir):
-        folder_path = os.path.join(saved_dir, folder)
-        if not os.path.isdir(folder_path):
-            continue
-
-        body_path = os.path.join(folder_path, "body.json")
-        ans_path = os.path.join(folder_path, "accepted_answer.json")
-        if not (os.path.exists(body_path) and os.path.exists(ans_path)):
-            continue
+    def wanted(post):
+        if not has_answer(saved_dir, post["folder"]):
+            return False
+        if post["folder"] in duplicates:
+            metrics.inc("posts_duplicate_total", bucket="repaired")
+            return False
+        return True
 
-        body_json = load_json(body_path)
-        ans_json = load_json(ans_path)
-
-        body_text = body_json.get("body", "")
-        ans_text = ans_json.get("accepted_answer", "")
-
-        body_policy, body_remainder = extract_first_policy_block(body_text)
-        ans_policy, _ = extract_first_policy_block(ans_text)
+    index = 0
+    posts = iter_structured_posts(
+        saved_dir, where=wanted, fields=("body", "accepted_answer")
+    )
+    for post in posts:
+        folder = post["folder"]
+        metrics.inc("posts_scanned_total", bucket="repaired")
+        body_text = post["body"]
+        ans_text = post["accepted_answer"] or ""
+
+        body_policy, body_remainder, body_fixes = extract_policy_block(
+            body_text, lenient
+        )
+        ans_policy, _, ans_fixes = extract_policy_block(ans_text, lenient)
 
         if body_policy and ans_policy:
             # Saves triplet: original, intent, result
-            with open(
-                os.path.join(filtered_dir, "original_policy", f"{index}.json"), "w"
-            ) as f:
-                json.dump(body_policy, f, indent=2)
+            write_json(
+                os.path.join(filtered_dir, "original_policy", f"{index}.json"),
+                body_policy,
+            )
 
             with open(
                 os.path.join(filtered_dir, "intent", f"{index}.json"),
@@ -104,40 +249,58 @@ def filter_repaired(saved_dir="saved_pages", filtered_dir="filtered_pages/repair
             ) as f:
                 f.write(body_remainder.strip())
 
-            with open(os.path.join(filtered_dir, "results", f"{index}.json"), "w") as f:
-                json.dump(ans_policy, f, indent=2)
+            write_json(
+                os.path.join(filtered_dir, "results", f"{index}.json"), ans_policy
+            )
 
             print_status(f"[+] Saved repaired triplet #{index}")
+            metrics.inc("policies_extracted_total", bucket="repaired")
+            count_fixes("repaired", body_fixes)
+            count_fixes("repaired", ans_fixes)
+            record_source(
+                sources,
+                index,
+                folder,
+                {"original_policy": body_fixes, "results": ans_fixes},
+            )
             index += 1
 
+    sources.close()
     print(f"\n[INFO] Total repaired posts: {index}")
 
 
 # Filteres posts that have a valid policy but no accepted answer (broken)
-def filter_broken(saved_dir="saved_pages", filtered_dir="filtered_pages/broken"):
+def filter_broken(
+    saved_dir="saved_pages",
+    filtered_dir="filtered_pages/broken",
+    skip_duplicates=True,
+    lenient=True,
+):
     os.makedirs(os.path.join(filtered_dir, "original_policy"), exist_ok=True)
     os.makedirs(os.path.join(filtered_dir, "intent"), exist_ok=True)
+    sources = open_sources(filtered_dir)
+    duplicates = load_duplicates(saved_dir) if skip_duplicates else set()
 
-    index = 0
-    for folder in os.listdir(saved_dir):
-        folder_path = os.path.join(saved_dir, folder)
-        if not os.path.isdir(folder_path):
-            continue
-
-        body_path = os.path.join(folder_path, "body.json")
-        ans_path = os.path.join(folder_path, "accepted_answer.json")
-        if not os.path.exists(body_path) or os.path.exists(ans_path):
-            continue
+    def wanted(post):
+        if has_answer(saved_dir, post["folder"]):
+            return False
+        if post["folder"] in duplicates:
+            metrics.inc("posts_duplicate_total", bucket="broken")
+            return False
+        return True
 
-        body_json = load_json(body_path)
-        body_text = body_json.get("body", "")
-        body_policy, body_remainder = extract_first_policy_block(body_text)
+    index = 0
+    for post in iter_structured_posts(saved_dir, where=wanted, fields=("body",)):
+        folder = post["folder"]
+        metrics.inc("posts_scanned_total", bucket="broken")
+        body_text = post["body"]
+        body_policy, body_remainder, fixes = extract_policy_block(body_text, lenient)
 
         if body_policy:
-            with open(
-                os.path.join(filtered_dir, "original_policy", f"{index}.json"), "w"
-            ) as f:
-                json.dump(body_policy, f, indent=2)
+            write_json(
+                os.path.join(filtered_dir, "original_policy", f"{index}.json"),
+                body_policy,
+            )
 
             with open(
                 os.path.join(filtered_dir, "intent", f"{index}.json"),
@@ -147,8 +310,12 @@ def filter_broken(saved_dir="saved_pages", filtered_dir="filtered_pages/broken")
                 f.write(body_remainder.strip())
 
             print_status(f"[+] Saved broken pair #{index}")
+            metrics.inc("policies_extracted_total", bucket="broken")
+            count_fixes("broken", fixes)
+            record_source(sources, index, folder, {"original_policy": fixes})
             index += 1
 
+    sources.close()
     print(f"\n[INFO] Total broken posts: {index}")
 
 
@@ -168,6 +335,8 @@ def filter_relaxed(
     saved_dir="saved_pages",
     filtered_dir="filtered_pages/relaxed",
     broken_dir="filtered_pages/broken",
+    skip_duplicates=True,
+    lenient=True,
 ):
     # Checks for broken folder to avoid overlapping
     if not os.path.exists(os.path.join(broken_dir, "original_policy")):
@@ -178,6 +347,8 @@ def filter_relaxed(
 
     os.makedirs(os.path.join(filtered_dir, "original_policy"), exist_ok=True)
     os.makedirs(os.path.join(filtered_dir, "intent"), exist_ok=True)
+    sources = open_sources(filtered_dir)
+    duplicates = load_duplicates(saved_dir) if skip_duplicates else set()
 
     # Index blacklist from broken results
     broken_folders = set()
@@ -190,36 +361,38 @@ def filter_relaxed(
             except:
                 continue
 
-    index = 0
-    global_index = 0  # Keeps track of order of scanned folders
-    for folder in os.listdir(saved_dir):
-        folder_path = os.path.join(saved_dir, folder)
-        if not os.path.isdir(folder_path):
-            continue
+    # Skips posts with accepted answers or if used in broken. Numbers the
+    # posts without an answer in scan order, before any body is read.
+    global_index = 0
 
-        body_path = os.path.join(folder_path, "body.json")
-        ans_path = os.path.join(folder_path, "accepted_answer.json")
-
-        # Skips postswith accepted answers or if used in broken
-        if os.path.exists(ans_path):
-            continue
-        if global_index in broken_folders:
-            global_index += 1
-            continue
+    def wanted(post):
+        nonlocal global_index
+        if has_answer(saved_dir, post["folder"]):
+            return False
+        position = global_index
+        global_index += 1
+        if position in broken_folders:
+            return False
+        if post["folder"] in duplicates:
+            metrics.inc("posts_duplicate_total", bucket="relaxed")
+            return False
+        return True
 
-        body_json = load_json(body_path)
-        body_text = body_json.get("body", "")
+    index = 0
+    for post in iter_structured_posts(saved_dir, where=wanted, fields=("body",)):
+        folder = post["folder"]
+        metrics.inc("posts_scanned_total", bucket="relaxed")
+        body_text = post["body"]
         if not relaxed_policy_search(body_text):
-            global_index += 1
             continue
 
-        body_policy, body_remainder = extract_first_policy_block(body_text)
+        body_policy, body_remainder, fixes = extract_policy_block(body_text, lenient)
 
         if body_policy:
-            with open(
-                os.path.join(filtered_dir, "original_policy", f"{index}.json"), "w"
-            ) as f:
-                json.dump(body_policy, f, indent=2)
+            write_json(
+                os.path.join(filtered_dir, "original_policy", f"{index}.json"),
+                body_policy,
+            )
 
             with open(
                 os.path.join(filtered_dir, "intent", f"{index}.json"),
@@ -229,14 +402,16 @@ def filter_relaxed(
                 f.write(body_remainder.strip())
 
             print_status(f"[+] Saved relaxed pair #{index}")
+            metrics.inc("policies_extracted_total", bucket="relaxed")
+            count_fixes("relaxed", fixes)
+            record_source(sources, index, folder, {"original_policy": fixes})
             index += 1
 
-        global_index += 1
-
+    sources.close()
     print(f"\n[INFO] Total relaxed posts: {index}")
 
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Filter IAM policy forum posts")
     parser.add_argument(
         "-r",
@@ -257,8 +432,20 @@ if __name__ == "__main__":
         help="Extra-loose regex-based filtering for weak policies",
     )
     parser.add_argument("-s", "--single", help="Test a specific folder")
+    parser.add_argument(
+        "--keep-duplicates",
+        action="store_true",
+        help="Do not skip posts flagged in saved_pages/duplicates.json by dedupe.py",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Only accept policies that are strict JSON (no lenient repairs)",
+    )
 
-    args = parser.parse_args()
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics.configure(args)
     start = time.time()
     ran = False
 
@@ -281,30 +468,47 @@ if __name__ == "__main__":
                 ans_json = load_json(ans_path)
                 body_text = body_json.get("body", "")
                 ans_text = ans_json.get("accepted_answer", "")
-                bp, _ = extract_first_policy_block(body_text)
-                ap, _ = extract_first_policy_block(ans_text)
+                bp, _, bp_fixes = extract_policy_block(body_text, not args.strict)
+                ap, _, ap_fixes = extract_policy_block(ans_text, not args.strict)
                 if bp and ap:
                     print(f"[>] Repaired: valid policy + accepted answer")
+                    for label, fixes in (("policy", bp_fixes), ("answer", ap_fixes)):
+                        if fixes:
+                            print(f"[~] Recovered {label}: {', '.join(fixes)}")
                 else:
                     print(f"[X] Invalid or missing policy/answer")
         ran = True
 
     if args.repaired:
         print("[INFO] Running filter for repaired posts...")
-        filter_repaired()
+        with metrics.stage("filter_repaired"):
+            filter_repaired(
+                skip_duplicates=not args.keep_duplicates, lenient=not args.strict
+            )
         ran = True
 
     if args.broken:
         print("[INFO] Running filter for broken posts...")
-        filter_broken()
+        with metrics.stage("filter_broken"):
+            filter_broken(
+                skip_duplicates=not args.keep_duplicates, lenient=not args.strict
+            )
         ran = True
 
     if args.relaxed:
         print("[INFO] Running relaxed regex-based filter...")
-        filter_relaxed()
+        with metrics.stage("filter_relaxed"):
+            filter_relaxed(
+                skip_duplicates=not args.keep_duplicates, lenient=not args.strict
+            )
         ran = True
 
     if not ran:
         parser.print_help()
 
+    metrics.finish(args)
     print(f"[INFO] Done in {time.time() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import json
+from collections import deque
+from urllib.parse import urlparse, quote_plus
+
+# Crawl spec and shared frontier for multi-query crawls. Several seed searches
+# are paged through in round-robin order, and every post link they return goes
+# through one seen-set keyed on the normalized post ID, so a post found by
+# many searches is downloaded and structured once.
+
+BASE_URL = "https://repost.aws"
+DEFAULT_QUERY = "IAM Policy"
+POST_SECTIONS = ("questions", "articles", "knowledge-center")
+
+
+def search_url(query):
+    return f"{BASE_URL}/search/content?globalSearch={quote_plus(query)}&sort=recent"
+
+
+def tag_url(tag):
+    if tag.startswith("http"):
+        return tag
+    return f"{BASE_URL}/tags/{tag.strip('/')}"
+
+
+# /questions/QUxxxx/some-slug -> QUxxxx, /knowledge-center/slug -> slug
+def normalize_post_id(url):
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    if len(parts) >= 2 and parts[0] in POST_SECTIONS:
+        return parts[1]
+    return parts[-1] if parts else url
+
+
+class Seed:
+    def __init__(self, name, url):
+        self.name = name
+        self.next_ref = url  # search URL, then whatever the listing returns
+        self.pages = 0
+        self.found = 0
+        self.new = 0
+
+    def __repr__(self):
+        return f"Seed({self.name!r})"
+
+
+# Spec file: one seed per line as "query <text>", "tag <id or url>" or
+# "url <search url>"; a bare line is a query. Blank lines and # comments
+# are ignored.
+def load_spec(path):
+    seeds = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            kind, _, value = line.partition(" ")
+            if kind not in ("query", "tag", "url"):
+                kind, value = "query", line
+            seeds.append(make_seed(kind, value.strip()))
+    return seeds
+
+
+def make_seed(kind, value):
+    if kind == "query":
+        return Seed(f"query:{value}", search_url(value))
+    if kind == "tag":
+        return Seed(f"tag:{value}", tag_url(value))
+    return Seed(f"url:{value}", value)
+
+
+def build_seeds(queries=(), tags=(), spec=None):
+    seeds = [make_seed("query", q) for q in queries]
+    seeds += [make_seed("tag", t) for t in tags]
+    if spec:
+        seeds += load_spec(spec)
+    if not seeds:
+        seeds = [make_seed("query", DEFAULT_QUERY)]
+
+    # The same search listed twice would just page through the same results
+    unique = {}
+    for seed in seeds:
+        unique.setdefault(seed.next_ref, seed)
+    return list(unique.values())
+
+
+class Frontier:
+    def __init__(self, seeds, seen=()):
+        self.active = deque(seeds)
+        self.seeds = list(seeds)
+        self.seen = set(seen)
+
+    def __bool__(self):
+        return bool(self.active)
+
+    # Next seed to list a page from; seeds take turns one page at a time
+    def next_seed(self):
+        seed = self.active.popleft()
+        self.active.append(seed)
+        return seed
+
+    # Records a listed page and returns only links not seen on any seed,
+    # at most `limit` of them (links past the limit are left unseen)
+    def admit(self, seed, links, next_ref, limit=None):
+        seed.pages += 1
+        seed.found += len(links)
+        seed.next_ref = next_ref
+        if not next_ref:
+            self.active.remove(seed)
+
+        fresh = []
+        for link in links:
+            if limit is not None and len(fresh) >= limit:
+                break
+            post_id = normalize_post_id(link)
+            if post_id in self.seen:
+                continue
+            self.seen.add(post_id)
+            fresh.append(link)
+        seed.new += len(fresh)
+        return fresh
+
+    def report(self):
+        for seed in self.seeds:
+            print(
+                f"[INFO] {seed.name}: {seed.pages} page(s), {seed.found} links, "
+                f"{seed.new} new"
+            )
+        print(f"[INFO] {len(self.seen)} unique posts in frontier")
+
+
+# Post IDs already structured under saved_dir, from each metadata.json link
+def structured_post_ids(saved_dir):
+    seen = set()
+    if not os.path.isdir(saved_dir):
+        return seen
+    for folder in os.listdir(saved_dir):
+        meta_path = os.path.join(saved_dir, folder, "metadata.json")
+        if not os.path.exists(meta_path):
+            continue
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                link = json.load(f).get("link")
+        except (OSError, ValueError):
+            continue
+        if link:
+            seen.add(normalize_post_id(link))
+    return seen
@@ -0,0 +1,315 @@
+import re
+
+# Forgiving JSON reader for policies pasted into forum posts. It reads the
+# text once, left to right, and repairs the usual defects as it meets them
+# instead of failing, recording a name for every kind of fix it applied:
+#
+#   comments             // line, /* block */ and # line comments
+#   extra_commas         trailing commas, doubled commas
+#   missing_commas       members or elements separated only by whitespace
+#   smart_quotes         strings quoted with “ ” or ‘ ’
+#   single_quotes        strings quoted with '
+#   unquoted_keys        Effect: "Allow"
+#   unquoted_values      "Effect": Allow (object values only: bare words in a
+#                        list are far more often prose than policy)
+#   python_literals      True, False, None
+#   ellipsis             ... or … standing in for elided members or elements
+#   control_characters   raw newlines or tabs inside strings
+#   invalid_escapes      backslashes that do not start a JSON escape
+#   unclosed             strings, arrays or objects cut off by the end of text
+#
+# Every character is looked at a bounded number of times, so parsing is
+# linear in the length of the text.
+
+MAX_DEPTH = 100
+
+# Opening quote -> characters that close it
+QUOTES = {
+    '"': '"',
+    "'": "'",
+    "“": "“”",
+    "”": "“”",
+    "‘": "‘’",
+    "’": "‘’",
+}
+ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+LITERALS = {"true": True, "false": False, "null": None}
+PYTHON_LITERALS = {"True": True, "False": False, "None": None}
+WHITESPACE = " \t\r\n\u00a0\ufeff"
+
+NUMBER_RE = re.compile(r"-?\d+(\.\d+)?([eE][+-]?\d+)?")
+BARE_RE = re.compile(r"[A-Za-z0-9_$*:./\-]+")  # unquoted value
+KEY_RE = re.compile(r"[A-Za-z0-9_$\-]+")  # unquoted key
+HEX_RE = re.compile(r"[0-9a-fA-F]{4}")
+SPACE_RE = re.compile(f"[{WHITESPACE}]*")
+# Next character inside a string that needs a look: a closer, backslash or
+# control character
+STRING_STOP = {
+    quote: re.compile("[" + re.escape(closers) + r"\\\x00-\x1f]")
+    for quote, closers in QUOTES.items()
+}
+
+
+class ParseError(ValueError):
+    def __init__(self, message, pos):
+        super().__init__(f"{message} at position {pos}")
+        self.pos = pos
+
+
+class _Parser:
+    def __init__(self, text, pos, partial=False):
+        self.text = text
+        self.pos = pos
+        self.fixes = []
+        self.partial = partial
+        self.stopped = False  # partial: gave up on a member, close everything
+
+    def fix(self, name):
+        if name not in self.fixes:
+            self.fixes.append(name)
+
+    def peek(self):
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def at_end(self):
+        return self.pos >= len(self.text)
+
+    # Skips whitespace and comments
+    def skip(self):
+        text = self.text
+        while True:
+            self.pos = SPACE_RE.match(text, self.pos).end()
+            if self.pos >= len(text):
+                break
+            c = text[self.pos]
+            if c == "#" or text.startswith("//", self.pos):
+                end = text.find("\n", self.pos)
+                self.pos = len(text) if end < 0 else end + 1
+                self.fix("comments")
+            elif text.startswith("/*", self.pos):
+                end = text.find("*/", self.pos + 2)
+                self.pos = len(text) if end < 0 else end + 2
+                self.fix("comments")
+            else:
+                break
+
+    # Skips "..." or "…"; True if there was one
+    def skip_ellipsis(self):
+        if self.text.startswith("...", self.pos):
+            self.pos += 3
+        elif self.peek() == "…":
+            self.pos += 1
+        else:
+            return False
+        while self.peek() == ".":
+            self.pos += 1
+        self.fix("ellipsis")
+        return True
+
+    def value(self, depth, bare=True):
+        if depth > MAX_DEPTH:
+            raise ParseError("Nesting too deep", self.pos)
+        self.skip()
+        c = self.peek()
+        if c == "{":
+            return self.object(depth)
+        if c == "[":
+            return self.array(depth)
+        if c in QUOTES:
+            return self.string()
+        match = NUMBER_RE.match(self.text, self.pos)
+        if match and not BARE_RE.match(self.text, match.end()):
+            self.pos = match.end()
+            number = match.group()
+            return float(number) if match.group(1) or match.group(2) else int(number)
+        start = self.pos
+        word = self.bare(BARE_RE)
+        if word is None:
+            raise ParseError("Expected a value", self.pos)
+        if word in LITERALS:
+            return LITERALS[word]
+        if word in PYTHON_LITERALS:
+            self.fix("python_literals")
+            return PYTHON_LITERALS[word]
+        if not bare:
+            raise ParseError("Unquoted string", start)
+        self.fix("unquoted_values")
+        return word
+
+    def bare(self, pattern):
+        match = pattern.match(self.text, self.pos)
+        if not match:
+            return None
+        self.pos = match.end()
+        return match.group()
+
+    def string(self):
+        text = self.text
+        quote = text[self.pos]
+        closers = QUOTES[quote]
+        if quote == "'":
+            self.fix("single_quotes")
+        elif quote != '"':
+            self.fix("smart_quotes")
+        self.pos += 1
+        stop = STRING_STOP[quote]
+        chunks = []
+        start = self.pos
+        while True:
+            match = stop.search(text, self.pos)
+            if not match:
+                break
+            self.pos = match.start()
+            c = text[self.pos]
+            if c in closers:
+                chunks.append(text[start : self.pos])
+                self.pos += 1
+                return "".join(chunks)
+            if c == "\\":
+                chunks.append(text[start : self.pos])
+                chunks.append(self.escape())
+                start = self.pos
+                continue
+            if c < " ":
+                self.fix("control_characters")
+            self.pos += 1
+        chunks.append(text[start:])
+        self.pos = len(text)
+        self.fix("unclosed")
+        return "".join(chunks)
+
+    def escape(self):
+        text = self.text
+        c = text[self.pos + 1 : self.pos + 2]
+        if c in ESCAPES:
+            self.pos += 2
+            return ESCAPES[c]
+        if c == "u" and HEX_RE.match(text, self.pos + 2):
+            self.pos += 6
+            return chr(int(text[self.pos - 4 : self.pos], 16))
+        if c in QUOTES:  # \' or an escaped smart quote
+            self.pos += 2
+            return c
+        self.fix("invalid_escapes")
+        self.pos += 1
+        return "\\"
+
+    def key(self):
+        if self.peek() in QUOTES:
+            return self.string()
+        word = self.bare(KEY_RE)
+        if word is None:
+            raise ParseError("Expected a key", self.pos)
+        self.fix("unquoted_keys")
+        return word
+
+    # Shared loop for objects and arrays: handles separators, missing and
+    # extra commas, ellipses and a cut-off end. read_member returns False when
+    # the text ends partway through a member. In partial mode a member that
+    # cannot be read ends every open value, and the text from that member on
+    # is left unparsed.
+    def members(self, closer, read_member):
+        empty = True  # nothing but commas and ellipses so far
+        comma = False  # a comma since the last member
+        while True:
+            if self.stopped:
+                return
+            self.skip()
+            c = self.peek()
+            if not c:
+                self.fix("unclosed")
+                return
+            if c == closer:
+                if comma:
+                    self.fix("extra_commas")
+                self.pos += 1
+                return
+            if c == ",":
+                if comma or empty:
+                    self.fix("extra_commas")
+                self.pos += 1
+                comma = True
+                continue
+            if self.skip_ellipsis():  # stands in for a member
+                empty = comma = False
+                continue
+            if c in "}]":
+                raise ParseError(f"Unexpected '{c}'", self.pos)
+            start, fixes = self.pos, len(self.fixes)
+            try:
+                complete = read_member() is not False
+            except ParseError:
+                if not self.partial:
+                    raise
+                complete = False
+            if not complete:
+                if self.partial:
+                    del self.fixes[fixes:]  # made for the member given up on
+                    self.pos = start
+                    self.stopped = True
+                self.fix("unclosed")
+                return
+            if not (comma or empty):
+                self.fix("missing_commas")
+            empty = comma = False
+
+    def object(self, depth):
+        self.pos += 1
+        result = {}
+
+        def read_member():
+            key = self.key()
+            self.skip()
+            if self.at_end():
+                return False
+            if self.peek() != ":":
+                raise ParseError("Expected ':'", self.pos)
+            self.pos += 1
+            self.skip()
+            if self.at_end():
+                return False
+            result[key] = self.value(depth + 1)
+
+        self.members("}", read_member)
+        return result
+
+    def array(self, depth):
+        self.pos += 1
+        result = []
+
+        def read_member():
+            result.append(self.value(depth + 1, bare=False))
+
+        self.members("]", read_member)
+        return result
+
+
+# Parses the JSON value starting at `pos` and returns (value, end, fixes),
+# where `end` is the index just past the value. Raises ParseError when the
+# text cannot be read as JSON even with repairs. With `partial`, the value
+# may be cut off and run on into prose ("...]\nThanks"): it is closed after
+# its last complete member, and `end` is where the unparsed rest begins.
+def parse(text, pos=0, partial=False):
+    parser = _Parser(text, pos, partial)
+    value = parser.value(0)
+    return value, parser.pos, parser.fixes
+
+
+# Like json.loads, but returns (value, fixes); anything but whitespace and
+# comments after the value is an error
+def loads(text):
+    parser = _Parser(text, 0)
+    value = parser.value(0)
+    parser.skip()
+    if not parser.at_end():
+        raise ParseError("Extra data", parser.pos)
+    return value, parser.fixes
@@ -0,0 +1,230 @@
+import re
+import json
+from urllib.parse import urlparse, urlencode, parse_qsl, urlunparse
+
+import metrics
+
+# Listing mode that reads search results from the JSON responses the
+# repost.aws search page loads itself, instead of scanning rendered anchors.
+# The first page is rendered once to capture the search API request; later
+# pages replay that request with the next cursor, without rendering anything.
+
+BASE_URL = "https://repost.aws"
+LISTING_TIMEOUT = 15000  # ms to wait for the first search response
+
+# repost.aws content IDs: QU = question, AR = article, KC = knowledge center
+POST_ID_RE = re.compile(r"^(QU|AR|KC)[A-Za-z0-9_-]{6,}$")
+ID_KEYS = ("id", "questionId", "articleId", "contentId", "postId")
+TITLE_KEYS = ("title", "name", "questionTitle")
+DATE_KEYS = ("createdAt", "creationDate", "datePublished", "createdDate", "date")
+URL_KEYS = ("url", "path", "href", "link", "canonicalUrl")
+SLUG_KEYS = ("slug", "urlSlug")
+# Most specific first; a generic "cursor" (which items can carry too) only
+# counts when none of the others is in the payload
+CURSOR_KEYS = ("nextToken", "nextPageToken", "nextCursor", "pageToken", "cursor")
+ID_PATHS = {"QU": "questions", "AR": "articles", "KC": "knowledge-center"}
+
+# Resource types the listing page does not need
+BLOCKED_RESOURCES = {"image", "font", "media", "stylesheet"}
+
+
+def _first(obj, keys):
+    for key in keys:
+        value = obj.get(key)
+        if isinstance(value, (str, int)) and value != "":
+            return value
+    return None
+
+
+# Lowercase words joined by hyphens, the way repost.aws builds post slugs
+def slugify(title):
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+
+
+# Post URLs match the anchors the HTML listing finds (/questions/<ID>/<slug>),
+# so both listing modes save posts under the same slug-named files and
+# folders. The slug comes from the payload's URL or slug field, else from the
+# title; with neither, the URL ends in the bare ID.
+def post_url(post_id, url=None, slug=None, title=None):
+    if url:
+        return url if url.startswith("http") else BASE_URL + "/" + url.lstrip("/")
+    base = f"{BASE_URL}/{ID_PATHS[post_id[:2]]}/{post_id}"
+    slug = slug or (slugify(title) if isinstance(title, str) else "")
+    return f"{base}/{slug}" if slug else base
+
+
+# Walks a decoded JSON payload and returns (entries, cursor). Entries are
+# objects carrying a repost.aws content ID; the cursor is the next-page token
+# under the most specific of CURSOR_KEYS found anywhere in the payload. A
+# "hasNextPage": false anywhere means there is no next page.
+def extract_listing(payload):
+    entries = []
+    seen = set()
+    cursor = None
+    cursor_key = None
+    last_page = False
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        post_id = _first(node, ID_KEYS)
+        if isinstance(post_id, str) and POST_ID_RE.match(post_id):
+            if post_id not in seen:
+                seen.add(post_id)
+                title = _first(node, TITLE_KEYS)
+                url = _first(node, URL_KEYS)
+                slug = _first(node, SLUG_KEYS)
+                entries.append(
+                    {
+                        "id": post_id,
+                        "title": title,
+                        "date": _first(node, DATE_KEYS),
+                        "url": post_url(post_id, url, slug, title),
+                    }
+                )
+            continue
+
+        if node.get("hasNextPage") is False:
+            last_page = True
+        for rank, key in enumerate(CURSOR_KEYS):
+            if cursor_key is not None and rank >= CURSOR_KEYS.index(cursor_key):
+                break
+            if isinstance(node.get(key), str) and node[key]:
+                cursor, cursor_key = node[key], key
+                break
+        stack.extend(reversed(list(node.values())))
+    if last_page or cursor is None:
+        return entries, None
+    return entries, (cursor_key, cursor)
+
+
+# -----------------------------------------------------------------------------
+# BROWSER CAPTURE
+# -----------------------------------------------------------------------------
+def _is_json(response):
+    content_type = response.headers.get("content-type", "")
+    return "json" in content_type and response.request.resource_type in (
+        "xhr",
+        "fetch",
+    )
+
+
+def _block_assets(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        route.abort()
+    else:
+        route.continue_()
+
+
+# Renders the search page once and returns (entries, next_ref)
+def capture_first_page(url, context, verbose=False):
+    page = context.new_page()
+    responses = []
+    page.on("response", lambda r: responses.append(r) if _is_json(r) else None)
+    page.route("**/*", _block_assets)
+    try:
+        page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        waited = 0
+        while waited < LISTING_TIMEOUT:
+            for response in responses:
+                result = _parse_response(response)
+                if result and result[0]:
+                    entries, cursor = result
+                    template = _request_template(response.request)
+                    if verbose:
+                        print(f"[+] Captured {len(entries)} posts from {response.url}")
+                    return entries, _next_ref(template, cursor)
+            responses.clear()
+            page.wait_for_timeout(250)
+            waited += 250
+    finally:
+        page.close()
+    if verbose:
+        print(f"[!] No JSON search results captured on {url}")
+    return [], None
+
+
+def _parse_response(response):
+    try:
+        return extract_listing(response.json())
+    except Exception:
+        return None
+
+
+def _request_template(request):
+    headers = {
+        k: v
+        for k, v in request.headers.items()
+        if k.lower() not in ("content-length", "host") and not k.startswith(":")
+    }
+    return {
+        "url": request.url,
+        "method": request.method,
+        "headers": headers,
+        "post_data": request.post_data,
+    }
+
+
+def _next_ref(template, cursor):
+    if cursor is None:
+        return None
+    return {"template": template, "cursor": cursor}
+
+
+# Puts the cursor into the replayed request: JSON body if there is one,
+# otherwise the query string
+def _with_cursor(template, cursor):
+    key, value = cursor
+    url, data = template["url"], template["post_data"]
+    if data:
+        try:
+            body = json.loads(data)
+        except ValueError:
+            body = None
+        if isinstance(body, dict):
+            body[key] = value
+            return url, json.dumps(body)
+    parts = urlparse(url)
+    query = dict(parse_qsl(parts.query))
+    query[key] = value
+    return urlunparse(parts._replace(query=urlencode(query))), data
+
+
+# Fetches the next listing page straight from the search API; no rendering.
+# None when the request fails.
+def fetch_next_page(ref, context, verbose=False):
+    template = ref["template"]
+    url, data = _with_cursor(template, ref["cursor"])
+    with metrics.timer("listing_api_seconds"):
+        response = context.request.fetch(
+            url,
+            method=template["method"],
+            headers=template["headers"],
+            data=data,
+            timeout=60000,
+        )
+    if not response.ok:
+        if verbose:
+            print(f"[!] Listing request failed ({response.status}): {url}")
+        return None
+    entries, cursor = extract_listing(response.json())
+    if verbose:
+        print(f"[+] Fetched {len(entries)} posts from listing API")
+    return entries, _next_ref(template, cursor)
+
+
+# Returns (entries, next_ref) for either a start URL or a cursor reference,
+# or None when a cursor page could not be fetched
+def listing_page(ref, context, verbose=False):
+    if isinstance(ref, str):
+        result = capture_first_page(ref, context, verbose)
+    else:
+        result = fetch_next_page(ref, context, verbose)
+    if result is not None:
+        metrics.inc("listing_pages_total")
+    return result
@@ -0,0 +1,68 @@
+import os
+
+import metrics
+
+# Resident memory of this process and of the browser processes it started
+# (the Playwright driver and every Chromium process under it). Read from
+# /proc, so on other platforms the browser side reports None and the ceiling
+# is never hit.
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+MB = 1024 * 1024
+
+
+def _rss(pid):
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _children(root):
+    parents = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                # "pid (comm) state ppid ..."; comm may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        parents.setdefault(ppid, []).append(int(name))
+
+    found = []
+    stack = [root]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+# Returns (python_bytes, browser_bytes); browser_bytes is None without /proc
+def usage():
+    if not os.path.isdir("/proc"):
+        return None, None
+    pid = os.getpid()
+    return _rss(pid), sum(_rss(child) for child in _children(pid))
+
+
+class MemoryWatch:
+    def __init__(self, ceiling_mb=None):
+        self.ceiling = ceiling_mb * MB if ceiling_mb else None
+        self.peak = 0
+
+    # Samples memory into metrics; True once python + browser crosses the
+    # ceiling, meaning the caller should recycle its browser context
+    def over_ceiling(self):
+        python_rss, browser_rss = usage()
+        if python_rss is None:
+            return False
+        total = python_rss + browser_rss
+        self.peak = max(self.peak, total)
+        metrics.gauge("python_rss_bytes", python_rss)
+        metrics.gauge("browser_rss_bytes", browser_rss)
+        metrics.gauge("rss_peak_bytes", self.peak)
+        return self.ceiling is not None and total > self.ceiling
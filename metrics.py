@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+# Shared instrumentation for downloader.py, scrape.py, filter.py,
+# detect_policy_format.py and check_policies.py. Everything is recorded into
+# one process-wide registry and exported at the end of a run with --metrics.
+
+# Upper bounds (seconds) for latency histograms, Prometheus style
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_profile_dir = None
+_profilers = {}
+_profiling = False
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+# Adds `value` to a counter, e.g. inc("pages_fetched_total")
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# Sets a gauge to its current value, e.g. gauge("browser_rss_bytes", n)
+def gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+# Records one latency sample (in seconds) into a histogram
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = {
+                "buckets": [0] * len(BUCKETS),
+                "count": 0,
+                "sum": 0.0,
+                "min": value,
+                "max": value,
+            }
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h["buckets"][i] += 1
+        h["count"] += 1
+        h["sum"] += value
+        h["min"] = min(h["min"], value)
+        h["max"] = max(h["max"], value)
+
+
+# Times the enclosed block into a histogram
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+# Times a whole pipeline stage, and profiles it when --profile is set.
+# Repeated runs of a stage accumulate into one profile. Only the outermost
+# stage is profiled, since cProfile cannot nest.
+@contextmanager
+def stage(name):
+    global _profiling
+    profiler = None
+    if _profile_dir and not _profiling:
+        profiler = _profilers.setdefault(name, cProfile.Profile())
+        _profiling = True
+        profiler.enable()
+    try:
+        with timer("stage_seconds", stage=name):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiling = False
+
+
+# Writes <stage>.prof (for pstats/snakeviz) and a readable <stage>.txt
+def dump_profiles():
+    if not _profilers:
+        return
+    os.makedirs(_profile_dir, exist_ok=True)
+    for name, profiler in _profilers.items():
+        path = os.path.join(_profile_dir, f"{name}.prof")
+        profiler.dump_stats(path)
+        with open(os.path.join(_profile_dir, f"{name}.txt"), "w") as f:
+            pstats.Stats(path, stream=f).sort_stats("cumulative").print_stats(40)
+    print(f"[INFO] Profiles for {', '.join(_profilers)} written to {_profile_dir}")
+
+
+# Estimates a quantile from histogram buckets (upper bound of the bucket)
+def _quantile(h, q):
+    target = q * h["count"]
+    for i, bound in enumerate(BUCKETS):
+        if h["buckets"][i] >= target:
+            return min(bound, h["max"])
+    return h["max"]
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def to_prometheus():
+    lines = []
+    with _lock:
+        seen = set()
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(_gauges.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), h in sorted(_histograms.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            for bound, count in zip(BUCKETS, h["buckets"]):
+                le = _format_labels(labels, [("le", bound)])
+                lines.append(f"{name}_bucket{le} {count}")
+            le = _format_labels(labels, [("le", "+Inf")])
+            lines.append(f"{name}_bucket{le} {h['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {h['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    def label_str(name, labels):
+        return name + _format_labels(labels)
+
+    with _lock:
+        counters = {label_str(n, l): v for (n, l), v in sorted(_counters.items())}
+        gauges = {label_str(n, l): v for (n, l), v in sorted(_gauges.items())}
+        histograms = {
+            label_str(n, l): {
+                "count": h["count"],
+                "sum": round(h["sum"], 6),
+                "mean": round(h["sum"] / h["count"], 6),
+                "min": round(h["min"], 6),
+                "max": round(h["max"], 6),
+                "p50": round(_quantile(h, 0.50), 6),
+                "p95": round(_quantile(h, 0.95), 6),
+                "p99": round(_quantile(h, 0.99), 6),
+            }
+            for (n, l), h in sorted(_histograms.items())
+        }
+    return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+# Writes <prefix>.prom (Prometheus text format) and <prefix>.json
+def export(prefix):
+    directory = os.path.dirname(prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{prefix}.prom", "w", encoding="utf-8") as f:
+        f.write(to_prometheus())
+    with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+        json.dump(summary(), f, indent=2)
+    print(f"[INFO] Metrics written to {prefix}.prom and {prefix}.json")
+
+
+# -----------------------------------------------------------------------------
+# CLI HELPERS
+# -----------------------------------------------------------------------------
+def add_arguments(parser):
+    parser.add_argument(
+        "--metrics",
+        metavar="PREFIX",
+        help="Write stage metrics to PREFIX.prom and PREFIX.json",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Run each stage under cProfile and write the stats to DIR",
+    )
+
+
+def configure(args):
+    global _profile_dir
+    _profile_dir = args.profile
+
+
+# Empties the registry and drops profilers, so each stage of a chained
+# pipeline run exports only its own numbers
+def reset():
+    global _profile_dir, _profiling
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+        _profilers.clear()
+    _profile_dir = None
+    _profiling = False
+
+
+def finish(args):
+    dump_profiles()
+    if args.metrics:
+        export(args.metrics)
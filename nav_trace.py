@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import json
+import math
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+# Per-navigation timing traces for downloader.save_page. Each fetch produces
+# one JSON line; `python nav_trace.py traces.jsonl` aggregates them.
+
+_lock = threading.Lock()
+_trace_file = None
+
+# Browser-side Navigation Timing (milliseconds relative to navigation start)
+NAV_TIMING_JS = """
+() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (!nav) return null;
+    return {
+        ttfb_ms: nav.responseStart,
+        dom_content_loaded_ms: nav.domContentLoadedEventEnd,
+        load_ms: nav.loadEventEnd,
+        transfer_bytes: nav.transferSize,
+    };
+}
+"""
+
+
+def enable(path):
+    global _trace_file
+    _trace_file = open(path, "a", encoding="utf-8")
+
+
+def close():
+    global _trace_file
+    if _trace_file is not None:
+        _trace_file.close()
+        _trace_file = None
+
+
+def enabled():
+    return _trace_file is not None
+
+
+class NavTrace:
+    def __init__(self, url, kind="post"):
+        self.start = time.perf_counter()
+        self.record = {
+            "url": url,
+            "kind": kind,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "phases": {},
+            "requests": 0,
+            "failed_requests": 0,
+            "response_bytes": 0,
+        }
+
+    # Counts network activity on the page. Bytes are the encoded response
+    # bodies as received, read once each request has finished, so chunked and
+    # compressed responses (no usable Content-Length) are counted too.
+    def attach(self, page):
+        page.on("response", self._on_response)
+        page.on("requestfinished", self._on_finished)
+        page.on("requestfailed", self._on_failed)
+
+    def _on_response(self, response):
+        self.record["requests"] += 1
+
+    def _on_finished(self, request):
+        try:
+            size = request.sizes()["responseBodySize"]
+        except Exception:
+            return  # page or context closed meanwhile
+        self.record["response_bytes"] += max(size, 0)
+
+    def _on_failed(self, request):
+        self.record["failed_requests"] += 1
+
+    # Times one phase of the fetch, e.g. "goto", into the trace and metrics
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record["phases"][name] = round(elapsed, 4)
+            metrics.observe(f"page_{name}_seconds", elapsed)
+
+    # Seconds since the fetch started, e.g. when the content selector appeared
+    def mark(self, name):
+        self.record[name] = round(time.perf_counter() - self.start, 4)
+
+    def navigation_timing(self, page):
+        if not enabled():
+            return
+        try:
+            self.record["navigation"] = page.evaluate(NAV_TIMING_JS)
+        except Exception:
+            self.record["navigation"] = None
+
+    def finish(self, outcome, **fields):
+        self.record.update(fields)
+        self.record["outcome"] = outcome
+        self.record["total"] = round(time.perf_counter() - self.start, 4)
+        if _trace_file is None:
+            return
+        with _lock:
+            _trace_file.write(json.dumps(self.record) + "\n")
+            _trace_file.flush()
+
+
+# -----------------------------------------------------------------------------
+# AGGREGATION
+# -----------------------------------------------------------------------------
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def load(paths):
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def aggregate(records):
+    series = {}
+    outcomes = {}
+    signals = {}
+    for rec in records:
+        outcomes[rec["outcome"]] = outcomes.get(rec["outcome"], 0) + 1
+        if rec.get("ready_signal"):
+            signals[rec["ready_signal"]] = signals.get(rec["ready_signal"], 0) + 1
+        samples = dict(rec.get("phases", {}))
+        samples["total"] = rec.get("total")
+        samples["content_ready"] = rec.get("content_ready")
+        samples["dom_bytes"] = rec.get("dom_bytes")
+        samples["requests"] = rec.get("requests")
+        samples["response_bytes"] = rec.get("response_bytes")
+        nav = rec.get("navigation") or {}
+        for key in ("ttfb_ms", "dom_content_loaded_ms", "load_ms"):
+            samples[key] = nav.get(key)
+        for name, value in samples.items():
+            if value is not None:
+                series.setdefault(name, []).append(value)
+
+    report = {}
+    for name, values in series.items():
+        report[name] = {
+            "count": len(values),
+            "p50": _percentile(values, 0.50),
+            "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99),
+            "max": max(values),
+        }
+    return {"outcomes": outcomes, "ready_signals": signals, "series": report}
+
+
+def print_report(report):
+    total = sum(report["outcomes"].values())
+    print(f"[INFO] {total} navigation(s)")
+    for outcome, count in sorted(report["outcomes"].items()):
+        print(f"  {outcome:<24} {count}")
+    if report["ready_signals"]:
+        print("[INFO] Ready signals")
+        for signal, count in sorted(report["ready_signals"].items()):
+            print(f"  {signal:<24} {count}")
+    print()
+    print(f"  {'series':<24} {'count':>7} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for name, s in sorted(report["series"].items()):
+        print(
+            f"  {name:<24} {s['count']:>7} {s['p50']:>10.4g} "
+            f"{s['p95']:>10.4g} {s['p99']:>10.4g}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report p50/p95/p99 per phase from downloader trace files."
+    )
+    parser.add_argument("traces", nargs="+", help="JSONL trace file(s)")
+    parser.add_argument(
+        "--kind", help="Only include traces of one kind (post, listing)"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the report as JSON"
+    )
+    args = parser.parse_args()
+
+    records = load(args.traces)
+    if args.kind:
+        records = (r for r in records if r.get("kind") == args.kind)
+    report = aggregate(records)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
@@ -1,10 +1,9 @@
 import os
-from bs4 import BeautifulSoup
+import json
+import argparse
 
 SAVED_DIR = "saved_pages/"
 
-import json
-
 
 def extract_post_data(soup):
     # Extract title
@@ -67,20 +66,99 @@ def extract_post_data(soup):
     }
 
 
-def parse_all_posts():
-    posts = []
-    for file_name in os.listdir(SAVED_DIR):
-        if file_name.endswith(".html"):
-            file_path = os.path.join(SAVED_DIR, file_name)
-            with open(file_path, "r", encoding="utf-8") as f:
+# -----------------------------------------------------------------------------
+# STREAMING READERS
+# -----------------------------------------------------------------------------
+# Both readers yield one post at a time and keep nothing from earlier posts,
+# so memory stays flat however large the corpus is. `max_posts` counts posts
+# yielded, after filtering.
+
+
+# Raw downloaded pages (SAVED_DIR/*.html). `name_filter` is applied to the
+# file name before the file is opened or parsed.
+def iter_html_posts(saved_dir=SAVED_DIR, max_posts=None, name_filter=None):
+    from bs4 import BeautifulSoup
+
+    count = 0
+    with os.scandir(saved_dir) as entries:
+        for entry in entries:
+            if max_posts is not None and count >= max_posts:
+                return
+            if not entry.name.endswith(".html"):
+                continue
+            if name_filter is not None and not name_filter(entry.name):
+                continue
+            with open(entry.path, "r", encoding="utf-8") as f:
                 soup = BeautifulSoup(f, "html.parser")
-                post_data = extract_post_data(soup)
-                posts.append(post_data)
-    return posts
+            post_data = extract_post_data(soup)
+            soup.decompose()
+            post_data["file"] = entry.name
+            count += 1
+            yield post_data
+
+
+# Structured post folders (SAVED_DIR/<post>/ with body.json, and
+# metadata.json and accepted_answer.json when the post has them). `where`
+# gets {"folder": name} plus the metadata when "metadata" is in `fields`, and
+# runs before any body is read; only the other files named in `fields`
+# ("body", "accepted_answer") are loaded for posts that pass. A missing
+# optional file loads as {} (metadata) or None (accepted_answer).
+def iter_structured_posts(
+    saved_dir=SAVED_DIR, max_posts=None, where=None, fields=("metadata", "body")
+):
+    from filter import load_json
+
+    count = 0
+    with os.scandir(saved_dir) as entries:
+        for entry in entries:
+            if max_posts is not None and count >= max_posts:
+                return
+            body_path = os.path.join(entry.path, "body.json")
+            if not entry.is_dir() or not os.path.exists(body_path):
+                continue
+
+            post = {}
+            if "metadata" in fields:
+                meta_path = os.path.join(entry.path, "metadata.json")
+                if os.path.exists(meta_path):
+                    post.update(load_json(meta_path))
+            post["folder"] = entry.name
+            if where is not None and not where(post):
+                continue
+
+            if "body" in fields:
+                post["body"] = load_json(body_path).get("body", "")
+            if "accepted_answer" in fields:
+                answer_path = os.path.join(entry.path, "accepted_answer.json")
+                answer = None
+                if os.path.exists(answer_path):
+                    answer = load_json(answer_path).get("accepted_answer")
+                post["accepted_answer"] = answer
+            count += 1
+            yield post
 
 
 if __name__ == "__main__":
-    all_posts = parse_all_posts()
-    print(f"Parsed {len(all_posts)} post(s)")
-    for post in all_posts:
+    parser = argparse.ArgumentParser(description="Print parsed post bodies.")
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="Read structured post folders instead of raw HTML files",
+    )
+    parser.add_argument("-n", "--max", type=int, help="Stop after this many posts")
+    parser.add_argument("-t", "--tag", help="Only posts with this tag (structured)")
+    args = parser.parse_args()
+
+    if args.structured:
+        where = None
+        if args.tag:
+            where = lambda meta: args.tag in (meta.get("tags") or [])
+        posts = iter_structured_posts(max_posts=args.max, where=where)
+    else:
+        posts = iter_html_posts(max_posts=args.max)
+
+    count = 0
+    for post in posts:
         print(f"{post['body']}")
+        count += 1
+    print(f"Parsed {count} post(s)")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import importlib
+
+from filter import enable_json_cache, disable_json_cache
+import metrics
+
+# Single entry point for the pipeline stages. Each stage is the main() of its
+# own script, imported only when that stage runs, so quick commands such as
+# `filter --single` never load Playwright or BeautifulSoup. Stages can be
+# chained with "+" and then run in one process:
+#
+#   python pipeline.py structure + dedupe build + filter -r -b -x + lint -d all
+#
+# In a chain, policy JSON files written or read by one stage (filter, lint,
+# check, stats) are kept in memory for the next, which reads them back
+# without parsing them again. Files changed on disk in between are reloaded.
+# Metrics and profiles are reset before each stage, so --metrics and
+# --profile of a stage cover that stage alone.
+#
+# Arguments after a stage name are that script's own arguments
+# (`python pipeline.py check -h`).
+
+SAVED_DIR = "saved_pages"
+FILTERED_DIR = "filtered_pages"
+
+# stage -> (module, fixed leading arguments, description)
+STAGES = {
+    "crawl": ("scrape", [], "Crawl re:Post searches, download and structure posts"),
+    "queue": ("crawl_queue", [], "Seed or run workers on a shared crawl queue"),
+    "structure": ("scrape", ["--structure"], "Structure downloaded HTML files"),
+    "dedupe": ("dedupe", [], "Flag near-duplicate posts and policies"),
+    "filter": ("filter", [], "Extract repaired/broken/relaxed policy examples"),
+    "lint": ("detect_policy_format", [], "Detect and repair policy format issues"),
+    "check": ("check_policies", [], "Run the policy checker over filtered policies"),
+    "export": ("export_dataset", [], "Pack the buckets into a binary dataset"),
+    "stats": ("stats", [], "Describe the filtered policies and check results"),
+    "status": (None, [], "Show how much data each stage has produced"),
+}
+
+
+def usage():
+    print("usage: pipeline.py STAGE [ARGS ...] [+ STAGE [ARGS ...] ...]\n")
+    print("stages:")
+    for name, (_, _, description) in STAGES.items():
+        print(f"  {name:<10} {description}")
+    print("\nRun 'pipeline.py STAGE -h' for the options of one stage.")
+
+
+# Splits argv on "+" into [(stage, args), ...]
+def parse_chain(argv):
+    chain = []
+    segment = []
+    for arg in argv + ["+"]:
+        if arg != "+":
+            segment.append(arg)
+            continue
+        if not segment:
+            continue
+        if segment[0] not in STAGES:
+            raise ValueError(f"unknown stage '{segment[0]}'")
+        chain.append((segment[0], segment[1:]))
+        segment = []
+    return chain
+
+
+def _count(path, suffix=None):
+    if not os.path.isdir(path):
+        return 0
+    return sum(1 for name in os.listdir(path) if name.endswith(suffix or ""))
+
+
+def status(argv):
+    posts = 0
+    if os.path.isdir(SAVED_DIR):
+        for entry in os.scandir(SAVED_DIR):
+            if os.path.exists(os.path.join(entry.path, "body.json")):
+                posts += 1
+    print(
+        f"[INFO] {SAVED_DIR}: {posts} structured post(s), "
+        f"{_count(SAVED_DIR, '.html')} HTML file(s) waiting"
+    )
+
+    duplicates_path = os.path.join(SAVED_DIR, "duplicates.json")
+    if os.path.exists(duplicates_path):
+        with open(duplicates_path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        print(
+            "[INFO] duplicates: "
+            + ", ".join(f"{len(v)} {k}" for k, v in sorted(report.items()))
+        )
+
+    if os.path.isdir(FILTERED_DIR):
+        for bucket in sorted(os.listdir(FILTERED_DIR)):
+            bucket_dir = os.path.join(FILTERED_DIR, bucket)
+            if os.path.isdir(bucket_dir):
+                count = _count(os.path.join(bucket_dir, "original_policy"), ".json")
+                print(f"[INFO] {FILTERED_DIR}/{bucket}: {count} example(s)")
+
+    import check_policies
+
+    if check_policies.RESULTS_PATH.exists():
+        records = check_policies._load_results(check_policies.RESULTS_PATH).values()
+        check_policies._print_summary(check_policies._summarize(records))
+
+
+def run_stage(name, args):
+    module_name, fixed, _ = STAGES[name]
+    if module_name is None:
+        return status(args)
+    module = importlib.import_module(module_name)
+    metrics.reset()
+    return module.main(fixed + args)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        usage()
+        return 0
+    try:
+        chain = parse_chain(argv)
+    except ValueError as e:
+        print(f"[!] {e}\n")
+        usage()
+        return 2
+
+    if len(chain) > 1:
+        enable_json_cache()
+    try:
+        for name, args in chain:
+            start = time.time()
+            if len(chain) > 1:
+                print(f"[>] {name} {' '.join(args)}".rstrip())
+            try:
+                run_stage(name, args)
+            except SystemExit as e:
+                # -h, argparse errors and sys.exit() inside a stage end the chain
+                if e.code not in (None, 0):
+                    print(f"[!] Stage '{name}' exited with {e.code}; stopping")
+                return e.code or 0
+            if len(chain) > 1:
+                print(f"[INFO] {name} finished in {time.time() - start:.2f}s")
+    finally:
+        disable_json_cache()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
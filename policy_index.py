@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import sqlite3
+import argparse
+
+from filter import read_sources
+
+# Index of IAM terms over the policies filter.py extracted into
+# filtered_pages/<bucket>/{original_policy,results}/N.json. Every action,
+# resource, principal and condition key of every statement is one row, so
+# queries such as "broken policies using iam:PassRole with Resource *" are
+# answered from SQLite without re-parsing the JSON files.
+#
+#   python policy_index.py build
+#   python policy_index.py query --bucket broken --action iam:PassRole --resource '*'
+
+FILTERED_DIR = "filtered_pages"
+DB_PATH = "policy_index.db"
+POLICY_KINDS = ("original_policy", "results")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    bucket TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    number INTEGER,
+    source_post TEXT,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    stmt INTEGER NOT NULL,
+    effect TEXT,
+    field TEXT NOT NULL,
+    qualifier TEXT,
+    service TEXT,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS terms_lookup ON terms(field, value);
+CREATE INDEX IF NOT EXISTS terms_service ON terms(field, service);
+CREATE INDEX IF NOT EXISTS terms_file ON terms(file_id, stmt);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Fields whose values are compared case-insensitively (stored lowercased)
+CASE_INSENSITIVE = {"action", "notaction", "condition_key"}
+
+
+def connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _service(field, value):
+    if field in ("action", "notaction"):
+        return value.split(":", 1)[0] if ":" in value else "*"
+    return None
+
+
+# Statement dicts of a policy document or of bare statement(s)
+def statements(policy):
+    if isinstance(policy, dict) and "Statement" in policy:
+        stmts = _as_list(policy["Statement"])
+    else:
+        stmts = _as_list(policy)
+    return [stmt for stmt in stmts if isinstance(stmt, dict)]
+
+
+# Flattens a policy into (stmt, effect, field, qualifier, value) rows
+def policy_terms(policy):
+    rows = []
+    for idx, stmt in enumerate(statements(policy)):
+        effect = stmt.get("Effect")
+        effect = effect if isinstance(effect, str) else None
+
+        def add(field, value, qualifier=None):
+            if not isinstance(value, str):
+                return
+            if field in CASE_INSENSITIVE:
+                value = value.lower()
+            rows.append((idx, effect, field, qualifier, value))
+
+        for key, field in (
+            ("Action", "action"),
+            ("NotAction", "notaction"),
+            ("Resource", "resource"),
+            ("NotResource", "notresource"),
+        ):
+            for value in _as_list(stmt.get(key)):
+                add(field, value)
+
+        for key, field in (("Principal", "principal"), ("NotPrincipal", "notprincipal")):
+            principal = stmt.get(key)
+            if isinstance(principal, dict):
+                for ptype, values in principal.items():
+                    for value in _as_list(values):
+                        add(field, value, ptype)
+            else:
+                add(field, principal)
+
+        condition = stmt.get("Condition")
+        if isinstance(condition, dict):
+            for operator, keys in condition.items():
+                if isinstance(keys, dict):
+                    for cond_key in keys:
+                        add("condition_key", cond_key, operator)
+    return rows
+
+
+# -----------------------------------------------------------------------------
+# BUILD
+# -----------------------------------------------------------------------------
+# Absolute path of the tree the index was built from; file paths in the
+# index are relative to it
+def indexed_root(conn):
+    row = conn.execute("SELECT value FROM settings WHERE key = 'filtered_dir'")
+    row = row.fetchone()
+    return row[0] if row else os.path.abspath(FILTERED_DIR)
+
+
+# Indexes new or changed policy files (by mtime and size) and drops files
+# that no longer exist. Building from a different tree than last time
+# replaces the index. Returns (indexed, removed, unchanged).
+def build_index(filtered_dir=FILTERED_DIR, db_path=DB_PATH, verbose=False):
+    conn = connect(db_path)
+    root = os.path.abspath(filtered_dir)
+    with conn:
+        if indexed_root(conn) != root:
+            conn.execute("DELETE FROM files")
+        conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES ('filtered_dir', ?)",
+            (root,),
+        )
+    known = {
+        row["path"]: (row["id"], row["mtime"], row["size"], row["source_post"])
+        for row in conn.execute("SELECT id, path, mtime, size, source_post FROM files")
+    }
+    present = set()
+    indexed = unchanged = 0
+
+    with conn:
+        for bucket in sorted(os.listdir(filtered_dir)):
+            if not os.path.isdir(os.path.join(filtered_dir, bucket)):
+                continue
+            sources = read_sources(os.path.join(filtered_dir, bucket))
+            for kind in POLICY_KINDS:
+                policy_dir = os.path.join(filtered_dir, bucket, kind)
+                if not os.path.isdir(policy_dir):
+                    continue
+                for entry in os.scandir(policy_dir):
+                    if not entry.name.endswith(".json"):
+                        continue
+                    path = os.path.join(bucket, kind, entry.name)
+                    present.add(path)
+                    stat = entry.stat()
+                    stem = entry.name[: -len(".json")]
+                    number = int(stem) if stem.isdigit() else None
+                    source = sources.get(number)
+                    old = known.get(path)
+                    if old and old[1:] == (stat.st_mtime, stat.st_size, source):
+                        unchanged += 1
+                        continue
+                    if old:
+                        conn.execute("DELETE FROM files WHERE id = ?", (old[0],))
+
+                    try:
+                        with open(entry.path, "r", encoding="utf-8") as f:
+                            policy = json.load(f)
+                    except (OSError, ValueError):
+                        policy = None
+                    cur = conn.execute(
+                        "INSERT INTO files (path, bucket, kind, number, source_post,"
+                        " mtime, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (path, bucket, kind, number, source, stat.st_mtime, stat.st_size),
+                    )
+                    conn.executemany(
+                        "INSERT INTO terms (file_id, stmt, effect, field, qualifier,"
+                        " service, value) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (cur.lastrowid, s, e, f, q, _service(f, v), v)
+                            for s, e, f, q, v in policy_terms(policy)
+                        ],
+                    )
+                    indexed += 1
+                    if verbose:
+                        print(f"[+] Indexed {path}")
+
+        removed = [v[0] for p, v in known.items() if p not in present]
+        conn.executemany("DELETE FROM files WHERE id = ?", [(i,) for i in removed])
+
+    conn.close()
+    return indexed, len(removed), unchanged
+
+
+# -----------------------------------------------------------------------------
+# QUERY
+# -----------------------------------------------------------------------------
+# SQL matching one statement term against `pattern`. IAM wildcards (* and ?)
+# work in both directions: the query may be a pattern (iam:Pass* matches
+# iam:passrole), and a stored pattern covers a literal query (a policy
+# granting iam:* or * uses iam:PassRole). A bare "*" only matches a literal
+# "*", which is what "Resource *" means.
+def _term_clause(alias, field, pattern):
+    value = pattern.lower() if field in CASE_INSENSITIVE else pattern
+    sql = f"{alias}.field = ? AND "
+    params = [field]
+    if value == "*":
+        sql += f"{alias}.value = '*'"
+    elif field in ("action", "notaction") and ":" in value:
+        service = value.split(":", 1)[0]
+        sql += (
+            f"({alias}.value GLOB ? OR "
+            f"({alias}.service IN (?, '*') AND ? GLOB {alias}.value))"
+        )
+        params += [value, service, value]
+    else:
+        sql += f"({alias}.value GLOB ? OR ? GLOB {alias}.value)"
+        params += [value, value]
+    return sql, params
+
+
+def find(
+    action=None,
+    resource=None,
+    principal=None,
+    condition_key=None,
+    effect=None,
+    bucket=None,
+    kind=None,
+    same_statement=True,
+    db_path=DB_PATH,
+):
+    """Returns policy files using all of the given terms.
+
+    With `same_statement` (the default) all terms must occur in one
+    statement, so action + resource means "this action on this resource".
+    `effect` applies to the statements the terms come from; on its own it
+    matches policies with at least one statement of that effect.
+    """
+    constraints = [
+        ("action", action),
+        ("resource", resource),
+        ("principal", principal),
+        ("condition_key", condition_key),
+    ]
+    constraints = [(f, v) for f, v in constraints if v]
+
+    sql = ["SELECT DISTINCT f.path, f.bucket, f.kind, f.number, f.source_post"]
+    sql.append("FROM files f")
+    params = []
+    for i, (field, value) in enumerate(constraints):
+        alias = f"t{i}"
+        clause, clause_params = _term_clause(alias, field, value)
+        join = f"JOIN terms {alias} ON {alias}.file_id = f.id AND {clause}"
+        if same_statement and i > 0:
+            join += f" AND {alias}.stmt = t0.stmt"
+        if effect:
+            join += f" AND {alias}.effect = ?"
+            clause_params.append(effect)
+        sql.append(join)
+        params += clause_params
+    sql.append("WHERE 1")
+    if effect and not constraints:
+        # No term to attach the effect to: any statement with that effect
+        sql.append(
+            "AND EXISTS (SELECT 1 FROM terms e WHERE e.file_id = f.id"
+            " AND e.effect = ?)"
+        )
+        params.append(effect)
+    if bucket:
+        sql.append("AND f.bucket = ?")
+        params.append(bucket)
+    if kind:
+        sql.append("AND f.kind = ?")
+        params.append(kind)
+    sql.append("ORDER BY f.bucket, f.kind, f.number")
+
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(" ".join(sql), params).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Index and query IAM terms in the filtered policies."
+    )
+    parser.add_argument("--db", default=DB_PATH, help="Index database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_p = sub.add_parser("build", help="Create or incrementally update the index")
+    build_p.add_argument("--filtered-dir", default=FILTERED_DIR)
+    build_p.add_argument("-l", "--log", action="store_true", help="Verbose logging")
+
+    query_p = sub.add_parser("query", help="Find policies using the given terms")
+    query_p.add_argument("-a", "--action", help="e.g. iam:PassRole or s3:Get*")
+    query_p.add_argument("-r", "--resource", help="ARN or pattern; '*' = literal *")
+    query_p.add_argument("-p", "--principal")
+    query_p.add_argument("-c", "--condition-key", help="e.g. aws:SourceIp")
+    query_p.add_argument("-e", "--effect", choices=["Allow", "Deny"])
+    query_p.add_argument("-b", "--bucket", help="repaired, broken or relaxed")
+    query_p.add_argument("-k", "--kind", choices=POLICY_KINDS)
+    query_p.add_argument(
+        "--any-statement",
+        action="store_true",
+        help="Terms may come from different statements of the same policy",
+    )
+    query_p.add_argument(
+        "--paths", action="store_true", help="Print only file paths (for piping)"
+    )
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    if args.command == "build":
+        indexed, removed, unchanged = build_index(args.filtered_dir, args.db, args.log)
+        print(
+            f"[INFO] Indexed {indexed} policies, removed {removed}, "
+            f"{unchanged} unchanged in {time.time() - start:.2f}s"
+        )
+        return
+
+    results = find(
+        action=args.action,
+        resource=args.resource,
+        principal=args.principal,
+        condition_key=args.condition_key,
+        effect=args.effect,
+        bucket=args.bucket,
+        kind=args.kind,
+        same_statement=not args.any_statement,
+        db_path=args.db,
+    )
+    conn = connect(args.db)
+    root = indexed_root(conn)
+    conn.close()
+    for r in results:
+        path = os.path.relpath(os.path.join(root, r["path"]))
+        if args.paths:
+            print(path)
+        else:
+            print(f"{path}  (post: {r['source_post'] or '?'})")
+    if not args.paths:
+        elapsed_ms = (time.time() - start) * 1000
+        print(f"[INFO] {len(results)} policies in {elapsed_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 import os
 import json
 import argparse
-from bs4 import BeautifulSoup
 from parser import extract_post_data
 from downloader import scrape_page, save_page_safe, SAVED_DIR
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from playwright.sync_api import sync_playwright
 import time
+import metrics
+import listing
+import nav_trace
+from frontier import Frontier, build_seeds, structured_post_ids
+from memwatch import MemoryWatch
+from session import SessionPool, MAX_PAGES
+
+MEMORY_CEILING_MB = 2048
 
 
 def sanitize_name(filename):
@@ -14,6 +20,8 @@ def sanitize_name(filename):
 
 
 def save_post_files(file_path, link=None, verbose=False):
+    from bs4 import BeautifulSoup
+
     file_name = os.path.basename(file_path)
     post_name = sanitize_name(file_name)
     post_dir = os.path.join(SAVED_DIR, post_name)
@@ -24,13 +32,13 @@ def save_post_files(file_path, link=None, verbose=False):
 
     with open(file_path, "r", encoding="utf-8") as f:
         html = f.read()
+    with metrics.timer("parse_seconds"):
         soup = BeautifulSoup(html, "html.parser")
+        data = extract_post_data(soup)
 
     with open(os.path.join(post_dir, "page.html"), "w", encoding="utf-8") as f:
         f.write(html)
 
-    data = extract_post_data(soup)
-
     # Write metadata
     with open(os.path.join(post_dir, "metadata.json"), "w", encoding="utf-8") as f:
         json.dump(
@@ -66,39 +74,104 @@ def save_post_files(file_path, link=None, verbose=False):
                     accepted_path = os.path.join(post_dir, "accepted_answer.json")
                     with open(accepted_path, "w", encoding="utf-8") as f:
                         json.dump({"accepted_answer": accepted_text}, f, indent=2)
+                    metrics.inc("accepted_answers_total")
                     if verbose:
                         print(f"[+] Saved accepted_answer.json for: {file_name}")
                     break
 
     os.remove(file_path)
+    metrics.inc("posts_structured_total")
+
+
+# Appends listing metadata (id, title, date, url) captured before download
+def _record_listing(entries):
+    with open(os.path.join(SAVED_DIR, "listing.jsonl"), "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
 
+# (links, next_ref) for one listing page, or None when it could not be fetched
+def _list_posts(url, context, verbose, listing_mode, name="index", keep=True):
+    if listing_mode == "json":
+        result = listing.listing_page(url, context, verbose=verbose)
+        if result is None:
+            return None
+        entries, next_ref = result
+        if entries or not isinstance(url, str):
+            _record_listing(entries)
+            return [e["url"] for e in entries], next_ref
+        if verbose:
+            print("[!] Falling back to HTML listing")
+    return scrape_page(url, context, verbose=verbose, name=name, keep=keep)
+
+
+# `url` is a search URL, or in json listing mode the opaque next-page
+# reference returned by the previous call. With a frontier, only links no
+# other seed has already produced are downloaded. Contexts come from the
+# session pool, and are replaced when their session is used up or when
+# memory crosses the watch's ceiling.
+def run_one_page(
+    url,
+    verbose,
+    max_links=None,
+    listing_mode="html",
+    frontier=None,
+    seed=None,
+    watch=None,
+    sessions=None,
+):
+    from playwright.sync_api import sync_playwright
+
+    if sessions is None:
+        sessions = SessionPool()
 
-def run_one_page(url, verbose, max_links=None):
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/114.0.0.0 Safari/537.36",
-            locale="en-US",
-            timezone_id="America/New_York",
-            viewport={"width": 1920, "height": 1080},
-        )
+        context = sessions.open(browser)
 
         # Now that context exists, we can pass it to scrape_page
-        links, next_url = scrape_page(url, context, verbose=verbose)
+        with metrics.timer("listing_seconds"):
+            listed = _list_posts(url, context, verbose, listing_mode)
+        if listed is None:
+            print(f"[!] Could not load listing page {url}")
+        links, next_url = listed or ([], None)
+        metrics.inc("post_links_found_total", len(links))
 
-        if max_links is not None:
+        if frontier is not None:
+            found = len(links)
+            links = frontier.admit(seed, links, next_url, limit=max_links)
+            metrics.inc("post_links_duplicate_total", found - len(links))
+            if verbose:
+                print(f"[~] {seed.name}: {len(links)} new of {found} links")
+        elif max_links is not None:
             links = links[:max_links]
             if verbose:
                 print(f"[!] Truncating to first {max_links} links")
 
-        for link in links:
-            save_page_safe(link, context, verbose)
+        with metrics.stage("download"):
+            for link in links:
+                save_page_safe(link, context, verbose)
+                recycle = sessions.page_done(context)
+                if watch is not None and watch.over_ceiling():
+                    if verbose:
+                        print("[!] Memory ceiling crossed, recycling browser context")
+                    metrics.inc("context_recycles_total")
+                    recycle = True
+                if recycle:
+                    sessions.close(context)
+                    context = sessions.open(browser)
 
+        sessions.close(context)
         browser.close()
 
     html_files = [f for f in os.listdir(SAVED_DIR) if f.endswith(".html")]
+    with metrics.stage("structure"):
+        _structure_files(html_files, links, verbose)
+
+    return next_url, len(links)
+
+
+def _structure_files(html_files, links, verbose):
     for file_name in html_files:
         # match the file to the original link by filename
         matching_link = next(
@@ -113,10 +186,8 @@ def run_one_page(url, verbose, max_links=None):
             os.path.join(SAVED_DIR, file_name), link=matching_link, verbose=verbose
         )
 
-    return next_url, len(links)
-
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Scrape and structure AWS re:Post pages."
     )
@@ -133,19 +204,101 @@ def main():
     parser.add_argument(
         "-l", "--log", action="store_true", help="Enable verbose logging"
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "-q",
+        "--query",
+        action="append",
+        default=[],
+        help="Search query to crawl (repeatable, default: 'IAM Policy')",
+    )
+    parser.add_argument(
+        "-t",
+        "--tag",
+        action="append",
+        default=[],
+        help="Tag ID or tag page URL to crawl (repeatable)",
+    )
+    parser.add_argument(
+        "--spec",
+        help="Crawl spec file: one 'query <text>', 'tag <id>' or 'url <url>' per line",
+    )
+    parser.add_argument(
+        "--listing",
+        choices=["html", "json"],
+        default="html",
+        help="Find posts from rendered result cards (html) or from the search "
+        "page's own JSON responses (json)",
+    )
+    parser.add_argument(
+        "--trace", help="Append a timing trace per navigation to this JSONL file"
+    )
+    parser.add_argument(
+        "--memory-ceiling",
+        type=int,
+        default=MEMORY_CEILING_MB,
+        metavar="MB",
+        help="Recycle the browser context when Python plus browser memory "
+        f"exceeds this (default {MEMORY_CEILING_MB}, 0 to disable)",
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=1,
+        help="Number of persisted browser sessions to use in turn (default 1)",
+    )
+    parser.add_argument(
+        "--session-pages",
+        type=int,
+        default=MAX_PAGES,
+        help=f"Retire a session after this many pages (default {MAX_PAGES})",
+    )
+    parser.add_argument(
+        "--fresh-session",
+        action="store_true",
+        help="Discard saved cookies and storage before crawling",
+    )
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics.configure(args)
+    os.makedirs(SAVED_DIR, exist_ok=True)
+
+    # Structure-only: files already downloaded, no browser needed
+    if args.structure and not args.download:
+        html_files = [f for f in os.listdir(SAVED_DIR) if f.endswith(".html")]
+        with metrics.stage("structure"):
+            _structure_files(html_files, [], args.log)
+        print(f"[INFO] Structured {len(html_files)} file(s)")
+        metrics.finish(args)
+        return
+
+    if args.trace:
+        nav_trace.enable(args.trace)
 
     verbose = args.log
     max_total = args.max
     remaining = args.max
 
-    base_url = "https://repost.aws/search/content?globalSearch=IAM+Policy&sort=recent"
-    current_url = base_url
+    seeds = build_seeds(args.query, args.tag, args.spec)
+    frontier = Frontier(seeds, seen=structured_post_ids(SAVED_DIR))
+    watch = MemoryWatch(args.memory_ceiling)
+    sessions = SessionPool(size=args.sessions, max_pages=args.session_pages)
+    if args.fresh_session:
+        for slot in range(sessions.size):
+            sessions.retire(slot)
 
-    while current_url:
+    # Seeds take turns one listing page at a time until all are exhausted
+    while frontier:
+        seed = frontier.next_seed()
         this_page_limit = min(remaining, 30) if remaining is not None else None
-        current_url, downloaded = run_one_page(
-            current_url, verbose=verbose, max_links=this_page_limit
+        _, downloaded = run_one_page(
+            seed.next_ref,
+            verbose=verbose,
+            max_links=this_page_limit,
+            listing_mode=args.listing,
+            frontier=frontier,
+            seed=seed,
+            watch=watch,
+            sessions=sessions,
         )
 
         if remaining is not None:
@@ -153,6 +306,14 @@ def main():
             if remaining <= 0:
                 break
 
+    frontier.report()
+    if watch.peak:
+        peak_mb = watch.peak // (1024 * 1024)
+        print(f"[INFO] Peak memory (Python + browser): {peak_mb} MB")
+
+    nav_trace.close()
+    metrics.finish(args)
+
 
 if __name__ == "__main__":
     start_time = time.time()
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import socket
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; workers then fall back to per-pid dirs
+    fcntl = None
+
+# Browser sessions that survive across contexts and runs. Each session slot
+# keeps its Playwright storage state (cookies, local storage) in
+# browser_state/<slot>.json; a new context for that slot starts from the saved
+# state, so the site sees a returning visitor instead of a fresh one. Slots are
+# used in turn and are retired (started over without state) after a number of
+# pages or once they get too old.
+#
+# A pool owns its state directory. Crawl workers sharing one browser_state
+# each claim a directory of their own with claim_state_dir.
+
+STATE_DIR = "browser_state"
+META_FILE = "sessions.json"
+MAX_PAGES = 300  # pages served before a session is retired
+MAX_AGE = 6 * 3600  # seconds
+
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/114.0.0.0 Safari/537.36",
+    "locale": "en-US",
+    "timezone_id": "America/New_York",
+    "viewport": {"width": 1920, "height": 1080},
+}
+
+# Stealth anti bot patches, registered once per context
+STEALTH_JS = """
+    Object.defineProperty(navigator, 'webdriver', { get: () => false });
+    Object.defineProperty(navigator, 'platform', { get: () => 'Win32' });
+    window.chrome = { runtime: {} };
+    Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3] });
+    Object.defineProperty(navigator, 'languages', { get: () => ['en-US', 'en'] });
+"""
+
+_claims = []  # open lock files, held until the process exits
+
+
+# Claims the first free <state_dir>/<host>-<n> directory by taking an
+# exclusive lock on its .lock file for the life of the process. Worker n on a
+# host gets the same directory on every run, so its sessions still persist.
+def claim_state_dir(state_dir=STATE_DIR):
+    host = socket.gethostname()
+    if fcntl is None:
+        return os.path.join(state_dir, f"{host}-{os.getpid()}")
+    n = 0
+    while True:
+        path = os.path.join(state_dir, f"{host}-{n}")
+        os.makedirs(path, exist_ok=True)
+        lock = open(os.path.join(path, ".lock"), "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            n += 1
+            continue
+        _claims.append(lock)
+        return path
+
+
+class SessionPool:
+    def __init__(
+        self, state_dir=STATE_DIR, size=1, max_pages=MAX_PAGES, max_age=MAX_AGE
+    ):
+        self.state_dir = state_dir
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.next_slot = 0
+        self.open_slots = {}  # id(context) -> slot
+        os.makedirs(state_dir, exist_ok=True)
+        self.meta = self._load_meta()
+
+    def _meta_path(self):
+        return os.path.join(self.state_dir, META_FILE)
+
+    def _state_path(self, slot):
+        return os.path.join(self.state_dir, f"{slot}.json")
+
+    def _load_meta(self):
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self):
+        part = f"{self._meta_path()}.{os.getpid()}.part"
+        with open(part, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(part, self._meta_path())
+
+    def _expired(self, info):
+        return (
+            info["pages"] >= self.max_pages
+            or time.time() - info["created"] >= self.max_age
+        )
+
+    # Drops a slot's saved state so its next context starts clean
+    def retire(self, slot):
+        slot = str(slot)
+        if os.path.exists(self._state_path(slot)):
+            os.remove(self._state_path(slot))
+        self.meta.pop(slot, None)
+        self._save_meta()
+        metrics.inc("sessions_retired_total")
+
+    # New context for the next slot, restored from its saved state if the
+    # session is still within its page and age budget
+    def open(self, browser):
+        slot = str(self.next_slot)
+        self.next_slot = (self.next_slot + 1) % self.size
+
+        info = self.meta.get(slot)
+        if info is not None and self._expired(info):
+            self.retire(slot)
+            info = None
+
+        options = dict(CONTEXT_OPTIONS)
+        state_path = self._state_path(slot)
+        if info is not None and os.path.exists(state_path):
+            options["storage_state"] = state_path
+            metrics.inc("sessions_opened_total", state="restored")
+        else:
+            self.meta[slot] = {"created": time.time(), "pages": 0}
+            metrics.inc("sessions_opened_total", state="fresh")
+
+        context = browser.new_context(**options)
+        context.add_init_script(STEALTH_JS)
+        self.open_slots[id(context)] = slot
+        return context
+
+    # Counts a page served by the context; True once its session should be
+    # retired, after which the caller closes it and opens a new one
+    def page_done(self, context):
+        slot = self.open_slots.get(id(context))
+        if slot is None:
+            return False
+        self.meta[slot]["pages"] += 1
+        return self._expired(self.meta[slot])
+
+    # Saves the context's cookies and storage for the next run, then closes it
+    def close(self, context):
+        slot = self.open_slots.pop(id(context), None)
+        if slot is not None:
+            part = f"{self._state_path(slot)}.{os.getpid()}.part"
+            try:
+                context.storage_state(path=part)
+                os.replace(part, self._state_path(slot))
+            except Exception as e:
+                print(f"[!] Could not save browser session {slot}: {e}")
+            self._save_meta()
+        context.close()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from filter import read_json
+from policy_index import policy_terms, statements
+
+# Dataset statistics over filtered_pages. Every policy is flattened once into
+# columnar NumPy arrays (one row per policy, one row per action) together with
+# its check_policies.py result, and the arrays are cached in stats_cache.npz.
+# Reports are then vectorized reductions over those columns; the cache is
+# rebuilt only when a policy file or the results file changes.
+#
+#   python stats.py
+#   python stats.py --json --top 20
+
+FILTERED_DIR = "filtered_pages"
+RESULTS_PATH = "check_policies.jsonl"
+CACHE_PATH = "stats_cache.npz"
+BUCKETS = ("repaired", "broken", "relaxed")
+KINDS = ("original_policy", "results")
+STATUSES = ("unchecked", "sat", "unsat", "error", "timeout")
+
+# Per-policy columns and their dtypes
+POLICY_COLUMNS = {
+    "bucket": np.int8,
+    "kind": np.int8,
+    "number": np.int32,
+    "parsed": np.bool_,
+    "statements": np.int32,
+    "allow": np.int32,
+    "deny": np.int32,
+    "actions": np.int32,
+    "resources": np.int32,
+    "wildcard_action": np.bool_,  # any action containing *
+    "star_action": np.bool_,  # Action "*"
+    "star_resource": np.bool_,  # Resource "*"
+    "not_action": np.bool_,
+    "condition": np.bool_,
+    "principal": np.bool_,
+    "status": np.int8,
+}
+
+
+def _policy_paths(filtered_dir):
+    for b, bucket in enumerate(BUCKETS):
+        for k, kind in enumerate(KINDS):
+            policy_dir = os.path.join(filtered_dir, bucket, kind)
+            if not os.path.isdir(policy_dir):
+                continue
+            for name in os.listdir(policy_dir):
+                stem = name[: -len(".json")]
+                if name.endswith(".json") and stem.isdigit():
+                    yield b, k, int(stem), os.path.join(policy_dir, name)
+
+
+# Changes whenever a policy or the results file is added, removed or touched
+def fingerprint(filtered_dir, results_path):
+    count = mtimes = sizes = 0
+    for _, _, _, path in _policy_paths(filtered_dir):
+        st = os.stat(path)
+        count += 1
+        mtimes += st.st_mtime_ns
+        sizes += st.st_size
+    parts = [count, mtimes, sizes]
+    if os.path.exists(results_path):
+        st = os.stat(results_path)
+        parts += [st.st_mtime_ns, st.st_size]
+    return ":".join(map(str, parts))
+
+
+def _load_statuses(results_path):
+    statuses = {}
+    if not os.path.exists(results_path):
+        return statuses
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            statuses[os.path.normpath(rec["policy"])] = rec["status"]
+    return statuses
+
+
+# Reads every policy once and returns the column arrays
+def flatten(filtered_dir=FILTERED_DIR, results_path=RESULTS_PATH):
+    statuses = _load_statuses(results_path)
+    base = os.path.dirname(os.path.abspath(filtered_dir))
+    columns = {name: [] for name in POLICY_COLUMNS}
+    action_policy = []
+    action_service = []
+    services = {}
+
+    for row, (b, k, number, path) in enumerate(sorted(_policy_paths(filtered_dir))):
+        try:
+            policy = read_json(path)
+        except (OSError, ValueError):
+            policy = None
+        stmts = statements(policy)
+        effects = [stmt.get("Effect") for stmt in stmts]
+        terms = policy_terms(policy)
+        actions = [value for _, _, field, _, value in terms if field == "action"]
+        resources = [value for _, _, field, _, value in terms if field == "resource"]
+        fields = {field for _, _, field, _, _ in terms}
+        key = os.path.normpath(os.path.relpath(os.path.abspath(path), base))
+
+        values = {
+            "bucket": b,
+            "kind": k,
+            "number": number,
+            "parsed": policy is not None,
+            "statements": len(stmts),
+            "allow": effects.count("Allow"),
+            "deny": effects.count("Deny"),
+            "actions": len(actions),
+            "resources": len(resources),
+            "wildcard_action": any("*" in a for a in actions),
+            "star_action": "*" in actions,
+            "star_resource": "*" in resources,
+            "not_action": "notaction" in fields,
+            "condition": "condition_key" in fields,
+            "principal": "principal" in fields,
+            "status": STATUSES.index(statuses.get(key, "unchecked")),
+        }
+        for name, value in values.items():
+            columns[name].append(value)
+
+        for action in actions:
+            service = action.split(":", 1)[0] if ":" in action else "*"
+            action_policy.append(row)
+            action_service.append(services.setdefault(service, len(services)))
+
+    arrays = {
+        name: np.array(values, dtype=POLICY_COLUMNS[name])
+        for name, values in columns.items()
+    }
+    arrays["action_policy"] = np.array(action_policy, dtype=np.int32)
+    arrays["action_service"] = np.array(action_service, dtype=np.int32)
+    arrays["services"] = np.array(list(services), dtype=str)
+    return arrays
+
+
+def load(
+    filtered_dir=FILTERED_DIR,
+    results_path=RESULTS_PATH,
+    cache_path=CACHE_PATH,
+    rebuild=False,
+):
+    stamp = fingerprint(filtered_dir, results_path)
+    if not rebuild and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached["fingerprint"]) == stamp:
+                return {name: cached[name] for name in cached.files}, True
+    arrays = flatten(filtered_dir, results_path)
+    np.savez(cache_path, fingerprint=np.array(stamp), **arrays)
+    return arrays, False
+
+
+# -----------------------------------------------------------------------------
+# REPORT
+# -----------------------------------------------------------------------------
+def _pct(mask):
+    return round(100.0 * mask.mean(), 1) if mask.size else 0.0
+
+
+def _group_report(a, mask, top):
+    n = int(mask.sum())
+    stmts = a["statements"][mask]
+    allow = int(a["allow"][mask].sum())
+    deny = int(a["deny"][mask].sum())
+    per_service = np.bincount(
+        a["action_service"][mask[a["action_policy"]]],
+        minlength=len(a["services"]),
+    )
+    order = np.argsort(per_service, kind="stable")[::-1][:top]
+    statuses = np.bincount(a["status"][mask], minlength=len(STATUSES))
+
+    return {
+        "policies": n,
+        "unparsed": int((~a["parsed"][mask]).sum()),
+        "statements": {
+            "mean": round(float(stmts.mean()), 2) if n else 0.0,
+            "median": float(np.median(stmts)) if n else 0.0,
+            "p95": round(float(np.percentile(stmts, 95)), 2) if n else 0.0,
+            "max": int(stmts.max()) if n else 0,
+        },
+        "actions_mean": round(float(a["actions"][mask].mean()), 2) if n else 0.0,
+        "pct_wildcard_action": _pct(a["wildcard_action"][mask]),
+        "pct_star_action": _pct(a["star_action"][mask]),
+        "pct_star_resource": _pct(a["star_resource"][mask]),
+        "pct_not_action": _pct(a["not_action"][mask]),
+        "pct_condition": _pct(a["condition"][mask]),
+        "pct_principal": _pct(a["principal"][mask]),
+        "effects": {
+            "Allow": allow,
+            "Deny": deny,
+            "other": int(stmts.sum()) - allow - deny,
+        },
+        "check": {
+            status: int(count)
+            for status, count in zip(STATUSES, statuses)
+            if count
+        },
+        "top_services": [
+            [str(a["services"][i]), int(per_service[i])]
+            for i in order
+            if per_service[i]
+        ],
+    }
+
+
+COMPARED = (
+    "pct_wildcard_action",
+    "pct_star_action",
+    "pct_star_resource",
+    "pct_condition",
+    "pct_principal",
+)
+
+
+def report(a, top=10):
+    groups = {}
+    for b, bucket in enumerate(BUCKETS):
+        for k, kind in enumerate(KINDS):
+            mask = (a["bucket"] == b) & (a["kind"] == k)
+            if mask.any():
+                groups[f"{bucket}/{kind}"] = _group_report(a, mask, top)
+
+    # Broken and relaxed originals against repaired originals
+    comparisons = {}
+    reference = groups.get("repaired/original_policy")
+    for label in ("broken/original_policy", "relaxed/original_policy"):
+        if reference and label in groups:
+            comparisons[f"{label} vs repaired/original_policy"] = {
+                key: round(groups[label][key] - reference[key], 1) for key in COMPARED
+            }
+    overall = _group_report(a, np.ones(a["bucket"].shape, dtype=bool), top)
+    return {"overall": overall, "groups": groups, "comparisons": comparisons}
+
+
+def _print_group(label, g):
+    s = g["statements"]
+    print(f"{label}: {g['policies']} policies ({g['unparsed']} unparsed)")
+    print(
+        f"  statements   mean {s['mean']}  median {s['median']}  "
+        f"p95 {s['p95']}  max {s['max']}"
+    )
+    print(f"  actions      mean {g['actions_mean']}")
+    print(
+        f"  wildcards    action {g['pct_wildcard_action']}%  "
+        f"Action:* {g['pct_star_action']}%  Resource:* {g['pct_star_resource']}%"
+    )
+    print(
+        f"  uses         Condition {g['pct_condition']}%  "
+        f"Principal {g['pct_principal']}%  NotAction {g['pct_not_action']}%"
+    )
+    effects = g["effects"]
+    print(
+        f"  effects      Allow {effects['Allow']}  Deny {effects['Deny']}  "
+        f"other {effects['other']}"
+    )
+    if g["check"]:
+        print("  check        " + "  ".join(f"{k} {v}" for k, v in g["check"].items()))
+    services = ", ".join(f"{name} {count}" for name, count in g["top_services"])
+    print(f"  services     {services}")
+    print()
+
+
+def print_report(rep):
+    _print_group("overall", rep["overall"])
+    for label, g in rep["groups"].items():
+        _print_group(label, g)
+    for label, diff in rep["comparisons"].items():
+        print(f"[=] {label} (percentage points)")
+        for key, value in diff.items():
+            print(f"  {key[len('pct_'):]:<16} {value:+.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Describe the filtered policies and their check results."
+    )
+    parser.add_argument("--filtered-dir", default=FILTERED_DIR)
+    parser.add_argument(
+        "--results", default=RESULTS_PATH, help="check_policies.py results file"
+    )
+    parser.add_argument("--cache", default=CACHE_PATH, help="Column cache path")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the cache")
+    parser.add_argument("--top", type=int, default=10, help="Services to list")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    arrays, cached = load(args.filtered_dir, args.results, args.cache, args.rebuild)
+    loaded = time.time()
+    rep = report(arrays, args.top)
+    if args.json:
+        print(json.dumps(rep, indent=2))
+        return
+    print_report(rep)
+    print(
+        f"\n[INFO] {len(arrays['bucket'])} policies "
+        f"({'cached' if cached else 'flattened'} in {loaded - start:.3f}s, "
+        f"report in {time.time() - loaded:.3f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import json
+
+# Stand-ins for the Playwright objects the crawler touches. Pages serve fixed
+# HTML per URL and report a readiness signal straight away. A page
+# can also "load" JSON search responses (xhr), and context.request replays
+# API calls from a fixed table (api).
+
+
+class FakeRequest:
+    def __init__(self, url, post_data=None, resource_type="document"):
+        self.url = url
+        self.method = "POST" if post_data else "GET"
+        self.headers = {"content-type": "application/json", "host": "repost.aws"}
+        self.post_data = post_data
+        self.resource_type = resource_type
+        self.body_size = 0  # bytes on the wire, set by the response
+
+    def sizes(self):
+        return {"responseBodySize": self.body_size}
+
+
+class FakeResponse:
+    def __init__(self, request, body, content_type="text/html", status=200):
+        self.request = request
+        self.url = request.url
+        self.headers = {"content-type": content_type}
+        self.body = body
+        self.status = status
+        self.ok = status < 400
+        request.body_size = len(body.encode())
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class FakeAPI:
+    def __init__(self, table):
+        self.table = table  # (url, post_data) -> payload
+        self.calls = []
+
+    def fetch(self, url, method="GET", headers=None, data=None, timeout=0):
+        self.calls.append((url, data))
+        request = FakeRequest(url, data, "fetch")
+        if (url, data) not in self.table:
+            return FakeResponse(request, "{}", "application/json", 404)
+        body = json.dumps(self.table[(url, data)])
+        return FakeResponse(request, body, "application/json")
+
+
+class FakeHandle:
+    def __init__(self, value):
+        self.value = value
+
+    def json_value(self):
+        return self.value
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = None
+        self.handlers = {}
+        self.closed = False
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def goto(self, url, timeout=0, wait_until=None):
+        if url not in self.context.pages_by_url:
+            raise RuntimeError(f"net::ERR_NAME_NOT_RESOLVED at {url}")
+        self.url = url
+        self.context.visits.append(url)
+        responses = [FakeResponse(FakeRequest(url), self.content())]
+        for api_url, post_data, payload in self.context.xhr.get(url, []):
+            request = FakeRequest(api_url, post_data, "xhr")
+            body = json.dumps(payload)
+            responses.append(FakeResponse(request, body, "application/json"))
+        for response in responses:
+            for handler in self.handlers.get("response", []):
+                handler(response)
+            for handler in self.handlers.get("requestfinished", []):
+                handler(response.request)
+
+    def route(self, pattern, handler):
+        pass
+
+    def wait_for_timeout(self, ms):
+        pass
+
+    def evaluate(self, script, arg=None):
+        return False  # no CAPTCHA, no navigation timing
+
+    def wait_for_function(self, script, arg=None, timeout=0, polling=None):
+        return FakeHandle(self.context.ready_signal)
+
+    def wait_for_selector(self, selector, timeout=0, state=None):
+        return None
+
+    def content(self):
+        return self.context.pages_by_url[self.url]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, pages_by_url, xhr=None, api=None, ready_signal="selector"):
+        self.pages_by_url = pages_by_url
+        self.ready_signal = ready_signal  # what READY_JS reports
+        self.xhr = xhr or {}  # page URL -> [(api URL, post data, payload)]
+        self.request = FakeAPI(api or {})
+        self.visits = []
+        self.pages = []
+
+    def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    def add_init_script(self, script):
+        pass
+
+    def storage_state(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("{}")
+
+    def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, pages_by_url):
+        self.pages_by_url = pages_by_url
+        self.contexts = []
+
+    def new_context(self, **options):
+        context = FakeContext(self.pages_by_url)
+        context.options = options
+        self.contexts.append(context)
+        return context
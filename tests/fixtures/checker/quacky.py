@@ -0,0 +1,18 @@
+# Fake checker for tests. The policy's "Mode" picks the outcome: "sat",
+# "unsat", "sleep" (for "Seconds", then sat) or "raise".
+import sys
+import json
+import time
+
+import slowsolver  # noqa: F401
+
+args = sys.argv[1:]
+with open(args[args.index("-p1") + 1], "r", encoding="utf-8") as f:
+    policy = json.load(f)
+
+mode = policy.get("Mode", "sat")
+if mode == "sleep":
+    time.sleep(policy["Seconds"])
+if mode == "raise":
+    raise RuntimeError("solver crashed")
+print("satisfiability: " + ("unsat" if mode == "unsat" else "sat"))
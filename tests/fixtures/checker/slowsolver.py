@@ -0,0 +1,5 @@
+# Stands in for the solver bindings: slow to import, fast once loaded
+import time
+
+IMPORT_SECONDS = 1.0
+time.sleep(IMPORT_SECONDS)
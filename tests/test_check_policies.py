@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import check_policies
+
+CHECKER_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "checker")
+
+POLICIES = {
+    "0": {"Mode": "sat"},
+    "1": {"Mode": "unsat"},
+    "2": {"Mode": "raise"},
+    "3": {"Mode": "sleep", "Seconds": 30},
+    "4": {"Mode": "sleep", "Seconds": 1.5},
+}
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    policy_dir = tmp_path / "filtered_pages" / "broken" / "original_policy"
+    policy_dir.mkdir(parents=True)
+    for name, policy in POLICIES.items():
+        (policy_dir / f"{name}.json").write_text(json.dumps(policy))
+    src = tmp_path / "src"
+    shutil.copytree(CHECKER_DIR, src)
+    monkeypatch.setattr(check_policies, "BASE", tmp_path)
+    return tmp_path
+
+
+def run(tree, *extra):
+    results = tree / "results.jsonl"
+    argv = ["--src", str(tree / "src"), "--folders", "broken/original_policy"]
+    argv += ["-o", str(results), "-w", "2"] + list(extra)
+    check_policies.main(argv)
+    return {
+        os.path.basename(k).split(".")[0]: rec["status"]
+        for k, rec in check_policies._load_results(results).items()
+    }
+
+
+EXPECTED = {"0": "sat", "1": "unsat", "2": "error", "3": "timeout", "4": "timeout"}
+
+
+def test_pool_kills_hung_solves(tree):
+    # Timeout is below slowsolver's import time: only passes because the
+    # import is done when the worker starts, not during the first policy
+    assert run(tree, "-t", "0.8") == EXPECTED
+
+
+def test_spawn_mode(tree):
+    # Each run pays the import here, so the timeout allows for it
+    assert run(tree, "--spawn", "-t", "1.8") == EXPECTED
+
+
+def test_two_phase_retries_only_timeouts(tree):
+    statuses = run(tree, "--first-timeout", "0.5", "-t", "3")
+    assert statuses == {**EXPECTED, "4": "sat"}
+
+
+def test_resume_skips_recorded_policies(tree):
+    run(tree, "-t", "0.8")
+    policy = tree / "filtered_pages" / "broken" / "original_policy" / "0.json"
+    policy.write_text(json.dumps({"Mode": "raise"}))
+    assert run(tree, "-t", "0.8", "--resume") == EXPECTED  # 0 is not re-checked
+
+
+def test_shards_cover_every_policy_once(tree, capsys):
+    parts = []
+    for i in (1, 2):
+        results = tree / f"shard{i}.jsonl"
+        check_policies.main(
+            ["--src", str(tree / "src"), "--folders", "broken/original_policy"]
+            + ["-o", str(results), "-w", "2", "-t", "0.8", "--shard", f"{i}/2"]
+        )
+        parts.append(set(check_policies._load_results(results)))
+    assert not parts[0] & parts[1]
+    assert len(parts[0] | parts[1]) == len(POLICIES)
+
+    check_policies.main(["--merge"] + [str(tree / f"shard{i}.jsonl") for i in (1, 2)])
+    assert f"Merged {len(POLICIES)} results" in capsys.readouterr().out
+
+
+def test_broken_checker_fails_to_start(tree, capsys):
+    (tree / "src" / "quacky.py").write_text("def broken(:\n")
+    with pytest.raises(SystemExit):
+        run(tree, "-t", "0.8")
+    assert "failed to start" in capsys.readouterr().err
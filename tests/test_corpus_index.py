@@ -0,0 +1,72 @@
+import json
+import os
+import time
+
+import corpus_index
+
+
+def write_post(saved_dir, folder, title, body, tags=(), date=None, accepted=False):
+    path = os.path.join(saved_dir, folder)
+    os.makedirs(path, exist_ok=True)
+    meta = {"title": title, "tags": list(tags), "date": date, "accepted": accepted}
+    with open(os.path.join(path, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    with open(os.path.join(path, "body.json"), "w", encoding="utf-8") as f:
+        json.dump({"body": body}, f)
+
+
+def folders(db, text=None, **filters):
+    return [r["folder"] for r in corpus_index.search(text, db_path=db, **filters)]
+
+
+def test_build_and_search(tmp_path):
+    saved, db = str(tmp_path / "saved"), str(tmp_path / "index.db")
+    write_post(
+        saved,
+        "assume",
+        "Cross-account sts:AssumeRole denied",
+        "sts:AssumeRole fails. The trust policy allows sts:AssumeRole for the "
+        "other account, yet sts:AssumeRole is denied.",
+        tags=["IAM"],
+        date="2024-03-02",
+        accepted=True,
+    )
+    write_post(
+        saved,
+        "bucket",
+        "Bucket policy question",
+        "Lambda calls sts:AssumeRole, then s3:GetObject is denied by the bucket.",
+        tags=["Amazon S3", "IAM"],
+        date="2023-11-20",
+    )
+    write_post(saved, "ec2", "Start instances by tag", "ec2:StartInstances with tags")
+
+    assert corpus_index.build_index(saved, db) == (3, 0, 0)
+
+    # Best bm25 match first; IAM names are matched as phrases
+    assert folders(db, "sts:AssumeRole") == ["assume", "bucket"]
+    assert folders(db, "sts:AssumeRole", tags=["Amazon S3"]) == ["bucket"]
+    assert folders(db, "sts:AssumeRole", accepted=True) == ["assume"]
+    assert folders(db, since="2024") == ["assume"]
+    assert folders(db, until="2023") == ["bucket"]
+    assert folders(db, tags=["iam"]) == ["assume", "bucket"]  # newest first
+
+
+def test_rebuild_is_incremental(tmp_path):
+    saved, db = str(tmp_path / "saved"), str(tmp_path / "index.db")
+    write_post(saved, "one", "First", "kms:Decrypt denied")
+    write_post(saved, "two", "Second", "iam:PassRole needed")
+    assert corpus_index.build_index(saved, db) == (2, 0, 0)
+    assert corpus_index.build_index(saved, db) == (0, 0, 2)
+
+    time.sleep(0.01)  # a newer mtime than the indexed copy
+    write_post(saved, "two", "Second", "iam:CreateRole needed")
+    write_post(saved, "three", "Third", "iam:PassRole again")
+    for name in os.listdir(os.path.join(saved, "one")):
+        os.remove(os.path.join(saved, "one", name))
+    os.rmdir(os.path.join(saved, "one"))
+
+    assert corpus_index.build_index(saved, db) == (2, 1, 0)
+    assert folders(db, "iam:PassRole") == ["three"]
+    assert folders(db, "iam:CreateRole") == ["two"]
+    assert folders(db, "kms:Decrypt") == []
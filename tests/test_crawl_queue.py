@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+import crawl_queue
+from crawl_queue import CrawlQueue, _run_task
+from fakes import FakeContext
+
+pytest.importorskip("bs4")
+
+SEARCH = "https://repost.aws/search/content?globalSearch=IAM"
+
+
+def listing_html(slugs, next_href=None):
+    cards = "".join(
+        f'<a class="QuestionCard_card" href="/questions/{slug}">{slug}</a>'
+        for slug in slugs
+    )
+    if next_href:
+        cards += f'<a aria-label="Go to next page" href="{next_href}">next</a>'
+    return f"<html><body>{cards}</body></html>"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_listing_tasks_follow_pagination(workdir):
+    context = FakeContext(
+        {
+            SEARCH: listing_html(["QA1/first", "QA2/second"], "/search/content?page=2"),
+            "https://repost.aws/search/content?page=2": listing_html(["QA3/third"]),
+        }
+    )
+    queue = CrawlQueue("queue.db")
+    queue.add_listing("query:IAM", SEARCH)
+
+    for expected_page in (0, 1):
+        (task,) = queue.lease("w1")
+        assert task["kind"] == "listing" and task["page"] == expected_page
+        assert _run_task(task, context, queue, "w1", "html", False)
+        assert queue.complete("w1", task["key"])
+
+    assert context.visits == [SEARCH, "https://repost.aws/search/content?page=2"]
+    counts = queue.counts()
+    assert counts[("listing", "done")] == 2
+    assert ("listing", "pending") not in counts  # page 2 has no next link
+    assert counts[("post", "pending")] == 3
+    # Listing pages are parsed and removed, never left for the next task
+    assert not [n for n in os.listdir("saved_pages") if n.startswith("listing-")]
+    queue.close()
+
+
+def test_failed_listing_page_is_retried(workdir):
+    context = FakeContext({})  # every navigation fails
+    queue = CrawlQueue("queue.db")
+    queue.add_listing("query:IAM", SEARCH)
+
+    (task,) = queue.lease("w1")
+    assert not _run_task(task, context, queue, "w1", "html", False)
+    assert queue.complete("w1", task["key"], ok=False)
+    assert queue.counts() == {("listing", "pending"): 1}
+    assert not queue.finished()
+
+    context.pages_by_url[SEARCH] = listing_html(["QA1/first"])
+    (task,) = queue.lease("w1")
+    assert _run_task(task, context, queue, "w1", "html", False)
+    assert queue.complete("w1", task["key"])
+    assert queue.counts() == {("listing", "done"): 1, ("post", "pending"): 1}
+    queue.close()
+
+
+def test_stale_listing_file_is_refetched(workdir):
+    os.makedirs("saved_pages")
+    with open(os.path.join("saved_pages", "listing-w1.html"), "w") as f:
+        f.write(listing_html(["QOLD/stale"]))
+    context = FakeContext({SEARCH: listing_html(["QA1/first"])})
+    queue = CrawlQueue("queue.db")
+    queue.add_listing("query:IAM", SEARCH)
+
+    (task,) = queue.lease("w1")
+    _run_task(task, context, queue, "w1", "html", False)
+    keys = {k for (k,) in queue.conn.execute("SELECT key FROM tasks")}
+    assert "post:QA1" in keys and "post:QOLD" not in keys
+    queue.close()
+
+
+def test_completion_is_recorded_once(workdir):
+    queue = CrawlQueue("queue.db", lease_seconds=-1)  # leases expire at once
+    queue.add_posts(["https://repost.aws/questions/QA1/first"])
+    (first,) = queue.lease("w1")
+    (second,) = queue.lease("w2")  # w1's lease has expired
+    assert first["key"] == second["key"]
+    assert not queue.complete("w1", first["key"])
+    assert queue.complete("w2", second["key"])
+    assert not queue.complete("w2", second["key"])
+    assert queue.counts() == {("post", "done"): 1}
+    queue.close()
+
+
+def test_mark_done_rolls_back_on_error(workdir):
+    queue = CrawlQueue("queue.db")
+
+    def broken_add(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    queue._add = broken_add
+    with pytest.raises(RuntimeError):
+        queue.mark_done(["QA1"])
+    assert not queue.conn.in_transaction
+    del queue._add
+    queue.mark_done(["QA1"])
+    assert queue.counts() == {("post", "done"): 1}
+    queue.close()
+
+
+def test_heartbeat_follows_lease_length():
+    assert crawl_queue._Heartbeat("queue.db", 30, "w1").interval == 10
+    assert crawl_queue._Heartbeat("queue.db", 300, "w1").interval == 100
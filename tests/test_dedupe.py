@@ -0,0 +1,69 @@
+import json
+import os
+
+import dedupe
+import metrics
+
+TEXT = (
+    "My lambda function cannot read objects from the bucket even though the "
+    "execution role has a policy attached that allows s3 GetObject on every "
+    "key under the uploads prefix and the bucket policy does not deny it "
+)
+OTHER = (
+    "How do I let users in one account assume a role in another account "
+    "when the trust policy names the account root and an external id "
+    "condition that the caller has to pass along with the request "
+)
+
+
+def write_post(saved_dir, folder, body):
+    os.makedirs(os.path.join(saved_dir, folder), exist_ok=True)
+    with open(os.path.join(saved_dir, folder, "body.json"), "w") as f:
+        json.dump({"body": body}, f)
+
+
+def build(saved_dir, db_path):
+    metrics.reset()
+    counts = dedupe.update_index(saved_dir, db_path)
+    report = dedupe.write_duplicates(saved_dir, db_path)
+    compared = metrics._counters.get(
+        ("dedupe_comparisons_total", (("kind", "body"),)), 0
+    )
+    return counts, report["body"], compared
+
+
+def test_build_relinks_only_changed_posts(tmp_path):
+    saved, db = str(tmp_path / "saved"), str(tmp_path / "dedupe.db")
+    write_post(saved, "a", TEXT + "thanks")
+    write_post(saved, "b", TEXT + "thank you")
+    write_post(saved, "c", OTHER)
+    write_post(saved, "empty", "")
+
+    counts, duplicates, compared = build(saved, db)
+    assert counts == (4, 0, 0)
+    assert duplicates == {"b": "a"}
+    assert compared == 1
+
+    # Nothing changed: the empty post is not signed again, nothing compared
+    counts, duplicates, compared = build(saved, db)
+    assert counts == (0, 0, 4)
+    assert duplicates == {"b": "a"}
+    assert compared == 0
+
+    write_post(saved, "d", TEXT + "thanks in advance")
+    counts, duplicates, compared = build(saved, db)
+    assert counts == (1, 0, 4)
+    assert duplicates == {"b": "a", "d": "a"}
+    assert compared == 2  # d against a and b only
+
+    # Removing the kept post dissolves its cluster; b and d still match
+    for name in os.listdir(os.path.join(saved, "a")):
+        os.remove(os.path.join(saved, "a", name))
+    os.rmdir(os.path.join(saved, "a"))
+    counts, duplicates, _ = build(saved, db)
+    assert counts == (0, 1, 4)
+    assert duplicates == {"d": "b"}
+
+    # Same answer as clustering from scratch
+    _, fresh, _ = build(saved, str(tmp_path / "fresh.db"))
+    assert fresh == duplicates
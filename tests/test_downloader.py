@@ -0,0 +1,49 @@
+import json
+import os
+
+import pytest
+
+import downloader
+import nav_trace
+from fakes import FakeContext
+
+URL = "https://repost.aws/questions/QUa1B2c3D4e5F6/s3-bucket-policy"
+
+
+@pytest.fixture
+def traced(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "trace.jsonl")
+    nav_trace.enable(path)
+    yield path
+    nav_trace.close()
+
+
+def saved_trace(path, signal):
+    context = FakeContext({URL: "<html><body>post</body></html>"}, ready_signal=signal)
+    assert downloader.save_page(URL, context, name=signal)
+    assert all(page.closed for page in context.pages)
+    nav_trace.close()
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(f.readline())
+
+
+def test_content_ready_marks_the_selector(traced):
+    record = saved_trace(traced, "selector")
+    assert record["outcome"] == "saved" and "content_ready" in record
+    assert os.path.exists(os.path.join("saved_pages", "selector.html"))
+
+
+# Fake responses carry no Content-Length, like chunked or compressed ones
+def test_response_bytes_without_content_length(traced):
+    record = saved_trace(traced, "selector")
+    assert record["requests"] == 1
+    assert record["response_bytes"] == len("<html><body>post</body></html>")
+
+
+@pytest.mark.parametrize("signal", ["timeout", "ld_json", "quiescent"])
+def test_content_ready_missing_without_selector(traced, signal):
+    record = saved_trace(traced, signal)
+    assert record["outcome"] == "saved_without_content"
+    assert record["ready_signal"] == signal
+    assert "content_ready" not in record
@@ -0,0 +1,139 @@
+import pytest
+
+import filter
+import lenient_json
+from lenient_json import ParseError, loads, parse
+
+POLICY = {"Effect": "Allow", "Action": ["s3:GetObject"], "Resource": "*"}
+
+
+@pytest.mark.parametrize(
+    "text, fix",
+    [
+        (
+            '{"Effect": "Allow", // allow reads\n"Action": ["s3:GetObject"],'
+            ' /* all */ "Resource": "*"}',
+            "comments",
+        ),
+        (
+            '{"Effect": "Allow",\n# reads\n"Action": ["s3:GetObject"],'
+            ' "Resource": "*"}',
+            "comments",
+        ),
+        (
+            '{"Effect": "Allow",, "Action": ["s3:GetObject",], "Resource": "*",}',
+            "extra_commas",
+        ),
+        (
+            '{"Effect": "Allow"\n"Action": ["s3:GetObject"] "Resource": "*"}',
+            "missing_commas",
+        ),
+        (
+            "{“Effect”: “Allow”, ‘Action’: [“s3:GetObject”], “Resource”: “*”}",
+            "smart_quotes",
+        ),
+        (
+            "{'Effect': 'Allow', 'Action': ['s3:GetObject'], 'Resource': '*'}",
+            "single_quotes",
+        ),
+        (
+            '{Effect: "Allow", Action: ["s3:GetObject"], Resource: "*"}',
+            "unquoted_keys",
+        ),
+        (
+            '{"Effect": Allow, "Action": ["s3:GetObject"], "Resource": *}',
+            "unquoted_values",
+        ),
+    ],
+)
+def test_each_repair(text, fix):
+    value, fixes = loads(text)
+    assert value == POLICY
+    assert fix in fixes
+
+
+def test_python_literals():
+    value, fixes = loads('{"Bool": True, "Off": False, "Nothing": None}')
+    assert value == {"Bool": True, "Off": False, "Nothing": None}
+    assert fixes == ["python_literals"]
+
+
+def test_ellipsis_stands_in_for_members():
+    value, fixes = loads('{"Action": ["s3:GetObject", ..., "s3:PutObject"], …}')
+    assert value == {"Action": ["s3:GetObject", "s3:PutObject"]}
+    assert fixes == ["ellipsis"]
+
+
+def test_control_characters_and_invalid_escapes():
+    value, fixes = loads('{"Resource": "arn:aws:s3:::bucket\\d\n/*"}')
+    assert value == {"Resource": "arn:aws:s3:::bucket\\d\n/*"}
+    assert set(fixes) == {"invalid_escapes", "control_characters"}
+
+
+def test_unclosed_input_keeps_what_was_read():
+    value, fixes = loads('{"Effect": "Allow", "Action": ["s3:GetObject", "s3:Put')
+    assert value == {"Effect": "Allow", "Action": ["s3:GetObject", "s3:Put"]}
+    assert fixes == ["unclosed"]
+
+
+def test_strict_json_needs_no_fixes():
+    assert loads('{"a": [1, 2.5, -3e2, true, null, "\\u00e9"]}') == (
+        {"a": [1, 2.5, -300.0, True, None, "é"]},
+        [],
+    )
+
+
+def test_bare_words_in_lists_are_prose():
+    with pytest.raises(ParseError):
+        loads('["s3:GetObject", please help]')
+
+
+@pytest.mark.parametrize(
+    "text", ['{"a": 1} trailing', '{"a" 1}', '{"a": 1]', "", "@"]
+)
+def test_parse_errors(text):
+    with pytest.raises(ParseError) as err:
+        loads(text)
+    assert isinstance(err.value, ValueError)
+    assert "at position" in str(err.value)
+
+
+def test_nesting_limit():
+    depth = lenient_json.MAX_DEPTH
+    assert loads("[" * depth + "]" * depth)[0] is not None
+    with pytest.raises(ParseError, match="Nesting too deep"):
+        loads("[" * (depth + 2) + "]" * (depth + 2))
+
+
+def test_parse_reports_where_the_value_ends():
+    text = 'see {"a": 1} above'
+    value, end, fixes = parse(text, 4)
+    assert value == {"a": 1} and text[end:] == " above" and fixes == []
+
+
+def test_partial_parse_stops_before_prose():
+    text = '{"Statement": [{"Effect": "Allow"}]\nThanks for the help!'
+    value, end, fixes = parse(text, partial=True)
+    assert value == {"Statement": [{"Effect": "Allow"}]}
+    assert text[end:] == "Thanks for the help!"
+    assert fixes == ["unclosed"]  # not unquoted_keys for "Thanks"
+
+
+def test_extract_truncated_policy_keeps_the_tail():
+    text = (
+        "I want read access only.\n"
+        '{"Version": "2012-10-17", "Statement": [{"Effect": "Allow",'
+        ' "Action": "s3:GetObject", "Resource": "*"}]\nThanks'
+    )
+    policy, remaining, fixes = filter.extract_policy_block(text)
+    assert policy["Statement"][0]["Action"] == "s3:GetObject"
+    assert remaining == "I want read access only.\n\nThanks"
+    assert fixes == ["unclosed"]
+
+
+def test_extract_cut_off_policy():
+    text = 'Intent\n{"Statement": [{"Effect": "Deny", "Action": ["iam:*"'
+    policy, remaining, fixes = filter.extract_policy_block(text)
+    assert policy == {"Statement": [{"Effect": "Deny", "Action": ["iam:*"]}]}
+    assert remaining == "Intent"
+    assert filter.extract_policy_block(text, lenient=False) == (None, text, [])
@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+import listing
+from fakes import FakeContext
+
+# The payloads under fixtures/listing follow the shapes extract_listing
+# accepts (IDs under several key names, a nested author ID, per-item cursors,
+# a next-page token, a pageInfo end marker). Replace or extend them with
+# captured search API responses when the real format changes.
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "listing")
+SEARCH = "https://repost.aws/search/content?globalSearch=IAM"
+API = "https://api.repost.aws/search"
+FIRST_BODY = json.dumps({"query": "IAM", "size": 20})
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_extract_listing_entries_and_cursor():
+    entries, cursor = listing.extract_listing(fixture("search_page1.json"))
+    assert cursor == ("nextToken", "page-2-token")  # not an item's "cursor"
+    assert [e["url"] for e in entries] == [
+        "https://repost.aws/questions/QUa1B2c3D4e5F6/"
+        "s3-bucket-policy-denies-getobject-for-my-role",
+        "https://repost.aws/questions/QUg7H8i9J0k1L2/"
+        "iam-policy-allow-ec2-startinstances-only-with-a-tag",
+        "https://repost.aws/knowledge-center/KCm3N4o5P6q7R8/"
+        "how-do-i-troubleshoot-accessdenied-403-errors-from-amazon-s3",
+        "https://repost.aws/articles/ARs9T0u1V2w3X4",  # no title or slug
+    ]
+    assert entries[1]["title"].startswith("IAM policy")
+    assert entries[2]["date"] == "2023-12-12"
+
+
+def test_extract_listing_last_page():
+    entries, cursor = listing.extract_listing(fixture("search_page2.json"))
+    assert [e["id"] for e in entries] == ["QUy5Z6a7B8c9D0"]
+    assert cursor is None
+
+
+def test_generic_cursor_is_a_fallback():
+    payload = {"items": [{"id": "QUa1B2c3D4e5F6"}], "meta": {"cursor": "c2"}}
+    assert listing.extract_listing(payload)[1] == ("cursor", "c2")
+
+
+def test_with_cursor_json_body_and_query_string():
+    template = {"url": API, "post_data": FIRST_BODY}
+    url, data = listing._with_cursor(template, ("nextToken", "t2"))
+    assert url == API
+    assert json.loads(data) == {"query": "IAM", "size": 20, "nextToken": "t2"}
+
+    template = {"url": API + "?q=IAM&nextToken=t1", "post_data": None}
+    url, data = listing._with_cursor(template, ("nextToken", "t2"))
+    assert url == API + "?q=IAM&nextToken=t2" and data is None
+
+
+def test_json_listing_captures_then_replays():
+    second_body = json.dumps({"query": "IAM", "size": 20, "nextToken": "page-2-token"})
+    context = FakeContext(
+        {SEARCH: "<html></html>"},
+        xhr={SEARCH: [(API, FIRST_BODY, fixture("search_page1.json"))]},
+        api={(API, second_body): fixture("search_page2.json")},
+    )
+    entries, ref = listing.listing_page(SEARCH, context)
+    assert len(entries) == 4
+    assert ref["cursor"] == ("nextToken", "page-2-token")
+
+    entries, ref = listing.listing_page(ref, context)
+    assert [e["id"] for e in entries] == ["QUy5Z6a7B8c9D0"]
+    assert ref is None
+    assert context.request.calls == [(API, second_body)]
+
+
+def test_failed_api_page_is_not_an_empty_page():
+    template = {"url": API, "method": "POST", "headers": {}, "post_data": FIRST_BODY}
+    ref = {"template": template, "cursor": ("nextToken", "gone")}
+    assert listing.listing_page(ref, FakeContext({})) is None  # API answers 404
+
+
+def test_html_fallback_when_no_json_results(tmp_path, monkeypatch):
+    pytest.importorskip("bs4")
+    import scrape
+
+    monkeypatch.chdir(tmp_path)
+    html = (
+        '<a class="QuestionCard_card" href="/questions/QUa1B2c3D4e5F6/'
+        's3-bucket-policy">x</a>'
+    )
+    context = FakeContext({SEARCH: html})
+    links, next_url = scrape._list_posts(SEARCH, context, False, "json")
+    assert links == ["https://repost.aws/questions/QUa1B2c3D4e5F6/s3-bucket-policy"]
+    assert next_url is None
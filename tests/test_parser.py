@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+import parser
+
+
+def write_post(saved_dir, folder, body, meta=None, answer=None):
+    path = os.path.join(saved_dir, folder)
+    os.makedirs(path)
+    files = {"body.json": {"body": body}}
+    if meta is not None:
+        files["metadata.json"] = meta
+    if answer is not None:
+        files["accepted_answer.json"] = {"accepted_answer": answer}
+    for name, data in files.items():
+        with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+
+@pytest.fixture
+def saved(tmp_path):
+    saved = str(tmp_path)
+    write_post(saved, "iam", "iam body", {"tags": ["IAM"]}, answer="use a role")
+    write_post(saved, "s3", "s3 body", {"tags": ["Amazon S3"]})
+    write_post(saved, "bare", "no metadata")
+    os.makedirs(os.path.join(saved, "empty"))  # no body.json: not a post
+    return saved
+
+
+def test_structured_posts(saved):
+    posts = {p["folder"]: p for p in parser.iter_structured_posts(saved)}
+    assert sorted(posts) == ["bare", "iam", "s3"]
+    assert posts["iam"] == {"tags": ["IAM"], "folder": "iam", "body": "iam body"}
+    assert posts["bare"] == {"folder": "bare", "body": "no metadata"}
+
+
+def test_where_runs_before_the_body_is_read(saved):
+    seen = []
+
+    def where(post):
+        seen.append(dict(post))
+        return "IAM" in post.get("tags", [])
+
+    posts = list(
+        parser.iter_structured_posts(
+            saved, where=where, fields=("metadata", "body", "accepted_answer")
+        )
+    )
+    assert [p["folder"] for p in posts] == ["iam"]
+    assert posts[0]["accepted_answer"] == "use a role"
+    assert all("body" not in post for post in seen)
+
+
+def test_fields_skip_unrequested_files(saved):
+    posts = list(parser.iter_structured_posts(saved, fields=("accepted_answer",)))
+    answers = {p["folder"]: p for p in posts}
+    assert answers["iam"] == {"folder": "iam", "accepted_answer": "use a role"}
+    assert answers["s3"] == {"folder": "s3", "accepted_answer": None}
+
+
+def test_max_posts_counts_posts_that_pass(saved):
+    assert len(list(parser.iter_structured_posts(saved, max_posts=2))) == 2
+    posts = parser.iter_structured_posts(
+        saved, max_posts=1, where=lambda post: post["folder"] != "iam"
+    )
+    assert [p["folder"] for p in posts] in (["s3"], ["bare"])
+
+
+def test_html_posts(tmp_path):
+    pytest.importorskip("bs4")
+    for name in ("a", "b", "c"):
+        with open(tmp_path / f"{name}.html", "w", encoding="utf-8") as f:
+            f.write(f"<h1>{name}</h1><main><div class='custom-md-style'>{name}!")
+    (tmp_path / "notes.txt").write_text("not a page")
+
+    not_b = lambda name: name != "b.html"
+    posts = list(parser.iter_html_posts(str(tmp_path), name_filter=not_b))
+    assert sorted((p["file"], p["title"], p["body"]) for p in posts) == [
+        ("a.html", "a", "a!"),
+        ("c.html", "c", "c!"),
+    ]
+    assert len(list(parser.iter_html_posts(str(tmp_path), max_posts=1))) == 1
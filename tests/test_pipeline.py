@@ -0,0 +1,57 @@
+import json
+import sys
+import types
+
+import filter
+import metrics
+import pipeline
+
+
+def test_json_cache_hands_written_files_to_readers(tmp_path):
+    path = str(tmp_path / "policy.json")
+    policy = {"Version": "2012-10-17", "Statement": []}
+    metrics.reset()
+    filter.enable_json_cache()
+    try:
+        filter.write_json(path, policy)
+        assert filter.read_json(path) is policy
+        assert metrics._counters[("json_cache_hits_total", ())] == 1
+
+        # Rewritten behind the cache's back: read again from disk
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"Version": "2012-10-17", "Statement": [{}]}, f)
+        assert filter.read_json(path)["Statement"] == [{}]
+    finally:
+        filter.disable_json_cache()
+    assert filter.read_json(path) is not filter.read_json(path)
+
+
+# Stand-in stage that records what the registry held when it started
+def _fake_stage(seen):
+    def main(argv):
+        seen.append(
+            (dict(metrics._counters), dict(metrics._profilers), filter._json_cache)
+        )
+        metrics.inc("fake_runs_total")
+        metrics._profilers["fake"] = object()
+        return 0
+
+    return types.SimpleNamespace(main=main)
+
+
+def test_chain_resets_metrics_per_stage(monkeypatch):
+    seen = []
+    monkeypatch.setitem(sys.modules, "fake_stage", _fake_stage(seen))
+    monkeypatch.setitem(pipeline.STAGES, "fake", ("fake_stage", [], "Fake"))
+
+    assert pipeline.main(["fake", "+", "fake"]) == 0
+    assert [(c, p, cache is not None) for c, p, cache in seen] == [
+        ({}, {}, True),
+        ({}, {}, True),
+    ]
+    assert filter._json_cache is None
+
+    seen.clear()
+    assert pipeline.main(["fake"]) == 0
+    assert seen == [({}, {}, None)]
+    metrics.reset()
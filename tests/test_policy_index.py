@@ -0,0 +1,51 @@
+import json
+import os
+
+import policy_index
+
+
+def write_policy(filtered_dir, number, *statements):
+    policy_dir = os.path.join(filtered_dir, "repaired", "original_policy")
+    os.makedirs(policy_dir, exist_ok=True)
+    with open(os.path.join(policy_dir, f"{number}.json"), "w") as f:
+        json.dump({"Version": "2012-10-17", "Statement": list(statements)}, f)
+
+
+def test_effect_alone_filters_policies(tmp_path):
+    filtered, db = str(tmp_path / "filtered"), str(tmp_path / "index.db")
+    allow = {"Effect": "Allow", "Action": "s3:GetObject", "Resource": "*"}
+    deny = {"Effect": "Deny", "Action": "s3:DeleteObject", "Resource": "*"}
+    write_policy(filtered, 1, allow)
+    write_policy(filtered, 2, allow, deny)
+    policy_index.build_index(filtered, db)
+
+    def numbers(**terms):
+        return [r["number"] for r in policy_index.find(db_path=db, **terms)]
+
+    assert numbers() == [1, 2]
+    assert numbers(effect="Deny") == [2]
+    assert numbers(effect="Allow") == [1, 2]
+    assert numbers(effect="Deny", action="s3:GetObject") == []
+    assert numbers(effect="Deny", action="s3:Delete*") == [2]
+
+
+def test_query_paths_point_into_the_indexed_tree(tmp_path, monkeypatch, capsys):
+    filtered, db = str(tmp_path / "elsewhere"), str(tmp_path / "index.db")
+    write_policy(filtered, 7, {"Effect": "Allow", "Action": "iam:PassRole"})
+    monkeypatch.chdir(tmp_path)
+    policy_index.main(["--db", db, "build", "--filtered-dir", filtered])
+    capsys.readouterr()
+
+    monkeypatch.chdir(tmp_path / "elsewhere")  # queries may run from anywhere
+    policy_index.main(["--db", db, "query", "-a", "iam:PassRole", "--paths"])
+    (path,) = capsys.readouterr().out.split()
+    expected = os.path.join(filtered, "repaired", "original_policy", "7.json")
+    assert os.path.samefile(path, expected)
+
+    # Indexing another tree replaces the first one
+    other = str(tmp_path / "other")
+    write_policy(other, 1, {"Effect": "Deny", "Action": "s3:*"})
+    assert policy_index.build_index(other, db) == (1, 0, 0)
+    assert [r["path"] for r in policy_index.find(db_path=db)] == [
+        os.path.join("repaired", "original_policy", "1.json")
+    ]
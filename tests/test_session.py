@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+import session
+from fakes import FakeBrowser
+
+
+def test_workers_claim_separate_state_dirs(tmp_path):
+    if session.fcntl is None:
+        pytest.skip("needs fcntl")
+    first = session.claim_state_dir(str(tmp_path))
+    second = session.claim_state_dir(str(tmp_path))
+    assert first != second
+    assert os.path.dirname(first) == os.path.dirname(second) == str(tmp_path)
+
+
+def test_close_saves_state_without_leftover_parts(tmp_path):
+    browser = FakeBrowser({})
+    pools = [session.SessionPool(str(tmp_path)) for _ in range(2)]
+    for pool in pools:  # two pools on one directory must not trip each other
+        context = pool.open(browser)
+        pool.page_done(context)
+        pool.close(context)
+    names = sorted(os.listdir(tmp_path))
+    assert names == ["0.json", "sessions.json"]
+
+    context = session.SessionPool(str(tmp_path)).open(browser)
+    assert context.options["storage_state"] == os.path.join(str(tmp_path), "0.json")